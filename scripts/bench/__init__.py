@@ -0,0 +1,7 @@
+"""
+Offline benchmark and test harnesses for the ChatFiles.org processing scripts.
+
+Contains local stand-ins for the external services the pipeline talks to
+and generators for synthetic input trees. Only the standard library is
+used here; the scripts under test bring their own dependencies.
+"""
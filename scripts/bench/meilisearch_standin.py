@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Local Meilisearch stand-in for ChatFiles.org
+Implements the subset of the Meilisearch HTTP API used by
+build_search_index.py, with configurable latency, so the indexer can be
+tested and benchmarked without a live instance.
+
+Supported routes:
+    GET    /health
+    GET    /indexes, /indexes/{uid}, /indexes/{uid}/stats
+    POST   /indexes
+    DELETE /indexes/{uid}
+    GET/PATCH/DELETE /indexes/{uid}/settings
+    GET/PUT/DELETE   /indexes/{uid}/settings/{name}
+    POST/PUT /indexes/{uid}/documents
+    GET    /tasks/{uid}
+
+Every write returns an enqueued task. A task is reported as "processing"
+until ``task_latency + docs * task_latency_per_doc`` seconds after it was
+enqueued, then "succeeded".
+
+Usage:
+    python bench/meilisearch_standin.py --port 7700 --latency-ms 5 --task-ms 50
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def _timestamp(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class MeilisearchState:
+    """In-memory indexes, tasks and request counters."""
+
+    def __init__(self, latency: float = 0.0, task_latency: float = 0.0,
+                 task_latency_per_doc: float = 0.0, store_documents: bool = False):
+        self.latency = latency
+        self.task_latency = task_latency
+        self.task_latency_per_doc = task_latency_per_doc
+        self.store_documents = store_documents
+
+        self.lock = threading.Lock()
+        self.indexes = {}
+        self.tasks = {}
+        self.next_task_uid = 0
+        self.stats = {"requests": 0, "documents_received": 0, "bytes_received": 0}
+
+    def enqueue(self, index_uid, task_type: str, details: dict = None, docs: int = 0, error: dict = None) -> dict:
+        """Record a task and return its TaskInfo summary."""
+        with self.lock:
+            uid = self.next_task_uid
+            self.next_task_uid += 1
+            now = time.time()
+            self.tasks[uid] = {
+                "uid": uid,
+                "indexUid": index_uid,
+                "type": task_type,
+                "details": details or {},
+                "error": error,
+                "enqueued": now,
+                "done": now + self.task_latency + docs * self.task_latency_per_doc,
+            }
+        return {
+            "taskUid": uid,
+            "indexUid": index_uid,
+            "status": "enqueued",
+            "type": task_type,
+            "enqueuedAt": _timestamp(now),
+        }
+
+    def task_view(self, uid: int):
+        """Return the public view of a task, or None if unknown."""
+        task = self.tasks.get(uid)
+        if task is None:
+            return None
+
+        now = time.time()
+        finished = now >= task["done"]
+        if finished:
+            status = "failed" if task["error"] else "succeeded"
+        else:
+            status = "processing"
+
+        return {
+            "uid": task["uid"],
+            "indexUid": task["indexUid"],
+            "status": status,
+            "type": task["type"],
+            "canceledBy": None,
+            "details": task["details"],
+            "error": task["error"],
+            "duration": f"PT{task['done'] - task['enqueued']:.6f}S" if finished else None,
+            "enqueuedAt": _timestamp(task["enqueued"]),
+            "startedAt": _timestamp(task["enqueued"]),
+            "finishedAt": _timestamp(task["done"]) if finished else None,
+        }
+
+    def index_view(self, uid: str) -> dict:
+        index = self.indexes[uid]
+        return {
+            "uid": uid,
+            "primaryKey": index["primaryKey"],
+            "createdAt": index["createdAt"],
+            "updatedAt": index["updatedAt"],
+        }
+
+
+class MeilisearchHandler(BaseHTTPRequestHandler):
+    """Request handler; the shared MeilisearchState lives on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> MeilisearchState:
+        return self.server.state
+
+    def _send(self, status: int, body=None):
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, code: str, message: str):
+        self._send(status, {"message": message, "code": code, "type": "invalid_request", "link": ""})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        with self.state.lock:
+            self.state.stats["bytes_received"] += len(raw)
+        return json.loads(raw) if raw else None
+
+    def _route(self, method: str):
+        state = self.state
+        with state.lock:
+            state.stats["requests"] += 1
+        if state.latency:
+            time.sleep(state.latency)
+
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+
+        try:
+            if parts == ["health"] and method == "GET":
+                return self._send(200, {"status": "available"})
+
+            if parts[:1] == ["tasks"] and len(parts) == 2 and method == "GET":
+                view = state.task_view(int(parts[1]))
+                if view is None:
+                    return self._error(404, "task_not_found", f"Task `{parts[1]}` not found.")
+                return self._send(200, view)
+
+            if parts == ["indexes"]:
+                if method == "GET":
+                    results = [state.index_view(uid) for uid in sorted(state.indexes)]
+                    return self._send(200, {"results": results, "offset": 0, "limit": 20, "total": len(results)})
+                if method == "POST":
+                    return self._create_index(self._read_body() or {})
+
+            if parts[:1] == ["indexes"] and len(parts) >= 2:
+                return self._index_route(method, parts[1], parts[2:])
+
+        except (ValueError, KeyError) as e:
+            return self._error(400, "bad_request", str(e))
+
+        return self._error(404, "not_found", f"{method} {self.path} is not implemented by the stand-in")
+
+    def _create_index(self, body: dict):
+        state = self.state
+        uid = body["uid"]
+        now = _timestamp(time.time())
+        with state.lock:
+            exists = uid in state.indexes
+            if not exists:
+                state.indexes[uid] = {
+                    "primaryKey": body.get("primaryKey"),
+                    "createdAt": now,
+                    "updatedAt": now,
+                    "settings": {},
+                    "documents": {},
+                    "count": 0,
+                }
+        error = {"message": f"Index `{uid}` already exists.", "code": "index_already_exists",
+                 "type": "invalid_request", "link": ""} if exists else None
+        return self._send(202, state.enqueue(uid, "indexCreation", {"primaryKey": body.get("primaryKey")}, error=error))
+
+    def _index_route(self, method: str, uid: str, rest: list):
+        state = self.state
+
+        if not rest:
+            if method == "DELETE":
+                with state.lock:
+                    existed = state.indexes.pop(uid, None) is not None
+                error = None if existed else {"message": f"Index `{uid}` not found.", "code": "index_not_found",
+                                              "type": "invalid_request", "link": ""}
+                return self._send(202, state.enqueue(uid, "indexDeletion", {"deletedDocuments": 0}, error=error))
+            if method == "GET":
+                if uid not in state.indexes:
+                    return self._error(404, "index_not_found", f"Index `{uid}` not found.")
+                return self._send(200, state.index_view(uid))
+
+        if uid not in state.indexes:
+            return self._error(404, "index_not_found", f"Index `{uid}` not found.")
+        index = state.indexes[uid]
+
+        if rest == ["stats"] and method == "GET":
+            return self._send(200, {
+                "numberOfDocuments": index["count"],
+                "isIndexing": False,
+                "fieldDistribution": {},
+            })
+
+        if rest and rest[0] == "settings":
+            return self._settings_route(method, uid, index, rest[1:])
+
+        if rest == ["documents"] and method in ("POST", "PUT"):
+            documents = self._read_body() or []
+            if isinstance(documents, dict):
+                documents = [documents]
+            with state.lock:
+                key = index["primaryKey"] or "id"
+                for doc in documents:
+                    if state.store_documents:
+                        index["documents"][doc[key]] = doc
+                    else:
+                        index["documents"][doc[key]] = None
+                index["count"] = len(index["documents"])
+                index["updatedAt"] = _timestamp(time.time())
+                state.stats["documents_received"] += len(documents)
+            details = {"receivedDocuments": len(documents), "indexedDocuments": len(documents)}
+            return self._send(202, state.enqueue(uid, "documentAdditionOrUpdate", details, docs=len(documents)))
+
+        return self._error(404, "not_found", f"{method} {self.path} is not implemented by the stand-in")
+
+    def _settings_route(self, method: str, uid: str, index: dict, rest: list):
+        state = self.state
+        settings = index["settings"]
+
+        if not rest:
+            if method == "GET":
+                return self._send(200, settings)
+            if method == "PATCH":
+                body = self._read_body() or {}
+                with state.lock:
+                    settings.update(body)
+                return self._send(202, state.enqueue(uid, "settingsUpdate", body))
+            if method == "DELETE":
+                with state.lock:
+                    settings.clear()
+                return self._send(202, state.enqueue(uid, "settingsUpdate", {}))
+
+        elif len(rest) == 1:
+            # searchable-attributes -> searchableAttributes
+            head, *tail = rest[0].split("-")
+            name = head + "".join(t.capitalize() for t in tail)
+            if method == "GET":
+                return self._send(200, settings.get(name))
+            if method in ("PUT", "PATCH"):
+                body = self._read_body()
+                with state.lock:
+                    settings[name] = body
+                return self._send(202, state.enqueue(uid, "settingsUpdate", {name: body}))
+            if method == "DELETE":
+                with state.lock:
+                    settings.pop(name, None)
+                return self._send(202, state.enqueue(uid, "settingsUpdate", {}))
+
+        return self._error(404, "not_found", f"{method} {self.path} is not implemented by the stand-in")
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **state_kwargs) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread and return the server.
+
+    ``server.url`` is the base URL to pass as --meilisearch-url; call
+    ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), MeilisearchHandler)
+    server.daemon_threads = True
+    server.state = MeilisearchState(**state_kwargs)
+    server.url = f"http://{host}:{server.server_address[1]}"
+
+    thread = threading.Thread(target=server.serve_forever, name="meilisearch-standin", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Meilisearch stand-in")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=7700, help="Port to bind")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added latency per HTTP request")
+    parser.add_argument("--task-ms", type=float, default=0, help="Time each task stays in 'processing'")
+    parser.add_argument("--task-ms-per-doc", type=float, default=0, help="Extra task time per added document")
+    parser.add_argument("--store-documents", action="store_true", help="Keep document bodies in memory")
+    args = parser.parse_args()
+
+    server = start_server(
+        args.host, args.port,
+        latency=args.latency_ms / 1000,
+        task_latency=args.task_ms / 1000,
+        task_latency_per_doc=args.task_ms_per_doc / 1000,
+        store_documents=args.store_documents,
+    )
+    print(f"Meilisearch stand-in listening on {server.url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Stats: {server.state.stats}")
+
+
+if __name__ == "__main__":
+    main()
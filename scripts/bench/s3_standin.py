@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Local S3-compatible stand-in for ChatFiles.org
+Implements the subset of the S3 API used by upload_to_r2.py (path-style
+addressing, no authentication), so the uploader can be tested and
+benchmarked without R2 credentials. Point it at the stand-in with
+R2_ENDPOINT_URL.
+
+Supported operations:
+    HEAD   /{bucket}                                  HeadBucket
+    GET    /{bucket}?list-type=2                      ListObjectsV2
+    GET    /{bucket}?uploads                          ListMultipartUploads
+    HEAD   /{bucket}/{key}                            HeadObject
+    PUT    /{bucket}/{key}                            PutObject
+    POST   /{bucket}/{key}?uploads                    CreateMultipartUpload
+    PUT    /{bucket}/{key}?partNumber=N&uploadId=ID   UploadPart
+    GET    /{bucket}/{key}?uploadId=ID                ListParts
+    POST   /{bucket}/{key}?uploadId=ID                CompleteMultipartUpload
+    DELETE /{bucket}/{key}?uploadId=ID                AbortMultipartUpload
+
+Only sizes and MD5s are kept, not bodies; ETags are computed the way S3
+does (MD5, or md5(part MD5s)-N for multipart objects).
+
+Faults, all optional:
+    latency      seconds added to every request
+    bandwidth    bytes/sec each connection receives bodies at
+    max_in_flight  requests above this many at once get 503 SlowDown
+    max_rate     requests/sec (token bucket); the excess gets 503 SlowDown
+    error_rate   share of requests answered with 500 InternalError
+    drop_rate    share of requests whose connection is closed without a response
+
+Usage:
+    python bench/s3_standin.py --port 9000 --latency-ms 5 --max-in-flight 32 --error-rate 0.01
+"""
+
+import argparse
+import hashlib
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+XML_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+LIST_MAX_KEYS = 1000
+
+
+def _timestamp(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _xml(root: str, body: str, namespace: str = XML_NS) -> bytes:
+    xmlns = f' xmlns="{namespace}"' if namespace else ""
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<{root}{xmlns}>{body}</{root}>'.encode("utf-8")
+
+
+class S3State:
+    """In-memory buckets, multipart uploads, fault settings and request counters."""
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, max_in_flight: int = 0,
+                 max_rate: float = 0.0, error_rate: float = 0.0, drop_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.max_in_flight = max_in_flight
+        self.max_rate = max_rate
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.buckets = {}  # bucket -> {key: (size, etag, content encoding, modified)}
+        self.uploads = {}  # upload id -> {bucket, key, initiated, parts: {number: (size, md5 digest, modified)}}
+        self.in_flight = 0
+        self._tokens = float(max_rate)
+        self._refilled = time.monotonic()
+        self.stats = {
+            "requests": 0,
+            "operations": Counter(),
+            "throttled": 0,
+            "errors_injected": 0,
+            "dropped": 0,
+            "bytes_received": 0,
+            "peak_in_flight": 0,
+        }
+
+    def bucket(self, name: str) -> dict:
+        """Objects of a bucket; buckets are created on first use."""
+        return self.buckets.setdefault(name, {})
+
+    def object_count(self) -> int:
+        with self.lock:
+            return sum(len(objects) for objects in self.buckets.values())
+
+    def enter(self, operation: str):
+        """Count a request and pick its fault: None, "throttle", "error" or "drop"."""
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["operations"][operation] += 1
+            self.in_flight += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+
+            fault = None
+            if self.max_rate:
+                now = time.monotonic()
+                self._tokens = min(self.max_rate, self._tokens + (now - self._refilled) * self.max_rate)
+                self._refilled = now
+                if self._tokens < 1:
+                    fault = "throttle"
+                else:
+                    self._tokens -= 1
+            if self.max_in_flight and self.in_flight > self.max_in_flight:
+                fault = "throttle"
+            if fault is None and self.drop_rate and self.rng.random() < self.drop_rate:
+                fault = "drop"
+            if fault is None and self.error_rate and self.rng.random() < self.error_rate:
+                fault = "error"
+
+            if fault == "throttle":
+                self.stats["throttled"] += 1
+            elif fault == "error":
+                self.stats["errors_injected"] += 1
+            elif fault == "drop":
+                self.stats["dropped"] += 1
+        return fault
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        """Counters as plain JSON-able values, with the objects stored."""
+        with self.lock:
+            stats = dict(self.stats, operations=dict(self.stats["operations"]))
+        stats["objects"] = self.object_count()
+        stats["open_uploads"] = len(self.uploads)
+        return stats
+
+
+def operation_of(method: str, key: str, query: dict) -> str:
+    """S3 operation name of a request."""
+    if not key:
+        if method == "HEAD":
+            return "HeadBucket"
+        if method == "GET":
+            return "ListMultipartUploads" if "uploads" in query else "ListObjectsV2"
+        return f"{method}Bucket"
+    if "uploads" in query and method == "POST":
+        return "CreateMultipartUpload"
+    if "uploadId" in query:
+        return {"PUT": "UploadPart", "GET": "ListParts", "POST": "CompleteMultipartUpload",
+                "DELETE": "AbortMultipartUpload"}.get(method, f"{method}Upload")
+    return {"HEAD": "HeadObject", "PUT": "PutObject", "GET": "GetObject",
+            "DELETE": "DeleteObject"}.get(method, f"{method}Object")
+
+
+class S3Handler(BaseHTTPRequestHandler):
+    """Request handler; the shared S3State lives on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> S3State:
+        return self.server.state
+
+    def _send(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str):
+        if self.command == "HEAD":
+            return self._send(status)
+        self._send(status, _xml("Error", f"<Code>{code}</Code><Message>{escape(message)}</Message>", namespace=None))
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        with self.state.lock:
+            self.state.stats["bytes_received"] += len(raw)
+        if self.state.bandwidth and raw:
+            time.sleep(len(raw) / self.state.bandwidth)
+        if self.headers.get("x-amz-content-sha256", "").startswith("STREAMING-") or \
+                "aws-chunked" in self.headers.get("Content-Encoding", ""):
+            raw = self._decode_chunked(raw)
+        return raw
+
+    @staticmethod
+    def _decode_chunked(raw: bytes) -> bytes:
+        """Payload of an aws-chunked body ("size;chunk-signature=...\\r\\ndata\\r\\n", trailers last)."""
+        out = []
+        pos = 0
+        while True:
+            end = raw.index(b"\r\n", pos)
+            size = int(raw[pos:end].split(b";")[0], 16)
+            if size == 0:
+                return b"".join(out)
+            out.append(raw[end + 2:end + 2 + size])
+            pos = end + 2 + size + 2
+
+    def _route(self, method: str):
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        query = parse_qs(url.query, keep_blank_values=True)
+        query = {name: values[0] for name, values in query.items()}
+
+        state = self.state
+        fault = state.enter(operation_of(method, key, query))
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+
+            if fault == "drop":
+                self.close_connection = True
+                return
+            if fault is not None:
+                # Drain the body so the kept-alive connection stays usable
+                self._read_body()
+                if fault == "throttle":
+                    return self._error(503, "SlowDown", "Please reduce your request rate.")
+                return self._error(500, "InternalError", "Injected error.")
+
+            if not bucket:
+                return self._error(400, "InvalidRequest", "Path-style bucket addressing is required")
+            if not key:
+                return self._bucket_route(method, bucket, query)
+            return self._object_route(method, bucket, key, query)
+
+        except (ValueError, KeyError) as e:
+            return self._error(400, "InvalidRequest", str(e))
+        finally:
+            state.leave()
+
+    def _bucket_route(self, method: str, bucket: str, query: dict):
+        state = self.state
+        if method == "HEAD":
+            with state.lock:
+                state.bucket(bucket)
+            return self._send(200)
+
+        if method == "GET" and "uploads" in query:
+            prefix = query.get("prefix", "")
+            with state.lock:
+                uploads = sorted((u["key"], upload_id, u["initiated"]) for upload_id, u in state.uploads.items()
+                                 if u["bucket"] == bucket and u["key"].startswith(prefix))
+            body = "".join(f"<Upload><Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>"
+                           f"<Initiated>{_timestamp(initiated)}</Initiated></Upload>"
+                           for key, upload_id, initiated in uploads)
+            return self._send(200, _xml("ListMultipartUploadsResult",
+                                        f"<Bucket>{escape(bucket)}</Bucket><Prefix>{escape(prefix)}</Prefix>"
+                                        f"<IsTruncated>false</IsTruncated>{body}"))
+
+        if method == "GET":
+            return self._list_objects(bucket, query)
+
+        return self._error(501, "NotImplemented", f"{method} {self.path} is not implemented by the stand-in")
+
+    def _list_objects(self, bucket: str, query: dict):
+        state = self.state
+        prefix = query.get("prefix", "")
+        max_keys = min(int(query.get("max-keys", LIST_MAX_KEYS)), LIST_MAX_KEYS)
+        after = query.get("continuation-token") or query.get("start-after") or ""
+        url_encoded = query.get("encoding-type") == "url"
+
+        with state.lock:
+            keys = sorted(k for k in state.bucket(bucket) if k.startswith(prefix) and k > after)
+            page = [(k, state.buckets[bucket][k]) for k in keys[:max_keys]]
+        truncated = len(keys) > max_keys
+
+        def encode(value: str) -> str:
+            return escape(quote(value, safe="/") if url_encoded else value)
+
+        contents = "".join(f"<Contents><Key>{encode(k)}</Key><LastModified>{_timestamp(modified)}</LastModified>"
+                           f"<ETag>&quot;{etag}&quot;</ETag><Size>{size}</Size>"
+                           f"<StorageClass>STANDARD</StorageClass></Contents>"
+                           for k, (size, etag, _, modified) in page)
+        body = (f"<Name>{escape(bucket)}</Name><Prefix>{encode(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+                f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{str(truncated).lower()}</IsTruncated>")
+        if url_encoded:
+            body += "<EncodingType>url</EncodingType>"
+        if truncated:
+            body += f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>"
+        return self._send(200, _xml("ListBucketResult", body + contents))
+
+    def _object_route(self, method: str, bucket: str, key: str, query: dict):
+        state = self.state
+
+        if "uploads" in query and method == "POST":
+            upload_id = uuid.uuid4().hex
+            with state.lock:
+                state.uploads[upload_id] = {"bucket": bucket, "key": key, "initiated": time.time(), "parts": {}}
+            return self._send(200, _xml("InitiateMultipartUploadResult",
+                                        f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                                        f"<UploadId>{upload_id}</UploadId>"))
+
+        if "uploadId" in query:
+            return self._upload_route(method, bucket, key, query)
+
+        if method == "PUT":
+            body = self._read_body()
+            etag = hashlib.md5(body).hexdigest()
+            encoding = self.headers.get("Content-Encoding", "").replace("aws-chunked", "").strip(", ") or None
+            with state.lock:
+                state.bucket(bucket)[key] = (len(body), etag, encoding, time.time())
+            return self._send(200, headers={"ETag": f'"{etag}"'})
+
+        if method == "HEAD":
+            with state.lock:
+                obj = state.bucket(bucket).get(key)
+            if obj is None:
+                return self._error(404, "NoSuchKey", "The specified key does not exist.")
+            size, etag, encoding, modified = obj
+            headers = {"ETag": f'"{etag}"', "Last-Modified": self.date_time_string(modified)}
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            # Content-Length is the object's size, not this (empty) response's
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            return
+
+        return self._error(501, "NotImplemented", f"{method} {self.path} is not implemented by the stand-in")
+
+    def _upload_route(self, method: str, bucket: str, key: str, query: dict):
+        state = self.state
+        upload_id = query["uploadId"]
+        with state.lock:
+            upload = state.uploads.get(upload_id)
+        if upload is None or upload["key"] != key or upload["bucket"] != bucket:
+            self._read_body()
+            return self._error(404, "NoSuchUpload", "The specified multipart upload does not exist.")
+
+        if method == "PUT":
+            number = int(query["partNumber"])
+            body = self._read_body()
+            digest = hashlib.md5(body).digest()
+            with state.lock:
+                upload["parts"][number] = (len(body), digest, time.time())
+            return self._send(200, headers={"ETag": f'"{digest.hex()}"'})
+
+        if method == "GET":
+            with state.lock:
+                parts = sorted(upload["parts"].items())
+            body = "".join(f"<Part><PartNumber>{number}</PartNumber><LastModified>{_timestamp(modified)}</LastModified>"
+                           f"<ETag>&quot;{digest.hex()}&quot;</ETag><Size>{size}</Size></Part>"
+                           for number, (size, digest, modified) in parts)
+            return self._send(200, _xml("ListPartsResult",
+                                        f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                                        f"<UploadId>{upload_id}</UploadId><IsTruncated>false</IsTruncated>{body}"))
+
+        if method == "POST":
+            request = ElementTree.fromstring(self._read_body())
+            numbers = [int(part.findtext("{*}PartNumber")) for part in request.iterfind(".//{*}Part")]
+            with state.lock:
+                missing = [n for n in numbers if n not in upload["parts"]]
+                if missing or not numbers:
+                    invalid = True
+                else:
+                    invalid = False
+                    parts = [upload["parts"][n] for n in numbers]
+                    etag = f"{hashlib.md5(b''.join(p[1] for p in parts)).hexdigest()}-{len(parts)}"
+                    state.bucket(bucket)[key] = (sum(p[0] for p in parts), etag, None, time.time())
+                    del state.uploads[upload_id]
+            if invalid:
+                return self._error(400, "InvalidPart", f"Parts not uploaded: {missing}")
+            return self._send(200, _xml("CompleteMultipartUploadResult",
+                                        f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                                        f"<ETag>&quot;{etag}&quot;</ETag>"))
+
+        if method == "DELETE":
+            with state.lock:
+                state.uploads.pop(upload_id, None)
+            return self._send(204)
+
+        return self._error(501, "NotImplemented", f"{method} {self.path} is not implemented by the stand-in")
+
+    def do_HEAD(self):
+        self._route("HEAD")
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **state_kwargs) -> ThreadingHTTPServer:
+    """Start the stand-in on a background thread and return the server.
+
+    ``server.url`` is the endpoint to pass as R2_ENDPOINT_URL; call
+    ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), S3Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 128
+    server.state = S3State(**state_kwargs)
+    server.url = f"http://{host}:{server.server_address[1]}"
+
+    thread = threading.Thread(target=server.serve_forever, name="s3-standin", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local S3-compatible stand-in")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=9000, help="Port to bind")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added latency per HTTP request")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MB/s each connection receives (0: unlimited)")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="Answer 503 SlowDown above this many concurrent requests")
+    parser.add_argument("--max-rate", type=float, default=0, help="Answer 503 SlowDown above this many requests/sec")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with 500")
+    parser.add_argument("--drop-rate", type=float, default=0, help="Share of requests dropped without a response")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the injected faults")
+    args = parser.parse_args()
+
+    server = start_server(
+        args.host, args.port,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth * 1024 * 1024,
+        max_in_flight=args.max_in_flight,
+        max_rate=args.max_rate,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    print(f"S3 stand-in listening on {server.url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Stats: {server.state.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthetic input trees for benchmarks.
+
+generate_document_corpus mirrors what ocr_pipeline.py writes (metadata/{stem}.json
+and text/{stem}.txt per dataset) so the real scripts can run against it;
+generate_upload_tree adds the PDFs, images and face crops upload_to_r2.py
+uploads.
+Generation is deterministic for a given seed.
+"""
+
+import json
+import random
+from datetime import datetime
+from pathlib import Path
+
+WORDS = (
+    "the of and to in a is that for on was with as by at from this be have "
+    "records report interview agent subject stated flight island property "
+    "account telephone schedule meeting travel statement office counsel "
+    "exhibit page witness date located received information documents"
+).split()
+
+KEYWORDS = ("federal bureau", "deposition", "from:", "to:", "plaintiff", "defendant")
+
+NAMES = (
+    "John Smith", "Jane Doe", "Robert Brown", "Maria Garcia", "David Miller",
+    "Susan Clark", "James Wilson", "Linda Moore", "Michael Taylor", "Karen White",
+)
+
+
+def _paragraph(rng: random.Random, chars: int) -> str:
+    words = []
+    total = 0
+    while total < chars:
+        roll = rng.random()
+        if roll < 0.01:
+            word = rng.choice(KEYWORDS)
+        elif roll < 0.03:
+            word = rng.choice(NAMES)
+        else:
+            word = rng.choice(WORDS)
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)
+
+
+def generate_document_corpus(root: Path, documents: int, datasets: int = 4,
+                             mean_chars: int = 4000, seed: int = 0) -> dict:
+    """Write a processed-documents tree under root and return its totals."""
+    rng = random.Random(seed)
+    root = Path(root)
+    text_bytes = 0
+
+    for i in range(documents):
+        dataset_dir = root / f"DataSet_{i % datasets + 1}"
+        stem = f"EFTA{i:08d}"
+        chars = max(50, int(rng.expovariate(1 / mean_chars)))
+        pages = max(1, chars // 2000)
+        text = "\n\n".join(_paragraph(rng, 2000) for _ in range(pages - 1))
+        text += _paragraph(rng, chars - len(text))
+
+        text_file = dataset_dir / "text" / f"{stem}.txt"
+        text_file.parent.mkdir(parents=True, exist_ok=True)
+        encoded = text.encode("utf-8")
+        text_file.write_bytes(encoded)
+        text_bytes += len(encoded)
+
+        meta_file = dataset_dir / "metadata" / f"{stem}.json"
+        meta_file.parent.mkdir(parents=True, exist_ok=True)
+        meta_file.write_text(json.dumps({
+            "filename": f"{stem}.pdf",
+            "status": "success",
+            "page_count": pages,
+            "file_size": len(encoded) * 20,
+            "ocr_confidence": round(rng.uniform(0.3, 1.0), 3),
+            "text_length": len(text),
+            "processed_at": datetime(2026, 1, 1).isoformat(),
+        }))
+
+    return {"documents": documents, "datasets": datasets, "text_bytes": text_bytes}
+
+
+def generate_upload_tree(root: Path, documents: int, datasets: int = 4, mean_kb: float = 200,
+                         large_files: int = 0, large_mb: float = 64, seed: int = 0) -> dict:
+    """Write an upload_to_r2.py input tree under root and return its totals.
+
+    Each document gets a PDF of random bytes (incompressible, like scans)
+    and its extracted text; every fourth one a page image and every eighth
+    a face crop. large_files PDFs of large_mb each are added for the
+    multipart path.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    objects = 0
+    total_bytes = 0
+
+    def write(path: Path, data: bytes):
+        nonlocal objects, total_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        objects += 1
+        total_bytes += len(data)
+
+    for i in range(documents):
+        dataset_dir = root / f"DataSet_{i % datasets + 1}"
+        stem = f"EFTA{i:08d}"
+        size = max(1024, int(rng.expovariate(1 / (mean_kb * 1024))))
+        write(dataset_dir / f"{stem}.pdf", rng.randbytes(size))
+        write(dataset_dir / "text" / f"{stem}.txt", _paragraph(rng, max(50, size // 20)).encode("utf-8"))
+        if i % 4 == 0:
+            write(dataset_dir / "images" / f"{stem}_p1.png", rng.randbytes(max(1024, size // 2)))
+        if i % 8 == 0:
+            write(root / "face_crops" / f"{stem}_face0.jpg", rng.randbytes(rng.randint(8, 24) * 1024))
+
+    for i in range(large_files):
+        dataset_dir = root / f"DataSet_{i % datasets + 1}"
+        write(dataset_dir / f"EFTA{documents + i:08d}.pdf", rng.randbytes(int(large_mb * 1024 * 1024)))
+
+    return {"documents": documents, "datasets": datasets, "objects": objects,
+            "bytes": total_bytes, "large_files": large_files}
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Embedding Format Benchmark for ChatFiles.org
+Measures what storing face embeddings as float16 or int8 (per-vector scale)
+costs in accuracy against the float32 embeddings of a face_pipeline.py run,
+using the run's own clusters as ground truth.
+
+Reported per format:
+    bytes/face       embedding storage per face
+    cos(orig)        cosine similarity of each decoded vector to its float32 original
+    sim error        |similarity change| over sampled same-cluster and random pairs
+    flips            sampled pairs that land on the other side of the threshold
+    own centroid     faces whose nearest float32 cluster centroid is still their own
+    pair P/R         pair-counting precision/recall of re-clustering the decoded
+                     vectors against re-clustering the float32 ones
+
+Usage:
+    python benchmark_embeddings.py --faces ~/epstein_faces/ --max-faces 20000
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    print("Missing dependencies. Install with: pip install numpy")
+    sys.exit(1)
+
+from pipeline_core.face_cluster import assign_to_centroids, cluster_centroids, cluster_embeddings, normalize_rows
+from pipeline_core.face_outputs import iter_clusters, load_cluster_labels
+from pipeline_core.face_store import (
+    EMBEDDING_DIM,
+    EMBEDDING_FORMATS,
+    STORE_DIRNAME,
+    FaceStore,
+    decode_embeddings,
+    encode_embeddings,
+    load_embeddings,
+)
+
+SIMILARITY_THRESHOLD = 0.5  # face_pipeline.py's clustering threshold
+
+
+def run_cluster_labels(faces_dir: Path, n: int) -> np.ndarray:
+    """Label per embedding row from the run's clusters; -1 for singletons and unknown faces."""
+    labels = load_cluster_labels(faces_dir)
+    if labels is not None and len(labels) == n:
+        return np.where(labels >= 0, labels, -1)
+
+    # Older runs: rebuild the labels from the cluster file's face lists
+    labels = np.full(n, -1, dtype=np.int64)
+    store_dir = faces_dir / STORE_DIRNAME
+    _, clusters, clusters_file = iter_clusters(faces_dir)
+    if clusters_file is None or not FaceStore.exists(store_dir):
+        return labels
+
+    rows = {face_id: i for i, face_id in enumerate(FaceStore.open(store_dir).column("face_id"))}
+    label = 0
+    for cluster in clusters:
+        members = [rows[face_id] for face_id in cluster.get("face_ids", []) if face_id in rows]
+        if len(members) >= 2:
+            labels[members] = label
+            label += 1
+    return labels
+
+
+def sample_pairs(labels: np.ndarray, count: int, rng) -> np.ndarray:
+    """Half same-cluster pairs, half uniformly random pairs; returns [m, 2] row indices."""
+    n = len(labels)
+    pairs = [rng.integers(0, n, size=(count - count // 2, 2))]
+
+    clustered = np.flatnonzero(labels >= 0)
+    if len(clustered):
+        order = clustered[np.argsort(labels[clustered], kind="stable")]
+        _, starts, sizes = np.unique(labels[order], return_index=True, return_counts=True)
+        picks = rng.integers(0, len(starts), size=count // 2)
+        first = order[starts[picks] + (rng.random(len(picks)) * sizes[picks]).astype(np.int64)]
+        second = order[starts[picks] + (rng.random(len(picks)) * sizes[picks]).astype(np.int64)]
+        pairs.append(np.stack([first, second], axis=1))
+
+    pairs = np.concatenate(pairs)
+    return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def pair_similarities(embeddings: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    a = normalize_rows(embeddings[pairs[:, 0]])
+    b = normalize_rows(embeddings[pairs[:, 1]])
+    return np.einsum("ij,ij->i", a, b)
+
+
+def pair_agreement(reference: np.ndarray, labels: np.ndarray):
+    """Pair-counting (precision, recall) of labels against reference; -1 counts as its own cluster."""
+    def unique_singletons(values):
+        values = values.copy()
+        singles = values < 0
+        values[singles] = values.max(initial=0) + 1 + np.arange(singles.sum())
+        return values
+
+    def same_pairs(*columns):
+        _, counts = np.unique(np.stack(columns, axis=1), axis=0, return_counts=True)
+        return int((counts * (counts - 1) // 2).sum())
+
+    reference, labels = unique_singletons(reference), unique_singletons(labels)
+    agree = same_pairs(reference, labels)
+    predicted = same_pairs(labels)
+    expected = same_pairs(reference)
+    return agree / predicted if predicted else 1.0, agree / expected if expected else 1.0
+
+
+def evaluate(name: str, original: np.ndarray, labels: np.ndarray, pairs: np.ndarray, ref_sims: np.ndarray,
+             centroids: np.ndarray, reference_clusters: np.ndarray, threshold: float, backend: str) -> dict:
+    """Accuracy of one storage format relative to the float32 originals."""
+    rows, scales = encode_embeddings(original, name)
+    decoded = decode_embeddings(rows, scales)
+    bytes_per_face = rows.itemsize * EMBEDDING_DIM + (scales.itemsize if scales is not None else 0)
+
+    fidelity = np.einsum("ij,ij->i", normalize_rows(original), normalize_rows(decoded))
+    sims = pair_similarities(decoded, pairs)
+    error = np.abs(sims - ref_sims)
+    flips = int(((sims >= threshold) != (ref_sims >= threshold)).sum())
+
+    clustered = labels >= 0
+    own = float("nan")
+    if clustered.any():
+        nearest, _ = assign_to_centroids(decoded[clustered], centroids, -1.0)
+        own = float((nearest == labels[clustered]).mean())
+
+    recluster = cluster_embeddings(decoded, threshold, backend=backend)
+    precision, recall = pair_agreement(reference_clusters, recluster)
+
+    return {
+        "format": name,
+        "bytes_per_face": bytes_per_face,
+        "cosine_to_original_mean": float(fidelity.mean()),
+        "cosine_to_original_min": float(fidelity.min()),
+        "similarity_error_mean": float(error.mean()) if len(error) else 0.0,
+        "similarity_error_max": float(error.max()) if len(error) else 0.0,
+        "threshold_flips": flips,
+        "pairs": len(pairs),
+        "own_centroid": own,
+        "pair_precision": precision,
+        "pair_recall": recall,
+        "clusters": int(recluster.max(initial=-1) + 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure float16/int8 embedding storage against float32")
+    parser.add_argument("--faces", "-f", required=True, help="face_pipeline.py output directory (float32 store)")
+    parser.add_argument("--formats", nargs="+", choices=list(EMBEDDING_FORMATS), default=["float16", "int8"])
+    parser.add_argument("--max-faces", type=int, default=20000,
+                        help="Random sample of faces to evaluate (re-clustering is exact, O(n^2))")
+    parser.add_argument("--pairs", type=int, default=200000, help="Face pairs sampled for similarity error")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD, help="Clustering threshold")
+    parser.add_argument("--cluster-backend", choices=["auto", "exact", "hnsw"], default="exact")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    faces_dir = Path(args.faces)
+    embeddings = load_embeddings(faces_dir)
+    if embeddings is None or len(embeddings) == 0:
+        print(f"No embeddings found in {faces_dir}")
+        sys.exit(1)
+
+    store_dir = faces_dir / STORE_DIRNAME
+    if FaceStore.exists(store_dir) and FaceStore.open(store_dir).embedding_format != "float32":
+        print(f"Warning: {store_dir} is not float32; results are relative to its stored format")
+
+    rng = np.random.default_rng(args.seed)
+    n = len(embeddings)
+    labels = run_cluster_labels(faces_dir, n)
+    sample = np.sort(rng.choice(n, size=args.max_faces, replace=False)) if n > args.max_faces else np.arange(n)
+    original = np.asarray(embeddings[sample], dtype=np.float32)
+    labels = labels[sample]
+    print(f"Evaluating {len(sample)} of {n} faces, {int((labels >= 0).sum())} in "
+          f"{len(np.unique(labels[labels >= 0]))} clusters of the run")
+
+    pairs = sample_pairs(labels, args.pairs, rng)
+    ref_sims = pair_similarities(original, pairs)
+    centroids = cluster_centroids(original, labels) if (labels >= 0).any() else np.empty((0, EMBEDDING_DIM))
+    reference_clusters = cluster_embeddings(original, args.threshold, backend=args.cluster_backend)
+
+    results = [evaluate(name, original, labels, pairs, ref_sims, centroids, reference_clusters,
+                        args.threshold, args.cluster_backend)
+               for name in ["float32"] + [f for f in args.formats if f != "float32"]]
+
+    # Print summary
+    print("\n" + "=" * 96)
+    print("EMBEDDING FORMAT ACCURACY (relative to float32)")
+    print("=" * 96)
+    print(f"{'format':>8} {'bytes/face':>10} {'cos(orig)':>10} {'min':>8} {'sim err':>9} {'max err':>9} "
+          f"{'flips':>7} {'own centroid':>13} {'pair P':>8} {'pair R':>8}")
+    for r in results:
+        print(f"{r['format']:>8} {r['bytes_per_face']:>10} {r['cosine_to_original_mean']:>10.6f} "
+              f"{r['cosine_to_original_min']:>8.5f} {r['similarity_error_mean']:>9.2e} "
+              f"{r['similarity_error_max']:>9.2e} {r['threshold_flips']:>7} {r['own_centroid']:>13.2%} "
+              f"{r['pair_precision']:>8.2%} {r['pair_recall']:>8.2%}")
+    print("=" * 96)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"settings": vars(args), "faces": n, "evaluated": len(sample), "results": results}, f, indent=2)
+        print(f"Results saved: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Search Index Benchmark for ChatFiles.org
+Runs build_search_index.py end to end against a local Meilisearch stand-in
+on synthetic corpora and reports docs/sec, bytes/sec and peak memory.
+
+Usage:
+    python benchmark_search_index.py --docs 1000 10000 --latency-ms 2 --task-ms 20
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.meilisearch_standin import start_server
+from bench.synthetic import generate_document_corpus
+
+INDEXER = Path(__file__).resolve().parent / "build_search_index.py"
+
+
+def run_indexer(corpus_dir: Path, url: str, ner: bool, log_path: Path) -> dict:
+    """Run the indexer as a child process and return wall time and peak RSS."""
+    cmd = [sys.executable, str(INDEXER), "--input", str(corpus_dir),
+           "--meilisearch-url", url, "--api-key", "benchmark"]
+    if not ner:
+        cmd.append("--skip-ner")
+
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"exit_code": proc.returncode, "seconds": elapsed, "peak_rss_bytes": peak_rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark build_search_index.py against a local stand-in")
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000], help="Corpus sizes to run")
+    parser.add_argument("--datasets", type=int, default=4, help="Datasets per corpus")
+    parser.add_argument("--mean-chars", type=int, default=4000, help="Mean text length per document")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Stand-in latency per HTTP request")
+    parser.add_argument("--task-ms", type=float, default=0, help="Stand-in processing time per task")
+    parser.add_argument("--task-ms-per-doc", type=float, default=0, help="Stand-in processing time per document")
+    parser.add_argument("--ner", action="store_true", help="Run spaCy NER (off by default to isolate indexing)")
+    parser.add_argument("--workdir", help="Directory for corpora and logs (default: temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep generated corpora")
+    parser.add_argument("--json-out", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="chatfiles-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+
+    for docs in args.docs:
+        corpus_dir = workdir / f"corpus_{docs}"
+        if corpus_dir.exists():
+            shutil.rmtree(corpus_dir)
+        print(f"Generating {docs} documents in {corpus_dir}")
+        corpus = generate_document_corpus(corpus_dir, docs, args.datasets, args.mean_chars)
+
+        server = start_server(
+            latency=args.latency_ms / 1000,
+            task_latency=args.task_ms / 1000,
+            task_latency_per_doc=args.task_ms_per_doc / 1000,
+        )
+        try:
+            run = run_indexer(corpus_dir, server.url, args.ner, workdir / f"indexer_{docs}.log")
+        finally:
+            server.shutdown()
+
+        stats = server.state.stats
+        result = {
+            **corpus,
+            **run,
+            "docs_per_sec": docs / run["seconds"],
+            "text_mb_per_sec": corpus["text_bytes"] / run["seconds"] / 1024 / 1024,
+            "http_requests": stats["requests"],
+            "payload_bytes": stats["bytes_received"],
+            "documents_received": stats["documents_received"],
+        }
+        results.append(result)
+
+        if run["exit_code"] != 0 or stats["documents_received"] != docs:
+            print(f"  Indexer run failed or incomplete, see {workdir / f'indexer_{docs}.log'}")
+
+        if not args.keep:
+            shutil.rmtree(corpus_dir)
+
+    # Print summary
+    print("\n" + "=" * 78)
+    print("SEARCH INDEX BENCHMARK")
+    print("=" * 78)
+    print(f"{'docs':>9} {'text MB':>9} {'seconds':>9} {'docs/s':>10} {'MB/s':>8} {'peak MB':>9} {'requests':>9}")
+    for r in results:
+        print(f"{r['documents']:>9} {r['text_bytes'] / 1024 / 1024:>9.1f} {r['seconds']:>9.2f} "
+              f"{r['docs_per_sec']:>10.1f} {r['text_mb_per_sec']:>8.2f} "
+              f"{r['peak_rss_bytes'] / 1024 / 1024:>9.1f} {r['http_requests']:>9}")
+    print("=" * 78)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"Results saved: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Upload Benchmark for ChatFiles.org
+Runs upload_to_r2.py end to end against a local S3-compatible stand-in on
+a synthetic tree and reports objects/sec, MB/s, requests per object and
+peak memory, so existence-check, multipart and compression strategies can
+be compared offline.
+
+Each strategy gets a fresh stand-in and runs three phases:
+    cold     empty bucket, every file is uploaded
+    recheck  rerun with --ignore-journal, every file is checked against the bucket
+    journal  plain rerun, files are skipped from the journal
+
+Usage:
+    python benchmark_upload.py --documents 2000 --latency-ms 5
+    python benchmark_upload.py --strategies head inventory --max-in-flight 16 --error-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.s3_standin import start_server
+from bench.synthetic import generate_upload_tree
+
+UPLOADER = Path(__file__).resolve().parent / "upload_to_r2.py"
+BUCKET = "benchmark"
+PHASES = ("cold", "recheck", "journal")
+POLL_INTERVAL = 0.05
+
+
+def strategies(multipart_mb: float) -> dict:
+    """Extra upload_to_r2.py arguments per strategy."""
+    return {
+        "head": ["--existence-check", "head"],
+        "inventory": ["--existence-check", "inventory"],
+        "multipart": ["--multipart-threshold", str(multipart_mb)],
+        "sync": ["--sync"],
+        "gzip": ["--compress", "gzip"],
+    }
+
+
+def clean_state(tree_dir: Path):
+    """Remove the uploader's caches, journal and outputs from an earlier strategy."""
+    for path in tree_dir.glob(".r2_*"):
+        path.unlink()
+    for name in ("upload-progress.json", "r2_manifest.json"):
+        (tree_dir / name).unlink(missing_ok=True)
+
+
+def vm_hwm(pid: int) -> int:
+    """Peak RSS in bytes of a running process, or 0 where /proc isn't available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def run_uploader(tree_dir: Path, url: str, extra: list, log_path: Path) -> dict:
+    """Run the uploader as a child process and return wall time and peak RSS."""
+    cmd = [sys.executable, str(UPLOADER), "--input", str(tree_dir), "--bucket", BUCKET] + extra
+    env = dict(os.environ, R2_ENDPOINT_URL=url, R2_ACCESS_KEY_ID="benchmark", R2_SECRET_ACCESS_KEY="benchmark",
+               AWS_DEFAULT_REGION="auto")
+
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        # ru_maxrss of a child starts at this process's RSS (Linux keeps it across exec),
+        # so the child's own high-water mark is read from /proc while it runs
+        high_water = 0
+        while True:
+            high_water = max(high_water, vm_hwm(proc.pid))
+            pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                break
+            time.sleep(POLL_INTERVAL)
+        elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = high_water or rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"exit_code": proc.returncode, "seconds": elapsed, "peak_rss_bytes": peak_rss}
+
+
+def stats_delta(before: dict, after: dict) -> dict:
+    """Stand-in counters for the requests between two snapshots."""
+    delta = {name: after[name] - before[name]
+             for name in ("requests", "throttled", "errors_injected", "dropped", "bytes_received")}
+    delta["operations"] = {op: count - before["operations"].get(op, 0)
+                           for op, count in after["operations"].items() if count > before["operations"].get(op, 0)}
+    delta["objects"] = after["objects"]
+    delta["open_uploads"] = after["open_uploads"]
+    return delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload_to_r2.py against a local S3 stand-in")
+    parser.add_argument("--strategies", nargs="+", default=["head", "inventory", "multipart"],
+                        choices=list(strategies(0)), help="Strategies to run")
+    parser.add_argument("--documents", type=int, default=1000, help="Documents in the synthetic tree")
+    parser.add_argument("--datasets", type=int, default=4, help="Datasets in the tree")
+    parser.add_argument("--mean-kb", type=float, default=200, help="Mean PDF size")
+    parser.add_argument("--large-files", type=int, default=2, help="Extra large PDFs")
+    parser.add_argument("--large-mb", type=float, default=48, help="Size of each large PDF")
+    parser.add_argument("--multipart-mb", type=float, default=16, help="--multipart-threshold of the multipart strategy")
+    parser.add_argument("--workers", type=int, default=16, help="Uploader --workers")
+    parser.add_argument("--uploader-args", nargs=argparse.REMAINDER, default=[],
+                        help="Further upload_to_r2.py arguments for every run (must come last)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Stand-in latency per HTTP request")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Stand-in MB/s per connection (0: unlimited)")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="Stand-in throttles above this many concurrent requests")
+    parser.add_argument("--max-rate", type=float, default=0, help="Stand-in throttles above this many requests/sec")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with 500")
+    parser.add_argument("--drop-rate", type=float, default=0, help="Share of requests dropped without a response")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the tree and the injected faults")
+    parser.add_argument("--workdir", help="Directory for the tree and logs (default: temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tree")
+    parser.add_argument("--json-out", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="chatfiles-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    tree_dir = workdir / "upload_tree"
+    if tree_dir.exists():
+        shutil.rmtree(tree_dir)
+    print(f"Generating {args.documents} documents in {tree_dir}")
+    tree = generate_upload_tree(tree_dir, args.documents, args.datasets, args.mean_kb,
+                                args.large_files, args.large_mb, args.seed)
+    print(f"  {tree['objects']} files, {tree['bytes'] / 1024 / 1024:.1f} MB")
+
+    extra_args = strategies(args.multipart_mb)
+    results = []
+
+    for strategy in args.strategies:
+        clean_state(tree_dir)
+        server = start_server(
+            latency=args.latency_ms / 1000,
+            bandwidth=args.bandwidth * 1024 * 1024,
+            max_in_flight=args.max_in_flight,
+            max_rate=args.max_rate,
+            error_rate=args.error_rate,
+            drop_rate=args.drop_rate,
+            seed=args.seed,
+        )
+        try:
+            for phase in PHASES:
+                print(f"Running {strategy} / {phase}")
+                extra = extra_args[strategy] + ["--workers", str(args.workers)] + args.uploader_args
+                if phase == "recheck":
+                    extra.append("--ignore-journal")
+                log_path = workdir / f"upload_{strategy}_{phase}.log"
+
+                before = server.state.snapshot()
+                run = run_uploader(tree_dir, server.url, extra, log_path)
+                stats = stats_delta(before, server.state.snapshot())
+
+                progress_path = tree_dir / "upload-progress.json"
+                progress = json.loads(progress_path.read_text()) if progress_path.exists() else {"errors": 0}
+
+                result = {
+                    "strategy": strategy,
+                    "phase": phase,
+                    **run,
+                    "objects_per_sec": tree["objects"] / run["seconds"],
+                    "mb_per_sec": stats["bytes_received"] / run["seconds"] / 1024 / 1024,
+                    "requests_per_object": stats["requests"] / tree["objects"],
+                    "errors": progress["errors"],
+                    "stand_in": stats,
+                }
+                results.append(result)
+
+                if run["exit_code"] != 0 or progress["errors"] or stats["objects"] != tree["objects"]:
+                    print(f"  Upload failed or incomplete, see {log_path}")
+        finally:
+            server.shutdown()
+
+    if not args.keep:
+        shutil.rmtree(tree_dir)
+
+    # Print summary
+    print("\n" + "=" * 96)
+    print("UPLOAD BENCHMARK")
+    print(f"{tree['objects']} files, {tree['bytes'] / 1024 / 1024:.1f} MB, latency {args.latency_ms} ms")
+    print("=" * 96)
+    print(f"{'strategy':<10} {'phase':<8} {'seconds':>8} {'obj/s':>9} {'MB/s':>8} {'req/obj':>8} "
+          f"{'requests':>9} {'throttled':>9} {'errors':>7} {'peak MB':>8}")
+    for r in results:
+        s = r["stand_in"]
+        print(f"{r['strategy']:<10} {r['phase']:<8} {r['seconds']:>8.2f} {r['objects_per_sec']:>9.1f} "
+              f"{r['mb_per_sec']:>8.2f} {r['requests_per_object']:>8.2f} {s['requests']:>9} "
+              f"{s['throttled']:>9} {r['errors']:>7} {r['peak_rss_bytes'] / 1024 / 1024:>8.1f}")
+    print("-" * 96)
+    for r in results:
+        operations = ", ".join(f"{op} {count}" for op, count in sorted(r["stand_in"]["operations"].items()))
+        print(f"{r['strategy']:<10} {r['phase']:<8} {operations}")
+    print("=" * 96)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"settings": vars(args), "tree": tree, "results": results}, f, indent=2)
+        print(f"Results saved: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,27 +8,28 @@ Usage:
 """
 
 import argparse
-import json
-import os
 import sys
 from pathlib import Path
 from datetime import datetime
 
 try:
-    import meilisearch
     from tqdm import tqdm
 except ImportError:
     print("Missing dependencies. Install with: pip install meilisearch tqdm")
     sys.exit(1)
 
-# spaCy for NER (optional)
-try:
-    import spacy
-    nlp = spacy.load("en_core_web_sm")
-    SPACY_AVAILABLE = True
-except (ImportError, OSError):
-    SPACY_AVAILABLE = False
-    print("Warning: spaCy not available. Install with: pip install spacy && python -m spacy download en_core_web_sm")
+from pipeline_core import (
+    LazyModule,
+    parse_dataset_number,
+    read_metadata,
+    read_text,
+    require,
+    resolve_document_type,
+)
+from pipeline_core.aggregates import AGGREGATES_FILENAME, DEFAULT_TOP_NAMES, CorpusAggregates, write_aggregates
+from pipeline_core.lazy import load_spacy_model
+
+meilisearch = LazyModule("meilisearch", "pip install meilisearch tqdm")
 
 
 BATCH_SIZE = 1000
@@ -37,7 +38,11 @@ INDEX_NAME = "documents"
 
 def extract_names(text: str, max_names: int = 50) -> list[str]:
     """Extract person names from text using spaCy NER."""
-    if not SPACY_AVAILABLE or not text:
+    if not text:
+        return []
+
+    nlp = load_spacy_model()
+    if nlp is None:
         return []
 
     try:
@@ -57,28 +62,7 @@ def extract_names(text: str, max_names: int = 50) -> list[str]:
         return []
 
 
-def classify_document_type(filename: str, text: str) -> str:
-    """Classify document type based on filename and content."""
-    filename_lower = filename.lower()
-    text_lower = (text or "")[:5000].lower()
-
-    if "302" in filename or "fbi" in filename_lower or "federal bureau" in text_lower:
-        return "fbi_report"
-    elif "deposition" in filename_lower or "deposition" in text_lower:
-        return "transcript"
-    elif "email" in filename_lower or "from:" in text_lower and "to:" in text_lower:
-        return "email"
-    elif "court" in filename_lower or "plaintiff" in text_lower or "defendant" in text_lower:
-        return "court_doc"
-    elif any(ext in filename_lower for ext in [".jpg", ".png", ".gif", ".bmp"]):
-        return "photo"
-    elif any(ext in filename_lower for ext in [".mp4", ".avi", ".mov", ".wmv"]):
-        return "video"
-    else:
-        return "other"
-
-
-def load_processed_documents(input_dir: Path) -> list[dict]:
+def load_processed_documents(input_dir: Path, ner: bool = True) -> list[dict]:
     """Load all processed documents from metadata JSONs and text files."""
     documents = []
 
@@ -93,48 +77,37 @@ def load_processed_documents(input_dir: Path) -> list[dict]:
                 sub_meta = subdir / "metadata"
                 sub_text = subdir / "text"
                 if sub_meta.exists():
-                    docs = load_from_dirs(sub_meta, sub_text, subdir.name)
+                    docs = load_from_dirs(sub_meta, sub_text, ner)
                     documents.extend(docs)
     else:
-        docs = load_from_dirs(metadata_dir, text_dir, "")
+        docs = load_from_dirs(metadata_dir, text_dir, ner)
         documents.extend(docs)
 
     return documents
 
 
-def load_from_dirs(metadata_dir: Path, text_dir: Path, dataset_prefix: str) -> list[dict]:
+def load_from_dirs(metadata_dir: Path, text_dir: Path, ner: bool = True) -> list[dict]:
     """Load documents from a specific metadata/text directory pair."""
     documents = []
 
     for meta_file in metadata_dir.glob("*.json"):
         try:
-            with open(meta_file, "r") as f:
-                meta = json.load(f)
-
             # Skip image metadata files
             if "_images" in meta_file.name:
                 continue
 
+            meta = read_metadata(meta_file)
+
             # Load corresponding text file
-            text_file = text_dir / f"{meta_file.stem}.txt"
-            text_content = ""
-            if text_file.exists():
-                with open(text_file, "r", encoding="utf-8", errors="ignore") as f:
-                    text_content = f.read()
-
-            # Parse dataset number from filename or prefix
-            dataset_num = 0
-            if dataset_prefix:
-                try:
-                    dataset_num = int("".join(filter(str.isdigit, dataset_prefix)))
-                except:
-                    pass
+            text_content = read_text(text_dir / f"{meta_file.stem}.txt")
+
+            dataset_num = parse_dataset_number(metadata_dir)
 
             # Extract names
-            mentioned_names = extract_names(text_content)
+            mentioned_names = extract_names(text_content) if ner else []
 
-            # Classify document type
-            doc_type = classify_document_type(meta.get("filename", ""), text_content)
+            # Document type comes from the OCR stage's metadata when current
+            doc_type = resolve_document_type(meta, text=text_content)
 
             doc = {
                 "id": meta_file.stem,
@@ -158,7 +131,7 @@ def load_from_dirs(metadata_dir: Path, text_dir: Path, dataset_prefix: str) -> l
     return documents
 
 
-def setup_meilisearch_index(client: meilisearch.Client):
+def setup_meilisearch_index(client: "meilisearch.Client"):
     """Configure the Meilisearch index settings."""
     try:
         # Delete existing index if present
@@ -220,6 +193,9 @@ def main():
     parser.add_argument("--meilisearch-url", default="http://localhost:7700", help="Meilisearch URL")
     parser.add_argument("--api-key", required=True, help="Meilisearch API key")
     parser.add_argument("--resume", action="store_true", help="Skip already indexed documents")
+    parser.add_argument("--skip-ner", action="store_true", help="Don't extract mentioned names with spaCy")
+    parser.add_argument("--aggregates", help=f"Where to write precomputed facet counts (default: INPUT/{AGGREGATES_FILENAME})")
+    parser.add_argument("--top-names", type=int, default=DEFAULT_TOP_NAMES, help="Names to keep per aggregate list")
     args = parser.parse_args()
 
     input_dir = Path(args.input)
@@ -228,6 +204,8 @@ def main():
         print(f"Error: Input directory does not exist: {input_dir}")
         sys.exit(1)
 
+    require(meilisearch)
+
     # Connect to Meilisearch
     print(f"Connecting to Meilisearch at {args.meilisearch_url}")
     client = meilisearch.Client(args.meilisearch_url, args.api_key)
@@ -244,13 +222,16 @@ def main():
 
     # Load documents
     print(f"Loading documents from {input_dir}")
-    documents = load_processed_documents(input_dir)
+    documents = load_processed_documents(input_dir, ner=not args.skip_ner)
     print(f"Loaded {len(documents)} documents")
 
     if not documents:
         print("No documents found!")
         sys.exit(1)
 
+    # Facet counts for the browse and landing pages, over the documents actually indexed
+    aggregates = CorpusAggregates()
+
     # Index in batches
     total_indexed = 0
     errors = 0
@@ -262,8 +243,12 @@ def main():
             try:
                 task = index.add_documents(batch)
                 # Wait for task to complete
-                client.wait_for_task(task.task_uid, timeout_in_ms=60000)
+                result = client.wait_for_task(task.task_uid, timeout_in_ms=60000)
+                if result.status != "succeeded":
+                    raise RuntimeError(f"task {task.task_uid} {result.status}: {result.error}")
                 total_indexed += len(batch)
+                for doc in batch:
+                    aggregates.add(doc)
             except Exception as e:
                 print(f"Error indexing batch: {e}")
                 errors += 1
@@ -271,6 +256,9 @@ def main():
             pbar.update(len(batch))
             pbar.set_postfix({"indexed": total_indexed, "errors": errors})
 
+    aggregates_path = Path(args.aggregates) if args.aggregates else input_dir / AGGREGATES_FILENAME
+    write_aggregates(aggregates_path, aggregates.to_dict(args.top_names))
+
     # Print summary
     print("\n" + "=" * 50)
     print("INDEXING COMPLETE")
@@ -279,6 +267,7 @@ def main():
     print(f"Batch errors: {errors}")
     stats = index.get_stats()
     print(f"Index stats: {stats}")
+    print(f"Aggregates saved: {aggregates_path}")
     print("=" * 50)
 
 
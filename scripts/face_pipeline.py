@@ -8,256 +8,863 @@ Usage:
 """
 
 import argparse
-import json
+import hashlib
 import os
 import sys
 from pathlib import Path
 from datetime import datetime
 import numpy as np
-from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import itertools
+import queue
+import threading
+import time
 
 try:
-    import cv2
     from tqdm import tqdm
-    from sklearn.cluster import DBSCAN
-    from sklearn.metrics.pairwise import cosine_similarity
 except ImportError:
     print("Missing dependencies. Install with: pip install opencv-python tqdm scikit-learn")
     sys.exit(1)
 
-# InsightFace import (optional - will skip if not available)
-try:
-    from insightface.app import FaceAnalysis
-    INSIGHTFACE_AVAILABLE = True
-except ImportError:
-    INSIGHTFACE_AVAILABLE = False
-    print("Warning: InsightFace not installed. Install with: pip install insightface onnxruntime-gpu")
+from pipeline_core import LazyModule, require
+from pipeline_core.cluster_state import ClusterState
+from pipeline_core.face_checkpoint import ImageJournal
+from pipeline_core.face_outputs import (
+    FACES_FILENAME,
+    LABELS_FILENAME,
+    append_jsonl,
+    clusters_filename,
+    iter_chunks,
+    load_cluster_labels,
+    read_summary,
+    write_jsonl,
+    write_summary,
+)
+from pipeline_core.face_cluster import (
+    UNCLUSTERED,
+    assign_to_centroids,
+    cluster_centroids,
+    cluster_embeddings,
+    cluster_members,
+    normalize_rows,
+)
+from pipeline_core.face_prefilter import PREFILTER_MODES, TieredDetector, merge_stats, prefilter_report
+from pipeline_core.face_quality import QUALITY_MODES, QualityGate
+from pipeline_core.face_search import document_for_image
+from pipeline_core.face_store import EMBEDDING_FORMATS, STORE_DIRNAME, FaceStore, face_columns, string_at
+from pipeline_core.lazy import insightface_available, load_face_analysis
+from pipeline_core.reference_gallery import ReferenceGallery, file_sha256
+from pipeline_core.stages import StageStats, stage_report
+
+# Heavy imports are deferred until the model or clustering actually runs
+cv2 = LazyModule("cv2", "pip install opencv-python")
 
 
 MIN_FACE_SIZE = 50  # Minimum face crop size
-SIMILARITY_THRESHOLD = 0.5  # For DBSCAN clustering
+SIMILARITY_THRESHOLD = 0.5  # Cosine similarity linking two faces into a cluster
 KNOWN_PERSON_THRESHOLD = 0.6  # For matching to reference photos
+FLUSH_EVERY = 1000  # Faces between commits of the on-disk face store
+CHECKPOINT_IMAGES = 1000  # Images between commits, for runs with few faces
+MATCH_BATCH = 4096  # Cluster centroids per reference gallery matrix product
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
+
+
+def find_images(input_dir: Path) -> list:
+    """All images under input_dir (any extension case) in one directory walk, sorted."""
+    image_files = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        image_files.extend(Path(root) / name for name in sorted(files)
+                           if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+    return image_files
+
+
+def hash_images(image_files: list, workers: int = 4) -> dict:
+    """SHA-256 of every image's bytes, read by a thread pool; None if unreadable."""
+    def hash_one(img_path):
+        try:
+            return file_sha256(img_path)
+        except OSError as e:
+            print(f"Error reading {img_path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return dict(zip(image_files, executor.map(hash_one, image_files, chunksize=64)))
+
+
+def read_image(img_path: Path, skip_hashes=None, sha: str = None):
+    """Read an image file once; returns (decoded image, SHA-256 of its bytes).
+
+    The image is None if the file is unreadable or its hash is in
+    ``skip_hashes`` (already processed), the hash is None if it can't be read.
+    A ``sha`` already computed by hash_images is used instead of hashing again.
+    """
+    try:
+        data = Path(img_path).read_bytes()
+    except OSError as e:
+        print(f"Error reading {img_path}: {e}")
+        return None, None
+
+    if sha is None:
+        sha = hashlib.sha256(data).hexdigest()
+    if skip_hashes is not None and sha in skip_hashes:
+        return None, sha
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR), sha
+
+
+def is_small_face(bbox) -> bool:
+    x1, y1, x2, y2 = bbox.astype(int)[:4]
+    return (x2 - x1) < MIN_FACE_SIZE or (y2 - y1) < MIN_FACE_SIZE
+
+
+def run_detection(face_app, images: list, detector: TieredDetector = None, gate: QualityGate = None) -> list:
+    """Detect and embed the faces in a batch of decoded images.
+
+    Detection runs per image (through ``detector`` if given), but the
+    aligned crops of every face in the batch go through the recognition
+    model in one call. Faces that are too small or fail the quality
+    ``gate`` are not embedded (their ``embedding`` stays None). Falls back
+    to ``face_app.get`` per image for apps without separate detection and
+    recognition models.
+    """
+    det_model = getattr(face_app, "det_model", None)
+    recognition = getattr(face_app, "models", {}).get("recognition")
+    if det_model is None or recognition is None:
+        results = [face_app.get(img) for img in images]
+        if gate is not None:
+            for img, faces in zip(images, results):
+                for face in faces:
+                    if not is_small_face(face.bbox) and not gate.check(img, face):
+                        face.embedding = None
+        return results
+
+    from insightface.app.common import Face
+    from insightface.utils import face_align
+
+    results = []
+    batch_faces = []
+    aligned = []
+    for img in images:
+        if detector is not None:
+            bboxes, kpss = detector.detect(img)
+        else:
+            bboxes, kpss = det_model.detect(img, max_num=0, metric="default")
+        if len(bboxes) == 0:
+            results.append([])
+            continue
+        if kpss is None:
+            results.append(face_app.get(img))
+            continue
+
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i], det_score=bboxes[i, 4])
+            faces.append(face)
+            if is_small_face(face.bbox) or (gate is not None and not gate.check(img, face)):
+                continue
+            batch_faces.append(face)
+            aligned.append(face_align.norm_crop(img, landmark=face.kps, image_size=recognition.input_size[0]))
+        results.append(faces)
+
+    if aligned:
+        for face, embedding in zip(batch_faces, recognition.get_feat(aligned)):
+            face.embedding = embedding.flatten()
+    return results
+
+
+def extract_faces(faces: list, img, img_path: Path, output_dir: Path) -> tuple[list, list, list]:
+    """Turn detected faces into records, embeddings and crops to write.
+
+    Returns (face records, embeddings, [(crop path, crop image)]); records
+    don't have an embedding_idx yet, that is assigned when they are added
+    to a FacePipeline.
+    """
+    records = []
+    embeddings = []
+    crops = []
+
+    for idx, face in enumerate(faces):
+        # Skip small faces and faces the quality gate dropped
+        if is_small_face(face.bbox) or getattr(face, "embedding", None) is None:
+            continue
+        x1, y1, x2, y2 = face.bbox.astype(int)[:4]
+
+        # Expand bbox slightly for crop
+        h, w = img.shape[:2]
+        pad = int((x2 - x1) * 0.1)
+        x1 = max(0, x1 - pad)
+        y1 = max(0, y1 - pad)
+        x2 = min(w, x2 + pad)
+        y2 = min(h, y2 + pad)
+
+        # Crop face
+        face_crop = img[y1:y2, x1:x2]
+
+        # Generate face ID
+        face_id = f"{img_path.stem}_face{idx}"
+        crop_path = output_dir / "face_crops" / f"{face_id}.jpg"
+        crops.append((crop_path, face_crop))
+
+        records.append({
+            "face_id": face_id,
+            "source_image": str(img_path),
+            "bbox": {"x": int(x1), "y": int(y1), "w": int(x2-x1), "h": int(y2-y1)},
+            "confidence": float(face.det_score),
+            "crop_path": str(crop_path),
+            **(getattr(face, "quality", None) or {}),
+        })
+        embeddings.append(face.embedding.astype(np.float32))
+
+    return records, embeddings, crops
+
+
+def write_crops(crops: list):
+    """Save face crops as JPEGs."""
+    for crop_path, face_crop in crops:
+        cv2.imwrite(str(crop_path), face_crop)
+
+
+def detect_faces(face_app, img_path: Path, output_dir: Path, detector: TieredDetector = None,
+                 gate: QualityGate = None, skip_hashes=None, sha: str = None) -> tuple[list, list, str]:
+    """Detect faces in one image and save their crops.
+
+    Returns (face records, embeddings, image SHA-256).
+    """
+    try:
+        img, sha = read_image(img_path, skip_hashes, sha)
+        if img is None:
+            return [], [], sha
+
+        faces = run_detection(face_app, [img], detector, gate)[0]
+        records, embeddings, crops = extract_faces(faces, img, img_path, output_dir)
+        (output_dir / "face_crops").mkdir(parents=True, exist_ok=True)
+        write_crops(crops)
+        return records, embeddings, sha
+
+    except Exception as e:
+        print(f"Error processing {img_path}: {e}")
+        return [], [], sha
+
+
+def onnx_session_options(threads: int):
+    """ONNX Runtime options for one CPU worker that owns `threads` cores."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+# Per-process model and prefilter for CPU workers (set by _init_cpu_worker)
+_worker_face_app = None
+_worker_detector = None
+_worker_gate = None
+_worker_skip_hashes = None
+
+
+def make_detector(face_app, prefilter: dict):
+    """TieredDetector for the given --prefilter settings, or None if off or unsupported."""
+    if not prefilter or prefilter.get("mode", "off") == "off" or not hasattr(face_app, "det_model"):
+        return None
+    return TieredDetector(face_app.det_model, min_face_size=MIN_FACE_SIZE, **prefilter)
+
+
+def _init_cpu_worker(threads: int, prefilter: dict = None, quality: dict = None, skip_hashes: set = None):
+    """Load the model once per worker process."""
+    global _worker_face_app, _worker_detector, _worker_gate, _worker_skip_hashes
+    # OpenCV's own thread pool would compete with ONNX Runtime for the cores
+    cv2.setNumThreads(1)
+    _worker_face_app = load_face_analysis(
+        ['CPUExecutionProvider'], ctx_id=-1, sess_options=onnx_session_options(threads)
+    )
+    _worker_detector = make_detector(_worker_face_app, prefilter)
+    _worker_gate = QualityGate(**quality) if quality else None
+    _worker_skip_hashes = skip_hashes
+
+
+def _detect_batch(image_paths: list, output_dir: str, hashes: dict = None) -> tuple[list, dict, int]:
+    """Worker task: detect faces in a batch of images (hashes: path -> SHA-256 if known).
+
+    Returns the per-image results, the prefilter counters and the number of
+    faces the quality gate dropped for the batch.
+    """
+    output_dir = Path(output_dir)
+    (output_dir / "face_crops").mkdir(parents=True, exist_ok=True)
+
+    hashes = hashes or {}
+    decoded = [(Path(p), *read_image(p, _worker_skip_hashes, hashes.get(p))) for p in image_paths]
+    hashes = {str(p): sha for p, _, sha in decoded}
+    readable = [(p, img) for p, img, _ in decoded if img is not None]
+    try:
+        detections = run_detection(_worker_face_app, [img for _, img in readable], _worker_detector, _worker_gate)
+    except Exception as e:
+        print(f"Error processing batch starting at {image_paths[0]}: {e}")
+        detections = [[] for _ in readable]
+
+    faces_by_path = {str(p): (img, faces) for (p, img), faces in zip(readable, detections)}
+    results = []
+    for img_path in image_paths:
+        records, embeddings = [], []
+        if img_path in faces_by_path:
+            img, faces = faces_by_path[img_path]
+            records, embeddings, crops = extract_faces(faces, img, Path(img_path), output_dir)
+            write_crops(crops)
+        results.append((img_path, hashes[img_path], records, embeddings))
+    dropped = 0
+    if _worker_gate is not None:
+        dropped, _worker_gate.dropped = _worker_gate.dropped, 0
+    return results, _worker_detector.take_stats() if _worker_detector else {}, dropped
 
 
 class FacePipeline:
     def __init__(self, use_gpu=True):
         self.use_gpu = use_gpu
         self.face_app = None
-        self.faces_data = []
-        self.embeddings = []
-        self.reference_embeddings = {}
+        self.store = None
+        self.journal = None
+        self.resumed = False
+        self.cluster_labels = np.empty(0, dtype=np.int64)
+        self.pending_writes = None  # crop write queue of a staged run
+        self._flushed_count = 0
+        self.gallery = None
+        self.prefilter = None  # --prefilter settings
+        self.detector = None
+        self.prefilter_stats = {}
+        self.quality = {"min_quality": 0.0, "mode": "downweight"}  # --min-quality settings
+        self.gate = QualityGate(**self.quality)
+        self.quality_dropped = 0
+
+    def open_store(self, output_dir: Path, mode: str = "w", embedding_format: str = "float32") -> FaceStore:
+        """Open the on-disk face store that detected faces are streamed into.
+
+        Mode "a" resumes a previous run: the store is cut back to the faces
+        of the images in its journal, which are then skipped. A resumed
+        store keeps the embedding format it was created with.
+        """
+        self.store = FaceStore(Path(output_dir) / STORE_DIRNAME, mode=mode, columns=face_columns(embedding_format))
+        if self.store.embedding_format != embedding_format:
+            print(f"Face store holds {self.store.embedding_format} embeddings; keeping that format")
+        self.journal = ImageJournal(self.store.directory)
+        self.resumed = mode == "a"
+        if mode == "a":
+            end = self.journal.load()
+            if len(self.store) > end:
+                print(f"Discarding {len(self.store) - end} faces past the last checkpoint")
+                self.store.truncate(end)
+                self.store.flush()
+            print(f"Resuming: {self.journal.entries} images and {len(self.store)} faces already checkpointed")
+        self._flushed_count = len(self.store)
+        return self.store
 
     def initialize(self):
         """Initialize the face detection model."""
-        if not INSIGHTFACE_AVAILABLE:
-            print("InsightFace not available. Running in demo mode (no actual face detection).")
+        if not insightface_available():
+            print("InsightFace not installed (pip install insightface onnxruntime-gpu). "
+                  "Running in demo mode (no actual face detection).")
             return False
 
         try:
             providers = ['CUDAExecutionProvider', 'CPUExecutionProvider'] if self.use_gpu else ['CPUExecutionProvider']
-            self.face_app = FaceAnalysis(name='buffalo_l', providers=providers)
-            self.face_app.prepare(ctx_id=0 if self.use_gpu else -1, det_size=(640, 640))
+            self.face_app = load_face_analysis(providers, ctx_id=0 if self.use_gpu else -1)
             print("Face detection model initialized successfully")
             return True
         except Exception as e:
             print(f"Failed to initialize face model: {e}")
             return False
 
-    def load_reference_faces(self, reference_dir: Path):
-        """Load reference photos of known persons."""
+    def configure_prefilter(self, mode: str, max_side: int = 640, audit_rate: float = 0.0):
+        """Enable two-tier detection (downscaled screening, full-resolution regions)."""
+        self.prefilter = {"mode": mode, "max_side": max_side, "audit_rate": audit_rate}
+        self.detector = make_detector(self.face_app, self.prefilter)
+        if self.detector is None and mode != "off":
+            print("Warning: face model has no separate detector, --prefilter ignored")
+
+    def configure_quality(self, min_quality: float, mode: str = "downweight"):
+        """Score every face; drop or down-weight those below min_quality."""
+        self.quality = {"min_quality": min_quality, "mode": mode}
+        self.gate = QualityGate(**self.quality)
+
+    def load_reference_faces(self, reference_dir: Path, cache_dir: Path = None):
+        """Load reference photos of known persons, embedding only photos not cached yet."""
         if not self.face_app or not reference_dir.exists():
             return
 
         print(f"Loading reference faces from {reference_dir}")
 
-        for person_dir in reference_dir.iterdir():
-            if not person_dir.is_dir():
-                continue
-
-            person_name = person_dir.name.replace("_", " ")
-            embeddings = []
-
-            for img_path in person_dir.glob("*.jpg"):
-                img = cv2.imread(str(img_path))
-                if img is None:
-                    continue
-
-                faces = self.face_app.get(img)
-                if faces:
-                    embeddings.append(faces[0].embedding)
-
-            for img_path in person_dir.glob("*.png"):
-                img = cv2.imread(str(img_path))
-                if img is None:
-                    continue
-
-                faces = self.face_app.get(img)
-                if faces:
-                    embeddings.append(faces[0].embedding)
-
-            if embeddings:
-                # Average embedding for this person
-                self.reference_embeddings[person_name] = np.mean(embeddings, axis=0)
-                print(f"  Loaded {len(embeddings)} reference photos for {person_name}")
-
-    def process_image(self, img_path: Path, output_dir: Path) -> list:
-        """Process a single image, detect faces, extract embeddings."""
-        faces_found = []
-
-        try:
+        def embed(img_path: Path):
             img = cv2.imread(str(img_path))
             if img is None:
-                return faces_found
-
-            if not self.face_app:
-                # Demo mode - no actual detection
-                return faces_found
-
-            # Detect faces
+                return None
             faces = self.face_app.get(img)
+            return faces[0].embedding if faces else None
+
+        self.gallery = ReferenceGallery(cache_dir or reference_dir / ".gallery")
+        stats = self.gallery.sync(reference_dir, embed)
+        for person_name, count in sorted(self.gallery.photo_counts().items()):
+            print(f"  Loaded {count} reference photos for {person_name}")
+        print(f"  Reference gallery: {stats['cached']} cached, {stats['embedded']} newly embedded, "
+              f"{stats['no_face']} without a face")
+
+    def add_faces(self, records: list, embeddings: list) -> list:
+        """Append detected faces to the store, assigning embedding indices."""
+        indices = self.store.append(records, embeddings)
+        for face_data, idx in zip(records, indices):
+            face_data["embedding_idx"] = idx
+        return records
+
+    def add_image(self, img_path: Path, sha256: str, records: list, embeddings: list) -> list:
+        """Add one processed image's faces and journal the image."""
+        skipped = not records and sha256 in self.journal.hashes
+        for face_data in records:
+            face_data["image_sha256"] = sha256
+        self.add_faces(records, embeddings)
+        self.journal.add(img_path, sha256, len(records), len(self.store), skipped)
+
+        # Checkpoint regularly so a crash loses at most FLUSH_EVERY faces
+        if len(self.store) - self._flushed_count >= FLUSH_EVERY or len(self.journal.pending) >= CHECKPOINT_IMAGES:
+            self.checkpoint()
+        return records
+
+    def add_duplicates(self, duplicates: list):
+        """Journal [(path, sha256)] copies of images whose faces are already stored.
+
+        They are not detected again; their faces list them as extra sources.
+        """
+        for img_path, sha256 in duplicates:
+            self.journal.add(img_path, sha256, 0, len(self.store), skipped=True)
+        self.checkpoint()
+
+    def sources_of(self, face_data: dict) -> list:
+        """Every path the face's image was found at (the detected copy first)."""
+        sources = self.journal.sources.get(face_data.get("image_sha256"), [])
+        return [face_data["source_image"]] + [p for p in sources if p != face_data["source_image"]]
+
+    def checkpoint(self):
+        """Flush the store, then journal the images its rows now cover."""
+        if self.pending_writes is not None:
+            self.pending_writes.join()
+        self.store.flush()
+        self.journal.commit()
+        self._flushed_count = len(self.store)
+
+    def process_image(self, img_path: Path, output_dir: Path, sha: str = None) -> list:
+        """Process a single image, detect faces, extract embeddings."""
+        if not self.face_app:
+            # Demo mode - no actual detection
+            return []
+
+        records, embeddings, sha = detect_faces(self.face_app, img_path, output_dir, self.detector, self.gate,
+                                                self.journal.hashes, sha)
+        return self.add_image(img_path, sha, records, embeddings)
+
+    def process_images_parallel(self, image_files: list, output_dir: Path, workers: int,
+                                batch_size: int = 16, progress=None, hashes: dict = None) -> int:
+        """Detect faces on CPU across worker processes and merge the results here.
+
+        Images are sent to workers in batches; each worker loads the model once
+        and gets an equal share of the CPU cores for ONNX Runtime. Hashes
+        already computed (path -> SHA-256) go with each batch.
+        """
+        hashes = hashes or {}
+
+        def submit(batch):
+            paths = [str(p) for p in batch]
+            return executor.submit(_detect_batch, paths, str(output_dir),
+                                   {str(p): hashes[p] for p in batch if p in hashes})
+
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        batches = [image_files[i:i + batch_size] for i in range(0, len(image_files), batch_size)]
+        total_faces = 0
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_cpu_worker,
+                                 initargs=(threads, self.prefilter, self.quality, self.journal.hashes)) as executor:
+            pending = set()
+            batch_iter = iter(batches)
+
+            # Keep a bounded number of batches in flight
+            for batch in itertools.islice(batch_iter, workers * 2):
+                pending.add(submit(batch))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results, prefilter_stats, dropped = future.result()
+                    merge_stats(self.prefilter_stats, prefilter_stats)
+                    self.quality_dropped += dropped
+                    for img_path, sha, records, embeddings in results:
+                        total_faces += len(self.add_image(img_path, sha, records, embeddings))
+                    if progress:
+                        progress(len(results), total_faces)
+
+                    batch = next(batch_iter, None)
+                    if batch is not None:
+                        pending.add(submit(batch))
+
+        return total_faces
+
+    def process_images_staged(self, image_files: list, output_dir: Path, decode_workers: int = 4,
+                              write_workers: int = 2, batch_size: int = 16, prefetch: int = 64,
+                              progress=None, hashes: dict = None) -> tuple[int, list, float]:
+        """Detect faces with decoding, inference and crop writing overlapped.
+
+        A pool of decoder threads reads images ahead into a bounded queue,
+        this thread runs the model on batches of them and hands crops to a
+        pool of writer threads through a second bounded queue. Decoders read
+        each file's bytes once and hash them unless ``hashes`` (path ->
+        SHA-256) already has them; cv2 releases the GIL for imdecode/imwrite,
+        so the stages really run in parallel.
+
+        Returns (faces found, [StageStats for decode, infer, write], wall seconds).
+        """
+        output_dir = Path(output_dir)
+        (output_dir / "face_crops").mkdir(parents=True, exist_ok=True)
+        hashes = hashes or {}
+
+        decode_stats = StageStats("decode", decode_workers)
+        infer_stats = StageStats("infer", 1)
+        write_stats = StageStats("write", write_workers)
+
+        paths = iter(image_files)
+        paths_lock = threading.Lock()
+        decoded = queue.Queue(maxsize=prefetch)
+        to_write = queue.Queue(maxsize=prefetch * 4)
+        decoder_done = object()
+
+        def decoder():
+            while True:
+                with paths_lock:
+                    img_path = next(paths, None)
+                if img_path is None:
+                    break
+                img, sha = None, None
+                try:
+                    with decode_stats.busy():
+                        img, sha = read_image(img_path, self.journal.hashes, hashes.get(img_path))
+                except Exception as e:
+                    print(f"Error reading {img_path}: {e}")
+                with decode_stats.waiting():
+                    decoded.put((img_path, img, sha))
+            decoded.put(decoder_done)
+
+        def writer():
+            while True:
+                with write_stats.waiting():
+                    job = to_write.get()
+                if job is None:
+                    to_write.task_done()
+                    break
+                try:
+                    with write_stats.busy(len(job)):
+                        write_crops(job)
+                except Exception as e:
+                    print(f"Error writing crops: {e}")
+                to_write.task_done()
+
+        # Checkpoints wait for queued crops, so journaled faces have their crops on disk
+        self.pending_writes = to_write
+
+        start = time.perf_counter()
+        decoders = [threading.Thread(target=decoder, name=f"face-decode-{i}", daemon=True)
+                    for i in range(decode_workers)]
+        writers = [threading.Thread(target=writer, name=f"face-write-{i}", daemon=True)
+                   for i in range(write_workers)]
+        for thread in decoders + writers:
+            thread.start()
+
+        total_faces = 0
+        running = decode_workers
+        while running:
+            # Block for one image, then take whatever else is ready up to batch_size
+            batch = []
+            with infer_stats.waiting():
+                item = decoded.get()
+            while True:
+                if item is decoder_done:
+                    running -= 1
+                else:
+                    batch.append(item)
+                if len(batch) >= batch_size or not running:
+                    break
+                try:
+                    item = decoded.get_nowait()
+                except queue.Empty:
+                    break
+
+            readable = [img for _, img, _ in batch if img is not None]
+            detections = []
+            if readable:
+                try:
+                    with infer_stats.busy(len(readable)):
+                        detections = run_detection(self.face_app, readable, self.detector, self.gate)
+                except Exception as e:
+                    print(f"Error processing batch starting at {batch[0][0]}: {e}")
+                    detections = [[] for _ in readable]
+
+            detections = iter(detections)
+            for img_path, img, sha in batch:
+                records, embeddings = [], []
+                if img is not None:
+                    records, embeddings, crops = extract_faces(next(detections), img, Path(img_path), output_dir)
+                    if crops:
+                        with infer_stats.waiting():
+                            to_write.put(crops)
+                total_faces += len(self.add_image(img_path, sha, records, embeddings))
+
+            if progress and batch:
+                progress(len(batch), total_faces)
+
+        for _ in writers:
+            to_write.put(None)
+        for thread in decoders + writers:
+            thread.join()
+        self.pending_writes = None
+
+        return total_faces, [decode_stats, infer_stats, write_stats], time.perf_counter() - start
+
+    def cluster_faces(self, backend: str = "auto", ann_k: int = 32, ann_ef: int = 64,
+                      state: ClusterState = None, assign_threshold: float = SIMILARITY_THRESHOLD,
+                      top_k: int = 3) -> dict:
+        """Cluster all face embeddings to group same persons.
+
+        With a ClusterState, faces are first assigned to the nearest existing
+        cluster and only the rest are clustered; the result is a delta. Store
+        rows the state already holds keep their labels and are neither added
+        to it again nor listed in the delta.
+
+        The result's "clusters" is a generator of cluster file entries
+        (save_results writes it); the cluster counts beside it are complete
+        once it has been consumed.
+        """
+        if not self.store or len(self.store) == 0:
+            return {"clusters": [], "assignments": {}}
 
-            for idx, face in enumerate(faces):
-                bbox = face.bbox.astype(int)
-                x1, y1, x2, y2 = bbox
-
-                # Skip small faces
-                if (x2 - x1) < MIN_FACE_SIZE or (y2 - y1) < MIN_FACE_SIZE:
+        self.store.flush()
+        print(f"Clustering {len(self.store)} faces...")
+
+        # Memory-mapped view of the store, no copy
+        embeddings_array = self.store.embeddings
+
+        # Faces below the quality floor (--quality-mode downweight) stay out of
+        # the clustering graph; they can only join clusters of better faces
+        n = len(embeddings_array)
+        good = np.ones(n, dtype=bool)
+        floor = self.gate.cluster_floor if self.gate else 0.0
+        if floor > 0 and "quality" in self.store.schema:
+            good = self.store.column("quality") >= floor
+
+        labels = np.full(n, -1, dtype=np.int64)
+        start = 0
+        first_new_id = None
+        if state is not None:
+            start = min(state.absorbed_faces(self.store.store_id), n)
+            if start:
+                labels[:start] = self.absorbed_labels(state, start, assign_threshold)
+                print(f"  {start} faces are already in the cluster state, clustering the {n - start} after them")
+            # Nearest existing centroid first, then cluster what is left
+            first_new_id = state.next_id
+            labels[start:], _ = state.assign(embeddings_array, assign_threshold,
+                                             rows=np.arange(start, n) if start else None)
+        fresh = np.arange(n) >= start
+
+        remaining = np.flatnonzero((labels < 0) & good & fresh)
+        if state is not None:
+            print(f"  Assigned {int((labels[start:] >= 0).sum())} faces to {len(state)} existing clusters, "
+                  f"clustering {len(remaining)}")
+
+        # Connected components of the similarity >= SIMILARITY_THRESHOLD graph
+        # (what DBSCAN with min_samples=2 computes), built in bounded memory
+        # (rows are read batch by batch, the subset is never copied out of the store)
+        remaining_labels = cluster_embeddings(
+            embeddings_array, SIMILARITY_THRESHOLD, backend=backend, k=ann_k, ef=ann_ef,
+            rows=remaining if len(remaining) < n else None,
+        )
+        clustered = remaining_labels >= 0
+        new_clusters = int(remaining_labels.max()) + 1 if clustered.any() else 0
+        first_id = state.allocate_ids(new_clusters) if state is not None else 0
+        labels[remaining[clustered]] = first_id + remaining_labels[clustered]
+
+        # Centroids come from the good faces only
+        core_labels = np.where(good & fresh, labels, -1)
+        if state is not None:
+            state.accumulate(embeddings_array, core_labels)
+            state.mark_absorbed(self.store.store_id, n)
+            centroid_of = state.centroid
+        else:
+            centroids = cluster_centroids(embeddings_array, core_labels)
+            centroid_of = centroids.__getitem__
+
+        low = np.flatnonzero((labels < 0) & ~good & fresh)
+        if len(low):
+            if state is not None:
+                attached, _ = state.assign(embeddings_array, assign_threshold, rows=low)
+            else:
+                attached, _ = assign_to_centroids(embeddings_array, centroids, SIMILARITY_THRESHOLD, rows=low)
+            labels[low] = np.where(attached >= 0, attached, UNCLUSTERED)
+            print(f"  {len(low)} low-quality faces: {int((attached >= 0).sum())} attached to clusters, "
+                  f"{int((attached < 0).sum())} left unclustered")
+
+        self.cluster_labels = labels
+        if start:
+            # The delta lists this run's faces only
+            labels = labels.copy()
+            labels[:start] = UNCLUSTERED
+
+        results = {
+            "clusters": None,
+            "total_faces": len(self.store),
+            "total_clusters": 0,
+            "known_persons": 0,
+            "unknown_clusters": 0,
+            "unclustered_low_quality": int((self.cluster_labels == UNCLUSTERED).sum()),
+        }
+        if state is not None:
+            results.update({
+                "state_id": state.state_id,
+                "generation": state.generation + 1,
+                "new_clusters": 0,
+                "updated_clusters": 0,
+            })
+        results["clusters"] = self.cluster_entries(labels, results, state, first_new_id, centroid_of, top_k)
+        return results
+
+    def cluster_entries(self, labels: np.ndarray, totals: dict, state: ClusterState, first_new_id,
+                        centroid_of, top_k: int):
+        """Yield the cluster file entries for labels, MATCH_BATCH clusters at a time.
+
+        Entries are matched to known persons one gallery matrix product per
+        batch and counted into totals as they are yielded; nothing is kept,
+        so the output is written in cluster order (the site sorts by label
+        and face count itself).
+        """
+        face_ids = self.store.columns["face_id"].view()
+        crop_paths = self.store.columns["crop_path"].view()
+        embeddings_array = self.store.embeddings
+
+        for batch in iter_chunks(cluster_members(labels), MATCH_BATCH):
+            entries = []
+            pending = []  # (entry, centroid) awaiting reference matching
+            for cluster_id, face_indices in batch:
+                entry = {
+                    "cluster_id": str(cluster_id),
+                    "face_count": len(face_indices),
+                    "sample_face": string_at(crop_paths, face_indices[0]) if len(face_indices) else None,
+                    "face_ids": [string_at(face_ids, i) for i in face_indices]
+                }
+                entries.append(entry)
+
+                if state is not None and isinstance(cluster_id, int):
+                    entry["total_face_count"] = state.count(cluster_id)
+
+                if state is not None and isinstance(cluster_id, int) and cluster_id < first_new_id:
+                    # Existing cluster keeps the label it was given when created
+                    known = state.label(cluster_id)
+                    entry.update({
+                        "status": "updated",
+                        "label": known["label"],
+                        "is_known_person": known["label"] is not None,
+                        "match_confidence": known["match_confidence"],
+                    })
                     continue
 
-                # Expand bbox slightly for crop
-                h, w = img.shape[:2]
-                pad = int((x2 - x1) * 0.1)
-                x1 = max(0, x1 - pad)
-                y1 = max(0, y1 - pad)
-                x2 = min(w, x2 + pad)
-                y2 = min(h, y2 + pad)
-
-                # Crop face
-                face_crop = img[y1:y2, x1:x2]
-
-                # Generate face ID
-                face_id = f"{img_path.stem}_face{idx}"
-
-                # Save face crop
-                crops_dir = output_dir / "face_crops"
-                crops_dir.mkdir(parents=True, exist_ok=True)
-                crop_path = crops_dir / f"{face_id}.jpg"
-                cv2.imwrite(str(crop_path), face_crop)
-
-                # Store face data
-                face_data = {
-                    "face_id": face_id,
-                    "source_image": str(img_path),
-                    "bbox": {"x": int(x1), "y": int(y1), "w": int(x2-x1), "h": int(y2-y1)},
-                    "confidence": float(face.det_score),
-                    "crop_path": str(crop_path),
-                    "embedding_idx": len(self.embeddings)
-                }
+                if state is not None:
+                    entry["status"] = "new" if isinstance(cluster_id, int) else "singleton"
 
-                faces_found.append(face_data)
-                self.faces_data.append(face_data)
-                self.embeddings.append(face.embedding)
+                # Get cluster centroid
+                if isinstance(cluster_id, int):
+                    centroid = centroid_of(cluster_id)
+                else:
+                    centroid = normalize_rows(embeddings_array[face_indices])[0]
+                pending.append((entry, centroid))
 
-        except Exception as e:
-            print(f"Error processing {img_path}: {e}")
+            self.match_clusters(pending, state, top_k)
 
-        return faces_found
+            for entry in entries:
+                totals["total_clusters"] += 1
+                totals["known_persons" if entry["is_known_person"] else "unknown_clusters"] += 1
+                if entry.get("status") in ("new", "updated"):
+                    totals[f"{entry['status']}_clusters"] += 1
+            yield from entries
 
-    def cluster_faces(self) -> dict:
-        """Cluster all face embeddings to group same persons."""
-        if not self.embeddings:
-            return {"clusters": [], "assignments": {}}
-
-        print(f"Clustering {len(self.embeddings)} faces...")
-
-        embeddings_array = np.array(self.embeddings)
-
-        # Normalize embeddings
-        norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True)
-        embeddings_normalized = embeddings_array / norms
-
-        # DBSCAN clustering with cosine distance
-        # Convert similarity threshold to distance
-        eps = 1 - SIMILARITY_THRESHOLD
-
-        clustering = DBSCAN(
-            eps=eps,
-            min_samples=2,
-            metric='cosine'
-        ).fit(embeddings_normalized)
-
-        labels = clustering.labels_
-
-        # Group faces by cluster
-        clusters = defaultdict(list)
-        for idx, label in enumerate(labels):
-            cluster_id = int(label) if label >= 0 else f"singleton_{idx}"
-            clusters[cluster_id].append(self.faces_data[idx])
-
-        # Match clusters to known persons
-        cluster_info = []
-        for cluster_id, faces in clusters.items():
-            # Get cluster centroid
-            face_indices = [f["embedding_idx"] for f in faces]
-            cluster_embeddings = embeddings_array[face_indices]
-            centroid = np.mean(cluster_embeddings, axis=0)
-
-            # Try to match to known person
-            label = None
-            is_known = False
-            best_similarity = 0
-
-            for person_name, ref_embedding in self.reference_embeddings.items():
-                sim = cosine_similarity([centroid], [ref_embedding])[0][0]
-                if sim > KNOWN_PERSON_THRESHOLD and sim > best_similarity:
-                    label = person_name
-                    is_known = True
-                    best_similarity = sim
-
-            cluster_info.append({
-                "cluster_id": str(cluster_id),
-                "label": label,
-                "is_known_person": is_known,
-                "match_confidence": float(best_similarity) if is_known else None,
-                "face_count": len(faces),
-                "sample_face": faces[0]["crop_path"] if faces else None,
-                "face_ids": [f["face_id"] for f in faces]
+    def match_clusters(self, pending: list, state: ClusterState, top_k: int):
+        """Label (entry, centroid) pairs with their best reference match, one matrix product."""
+        if not pending:
+            return
+        entries, centroids = zip(*pending)
+        if self.gallery is not None and len(self.gallery):
+            top_idx, top_scores = self.gallery.match(np.stack(centroids), top_k)
+        else:
+            top_idx = top_scores = np.empty((len(entries), 0))
+        for entry, idx, scores in zip(entries, top_idx, top_scores):
+            candidates = [{"person": self.gallery.persons[i], "score": round(float(score), 4)}
+                          for i, score in zip(idx, scores)]
+            best = candidates[0] if candidates and candidates[0]["score"] > KNOWN_PERSON_THRESHOLD else None
+            entry.update({
+                "label": best["person"] if best else None,
+                "is_known_person": best is not None,
+                "match_confidence": best["score"] if best else None,
             })
-
-        # Sort: known persons first, then by face count
-        cluster_info.sort(key=lambda x: (not x["is_known_person"], -x["face_count"]))
-
-        return {
-            "clusters": cluster_info,
-            "total_faces": len(self.faces_data),
-            "total_clusters": len(clusters),
-            "known_persons": sum(1 for c in cluster_info if c["is_known_person"]),
-            "unknown_clusters": sum(1 for c in cluster_info if not c["is_known_person"])
-        }
+            if candidates:
+                entry["candidates"] = candidates
+            if entry.get("status") == "new":
+                state.set_label(int(entry["cluster_id"]), entry["label"], entry["match_confidence"])
+
+    def absorbed_labels(self, state: ClusterState, start: int, threshold: float) -> np.ndarray:
+        """Cluster labels of the first `start` store rows, which state already holds.
+
+        They are read back from the cluster_labels.npy the state's last run
+        wrote next to the store, or else taken from the nearest centroid.
+        """
+        output_dir = self.store.directory.parent
+        previous = load_cluster_labels(output_dir)
+        if previous is not None and len(previous) >= start and \
+                read_summary(output_dir).get("clusters", {}).get("state_id") == state.state_id:
+            return previous[:start]
+        ids, _ = state.assign(self.store.embeddings, threshold, rows=np.arange(start))
+        return ids
+
+    def face_output(self, face_data: dict) -> dict:
+        """A store record as written to faces.jsonl, with all its source images."""
+        face_data["source_images"] = self.sources_of(face_data)
+        face_data["documents"] = sorted({doc for doc in map(document_for_image, face_data["source_images"]) if doc})
+        return face_data
 
     def save_results(self, output_dir: Path, cluster_results: dict):
-        """Save all results to JSON files."""
+        """Save results as line-delimited files plus the outputs.json summary."""
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Save clusters
-        clusters_path = output_dir / "clusters.json"
-        with open(clusters_path, "w") as f:
-            json.dump(cluster_results, f, indent=2)
-
-        # Save all faces
-        faces_path = output_dir / "faces.json"
-        with open(faces_path, "w") as f:
-            json.dump({
-                "total_faces": len(self.faces_data),
-                "processed_at": datetime.now().isoformat(),
-                "faces": self.faces_data
-            }, f, indent=2)
-
-        # Save embeddings (numpy format for later use)
-        if self.embeddings:
-            embeddings_path = output_dir / "embeddings.npy"
-            np.save(embeddings_path, np.array(self.embeddings))
+        # Faces: append the store rows earlier runs haven't written (embeddings stay in face_store/)
+        self.store.flush()
+        summary = read_summary(output_dir) if self.resumed else {}
+        written = summary.get("faces_written", 0)
+        if written > len(self.store):
+            written = 0
+        faces_bytes = append_jsonl(
+            output_dir / FACES_FILENAME,
+            (self.face_output(face_data) for face_data in self.store.iter_records(start=written)),
+            summary.get("faces_bytes", 0) if written else 0,
+        )
+
+        # Clusters are recomputed every run; incremental runs write a delta against the cluster state
+        clusters_name = clusters_filename("state_id" in cluster_results)
+        write_jsonl(output_dir / clusters_name, cluster_results["clusters"])
+        labels_tmp = output_dir / f".{LABELS_FILENAME}.tmp.npy"
+        np.save(labels_tmp, np.asarray(self.cluster_labels, dtype=np.int64))
+        labels_tmp.replace(output_dir / LABELS_FILENAME)
+
+        # The summary commits the files above
+        write_summary(output_dir, {
+            "processed_at": datetime.now().isoformat(),
+            "faces_written": len(self.store),
+            "faces_bytes": faces_bytes,
+            "clusters": {"file": clusters_name,
+                         **{key: value for key, value in cluster_results.items() if key != "clusters"}},
+        })
 
         print(f"Results saved to {output_dir}")
 
@@ -267,8 +874,45 @@ def main():
     parser.add_argument("--input", "-i", required=True, help="Input directory with extracted images")
     parser.add_argument("--output", "-o", required=True, help="Output directory for faces")
     parser.add_argument("--reference", "-r", help="Directory with reference photos of known persons")
+    parser.add_argument("--reference-cache",
+                        help="Cache of reference photo embeddings (default: REFERENCE/.gallery)")
+    parser.add_argument("--top-k", type=int, default=3, help="Reference candidates recorded per cluster")
     parser.add_argument("--gpu", action="store_true", help="Use GPU acceleration")
-    parser.add_argument("--workers", "-w", type=int, default=1, help="Not used (single-threaded for GPU)")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="CPU worker processes (ignored with --gpu, which runs single-process)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per inference batch / CPU worker task")
+    parser.add_argument("--decode-workers", type=int, default=4, help="Threads reading images ahead of the model")
+    parser.add_argument("--write-workers", type=int, default=2, help="Threads writing face crops")
+    parser.add_argument("--prefetch", type=int, default=64, help="Decoded images buffered ahead of the model")
+    parser.add_argument("--prefilter", choices=PREFILTER_MODES, default="off",
+                        help="Screen images on a downscaled copy (skin: reject skin-free colour images first) "
+                             "and re-detect only candidate regions at full resolution")
+    parser.add_argument("--prefilter-size", type=int, default=640, help="Long side of the screening copy")
+    parser.add_argument("--prefilter-audit", type=float, default=0.0,
+                        help="Fraction of images also run full-frame to measure the prefilter's recall")
+    parser.add_argument("--min-quality", type=float, default=0.0,
+                        help="Face quality floor in [0, 1] (detection score, pose, sharpness, size); 0 records only")
+    parser.add_argument("--quality-mode", choices=QUALITY_MODES, default="downweight",
+                        help="drop: don't embed faces below --min-quality; downweight: keep them out of the "
+                             "clustering graph, only attaching them to clusters of better faces")
+    parser.add_argument("--embedding-format", choices=list(EMBEDDING_FORMATS), default="float32",
+                        help="Storage format of face embeddings: float16 halves and int8 (per-vector scale) "
+                             "quarters the store; check the cost with benchmark_embeddings.py")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run in OUTPUT, skipping images already checkpointed")
+    parser.add_argument("--cluster-only", action="store_true",
+                        help="Skip detection and cluster the faces checkpointed in OUTPUT")
+    parser.add_argument("--no-overlap", action="store_true",
+                        help="Read, detect and write one image at a time (single process only)")
+    parser.add_argument("--cluster-backend", choices=["auto", "exact", "hnsw"], default="auto",
+                        help="Neighbour search for clustering: exact (small runs) or hnsw ANN (large runs)")
+    parser.add_argument("--ann-k", type=int, default=32, help="Neighbours per face for the hnsw backend")
+    parser.add_argument("--ann-ef", type=int, default=64, help="HNSW search breadth (higher = better recall)")
+    parser.add_argument("--cluster-state",
+                        help="Directory with cluster centroids kept across runs; assigns new faces to existing "
+                             "clusters and writes clusters_delta.jsonl instead of clusters.jsonl")
+    parser.add_argument("--assign-threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="Minimum centroid similarity to join an existing cluster (with --cluster-state)")
     args = parser.parse_args()
 
     input_dir = Path(args.input)
@@ -278,52 +922,123 @@ def main():
         print(f"Error: Input directory does not exist: {input_dir}")
         sys.exit(1)
 
+    require(cv2)
+
     # Initialize pipeline
     pipeline = FacePipeline(use_gpu=args.gpu)
     model_ready = pipeline.initialize()
+    pipeline.open_store(output_dir, mode="a" if args.resume or args.cluster_only else "w",
+                        embedding_format=args.embedding_format)
+    pipeline.configure_quality(args.min_quality, args.quality_mode)
+    if model_ready and args.prefilter != "off":
+        pipeline.configure_prefilter(args.prefilter, args.prefilter_size, args.prefilter_audit)
 
     # Load reference faces if provided
     if args.reference and model_ready:
-        pipeline.load_reference_faces(Path(args.reference))
+        pipeline.load_reference_faces(Path(args.reference),
+                                      Path(args.reference_cache) if args.reference_cache else None)
 
     # Find all images
-    image_extensions = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
     image_files = []
-    for ext in image_extensions:
-        image_files.extend(input_dir.rglob(f"*{ext}"))
-        image_files.extend(input_dir.rglob(f"*{ext.upper()}"))
-
-    print(f"Found {len(image_files)} images in {input_dir}")
-
-    if not image_files:
-        print("No images found!")
-        sys.exit(1)
+    if not args.cluster_only:
+        image_files = find_images(input_dir)
+        print(f"Found {len(image_files)} images in {input_dir}")
+
+        if not image_files and not args.resume:
+            print("No images found!")
+            sys.exit(1)
+
+        if args.resume:
+            # Unchanged files are skipped by stat; moved or touched ones by content hash
+            remaining = [p for p in image_files if not pipeline.journal.unchanged(p)]
+            print(f"Skipping {len(image_files) - len(remaining)} images already checkpointed")
+            image_files = remaining
+
+    # Hash contents up front: each distinct image is detected once, copies only journaled
+    duplicates = []
+    hashes = {}
+    if image_files:
+        start = time.perf_counter()
+        hashes = hash_images(image_files, args.decode_workers)
+        seen = set(pipeline.journal.hashes)
+        unique = []
+        for img_path in image_files:
+            sha = hashes[img_path]
+            if sha is not None and sha in seen:
+                duplicates.append((img_path, sha))
+            else:
+                if sha is not None:
+                    seen.add(sha)
+                unique.append(img_path)
+        print(f"Hashed {len(image_files)} images in {time.perf_counter() - start:.1f}s: "
+              f"{len(unique)} unique, {len(duplicates)} duplicate copies skipped")
+        image_files = unique
 
     # Process all images
     total_faces = 0
+    stages = None
     with tqdm(total=len(image_files), desc="Processing images") as pbar:
-        for img_path in image_files:
-            faces = pipeline.process_image(img_path, output_dir)
-            total_faces += len(faces)
-            pbar.update(1)
-            pbar.set_postfix({"faces": total_faces})
-
-    # Cluster faces
+        def progress(images_done, faces_so_far):
+            pbar.update(images_done)
+            pbar.set_postfix({"faces": faces_so_far})
+
+        if model_ready and not args.gpu and args.workers > 1:
+            print(f"CPU mode: {args.workers} workers x {max(1, (os.cpu_count() or 1) // args.workers)} ONNX threads")
+            total_faces = pipeline.process_images_parallel(
+                image_files, output_dir, args.workers, args.batch_size, progress, hashes
+            )
+        elif model_ready and not args.no_overlap:
+            total_faces, stages, stage_seconds = pipeline.process_images_staged(
+                image_files, output_dir, args.decode_workers, args.write_workers,
+                args.batch_size, args.prefetch, progress, hashes
+            )
+        else:
+            for img_path in image_files:
+                faces = pipeline.process_image(img_path, output_dir, hashes.get(img_path))
+                total_faces += len(faces)
+                pbar.update(1)
+                pbar.set_postfix({"faces": total_faces})
+    pipeline.add_duplicates(duplicates)
+
+    if stages:
+        print(stage_report(stages, stage_seconds))
+    if pipeline.detector is not None:
+        merge_stats(pipeline.prefilter_stats, pipeline.detector.take_stats())
+    if pipeline.prefilter_stats:
+        print(prefilter_report(pipeline.prefilter_stats))
+    pipeline.quality_dropped += pipeline.gate.dropped
+    if pipeline.quality_dropped:
+        print(f"Quality gate: dropped {pipeline.quality_dropped} faces below {args.min_quality}")
+
+    # Cluster faces (including those checkpointed by earlier runs when resuming)
+    new_faces = total_faces
+    total_faces = len(pipeline.store)
     if total_faces > 0:
-        cluster_results = pipeline.cluster_faces()
+        state = ClusterState(Path(args.cluster_state)) if args.cluster_state else None
+        cluster_results = pipeline.cluster_faces(args.cluster_backend, args.ann_k, args.ann_ef,
+                                                 state, args.assign_threshold, args.top_k)
         pipeline.save_results(output_dir, cluster_results)
+        if state is not None:
+            # Only after the delta is on disk, so a failed run can simply be repeated
+            state.save()
+            print(f"Cluster state generation {state.generation}: {len(state)} clusters in {args.cluster_state}")
     else:
         print("No faces detected!")
         cluster_results = {"clusters": [], "total_faces": 0}
+    pipeline.store.close()
 
     # Print summary
     print("\n" + "=" * 50)
     print("FACE PIPELINE COMPLETE")
     print("=" * 50)
     print(f"Total faces detected: {total_faces}")
+    if args.resume or args.cluster_only:
+        print(f"Faces detected this run: {new_faces}")
     print(f"Total clusters: {cluster_results.get('total_clusters', 0)}")
     print(f"Known persons matched: {cluster_results.get('known_persons', 0)}")
     print(f"Unknown clusters: {cluster_results.get('unknown_clusters', 0)}")
+    if "state_id" in cluster_results:
+        print(f"New / updated clusters: {cluster_results['new_clusters']} / {cluster_results['updated_clusters']}")
     print(f"Output: {output_dir}")
     print("=" * 50)
 
@@ -13,20 +13,35 @@ import os
 import sys
 from pathlib import Path
 from datetime import datetime
-import re
 
 try:
     import psycopg2
     from psycopg2.extras import execute_values
-    import numpy as np
     from tqdm import tqdm
 except ImportError:
     print("Missing dependencies. Install with: pip install psycopg2-binary numpy tqdm")
     sys.exit(1)
 
+from pipeline_core import (
+    iter_document_metadata,
+    parse_dataset_number,
+    read_metadata,
+    read_text,
+    resolve_document_type,
+    text_path_for,
+)
+from pipeline_core.aggregates import AGGREGATES_FILENAME, read_aggregates
+from pipeline_core.face_checkpoint import ImageJournal
+from pipeline_core.face_outputs import cluster_id_for, iter_chunks, iter_clusters, iter_faces, load_cluster_labels
+from pipeline_core.face_search import document_for_image
+from pipeline_core.face_store import STORE_DIRNAME, FaceStore, load_embeddings
+
 
 BATCH_SIZE = 1000
 
+# Significant digits sent per embedding value: enough to round-trip the column type
+VECTOR_DIGITS = {"vector": 9, "halfvec": 5}
+
 
 def get_database_connection():
     """Create PostgreSQL connection from environment variables."""
@@ -45,55 +60,12 @@ def get_database_connection():
     )
 
 
-def extract_dataset_number(path: Path) -> int:
-    """Extract dataset number from path."""
-    path_str = str(path)
-
-    # Look for patterns like DataSet_10, DataSet 10, dataset10, etc.
-    patterns = [
-        r'[Dd]ata[Ss]et[_\s]?(\d+)',
-        r'DS(\d+)',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, path_str)
-        if match:
-            return int(match.group(1))
-
-    return 0
-
-
-def classify_document_type(filename: str, text: str = "") -> str:
-    """Classify document type based on filename and content."""
-    filename_lower = filename.lower()
-    text_lower = (text or "")[:5000].lower()
-
-    if "302" in filename or "fbi" in filename_lower or "federal bureau" in text_lower:
-        return "fbi_report"
-    elif "deposition" in filename_lower or "deposition" in text_lower:
-        return "transcript"
-    elif "email" in filename_lower or ("from:" in text_lower and "to:" in text_lower):
-        return "email"
-    elif "court" in filename_lower or "plaintiff" in text_lower or "defendant" in text_lower:
-        return "court_doc"
-    elif any(ext in filename_lower for ext in [".jpg", ".png", ".gif", ".bmp"]):
-        return "photo"
-    elif any(ext in filename_lower for ext in [".mp4", ".avi", ".mov", ".wmv"]):
-        return "video"
-    else:
-        return "other"
-
-
 def load_documents(conn, input_dir: Path) -> dict:
     """Load documents from OCR metadata JSONs."""
     cur = conn.cursor()
 
     # Find all metadata JSON files (not image metadata)
-    metadata_files = []
-    for meta_file in input_dir.rglob("*.json"):
-        if "_images" not in meta_file.name and "manifest" not in meta_file.name:
-            if "metadata" in str(meta_file):
-                metadata_files.append(meta_file)
+    metadata_files = list(iter_document_metadata(input_dir))
 
     print(f"Found {len(metadata_files)} document metadata files")
 
@@ -102,20 +74,15 @@ def load_documents(conn, input_dir: Path) -> dict:
 
     for meta_file in tqdm(metadata_files, desc="Loading documents"):
         try:
-            with open(meta_file, "r") as f:
-                meta = json.load(f)
+            meta = read_metadata(meta_file)
 
             filename = meta.get("filename", meta_file.stem)
-            dataset_num = extract_dataset_number(meta_file)
+            dataset_num = parse_dataset_number(meta_file)
 
             # Load text content if available
-            text_content = ""
-            text_file = meta_file.parent.parent / "text" / f"{meta_file.stem}.txt"
-            if text_file.exists():
-                with open(text_file, "r", encoding="utf-8", errors="ignore") as f:
-                    text_content = f.read()
+            text_content = read_text(text_path_for(meta_file))
 
-            doc_type = classify_document_type(filename, text_content)
+            doc_type = resolve_document_type(meta, text=text_content)
 
             documents.append((
                 dataset_num,
@@ -247,154 +214,217 @@ def load_extracted_images(conn, input_dir: Path, doc_id_map: dict) -> dict:
     return image_id_map
 
 
-def load_face_clusters(conn, faces_dir: Path) -> dict:
-    """Load face clusters from clusters.json."""
-    cur = conn.cursor()
-
-    clusters_file = faces_dir / "clusters.json"
-    if not clusters_file.exists():
-        print(f"No clusters.json found at {clusters_file}")
-        return {}
-
-    with open(clusters_file, "r") as f:
-        data = json.load(f)
-
-    clusters = data.get("clusters", [])
-    print(f"Found {len(clusters)} face clusters")
-
-    cluster_id_map = {}  # original_cluster_id -> database id
-
-    cluster_rows = []
+def cluster_rows_for(clusters: list, state_id) -> list:
+    """face_clusters rows for a chunk of cluster entries, plus each entry's cluster_id."""
+    rows = []
     for cluster in clusters:
-        cluster_rows.append((
+        # Clusters from a cluster state have a stable key; singletons don't
+        pipeline_id = None
+        if state_id and cluster.get("status") in ("new", "updated"):
+            pipeline_id = f"{state_id}:{cluster['cluster_id']}"
+
+        rows.append((
             cluster.get("label"),
             cluster.get("sample_face"),
-            cluster.get("face_count", 0),
+            cluster.get("total_face_count", cluster.get("face_count", 0)),
             cluster.get("is_known_person", False),
-            cluster.get("cluster_id", "")
+            cluster.get("cluster_id", ""),
+            pipeline_id
         ))
+    return rows
+
+
+def create_cluster_keys_table(conn):
+    """Session table mapping each cluster file entry's cluster_id to its database id.
+
+    Kept in PostgreSQL rather than a dict so the loader's memory doesn't grow
+    with the number of clusters (one per singleton face).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS face_cluster_keys (
+            cluster_key TEXT PRIMARY KEY,
+            cluster_id INTEGER NOT NULL
+        )
+    """)
+    cur.execute("TRUNCATE face_cluster_keys")
+    conn.commit()
 
-    if not cluster_rows:
-        return cluster_id_map
 
-    # Insert clusters
+def load_face_clusters(conn, faces_dir: Path) -> int:
+    """Load face clusters from clusters.jsonl or an incremental clusters_delta.jsonl, in chunks.
+
+    Returns the number of clusters loaded; their database ids go to face_cluster_keys.
+    """
+    create_cluster_keys_table(conn)
+    cur = conn.cursor()
+
+    summary, clusters, clusters_file = iter_clusters(faces_dir)
+    if clusters_file is None:
+        print(f"No clusters file found in {faces_dir}")
+        return 0
+
+    state_id = summary.get("state_id")
+    print(f"Found {summary.get('total_clusters', 'unknown number of')} face clusters in {clusters_file.name}")
+
+    # Insert clusters; keyed ones update the existing row instead of adding one,
+    # keeping any label already set on it
     insert_sql = """
+        INSERT INTO face_clusters (label, sample_image_path, face_count, is_known_person, pipeline_cluster_id)
+        VALUES %s
+        ON CONFLICT (pipeline_cluster_id) DO UPDATE SET
+            face_count = EXCLUDED.face_count,
+            label = COALESCE(face_clusters.label, EXCLUDED.label),
+            is_known_person = face_clusters.is_known_person OR EXCLUDED.is_known_person,
+            sample_image_path = COALESCE(face_clusters.sample_image_path, EXCLUDED.sample_image_path)
+        RETURNING id
+    """ if state_id else """
         INSERT INTO face_clusters (label, sample_image_path, face_count, is_known_person)
         VALUES %s
         RETURNING id
     """
 
-    try:
-        values = [(r[0], r[1], r[2], r[3]) for r in cluster_rows]
-        result = execute_values(cur, insert_sql, values, fetch=True)
-        for i, row in enumerate(result):
-            cluster_id_map[cluster_rows[i][4]] = row[0]
-        conn.commit()
-    except Exception as e:
-        print(f"Error inserting clusters: {e}")
-        conn.rollback()
+    loaded = 0
+    for chunk in iter_chunks(clusters, BATCH_SIZE):
+        cluster_rows = cluster_rows_for(chunk, state_id)
+        try:
+            if state_id:
+                values = [(r[0], r[1], r[2], r[3], r[5]) for r in cluster_rows]
+            else:
+                values = [(r[0], r[1], r[2], r[3]) for r in cluster_rows]
+            result = execute_values(cur, insert_sql, values, fetch=True, page_size=len(values))
+            keys = [(cluster_rows[i][4], row[0]) for i, row in enumerate(result)]
+            execute_values(cur, """
+                INSERT INTO face_cluster_keys (cluster_key, cluster_id) VALUES %s
+                ON CONFLICT (cluster_key) DO UPDATE SET cluster_id = EXCLUDED.cluster_id
+            """, keys, page_size=len(keys))
+            conn.commit()
+            loaded += len(keys)
+        except Exception as e:
+            print(f"Error inserting clusters: {e}")
+            conn.rollback()
 
-    print(f"Loaded {len(cluster_id_map)} face clusters")
-    return cluster_id_map
+    print(f"Loaded {loaded} face clusters")
+    return loaded
 
 
-def load_faces(conn, faces_dir: Path, image_id_map: dict, doc_id_map: dict, cluster_id_map: dict):
-    """Load faces from faces.json with embeddings."""
-    cur = conn.cursor()
+def embedding_column_type(cur) -> str:
+    """Return 'halfvec' if faces.embedding was converted by migration 004, else 'vector'."""
+    cur.execute("""
+        SELECT t.typname FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = 'faces'::regclass AND a.attname = 'embedding'
+    """)
+    row = cur.fetchone()
+    return "halfvec" if row and row[0] == "halfvec" else "vector"
 
-    faces_file = faces_dir / "faces.json"
-    embeddings_file = faces_dir / "embeddings.npy"
 
-    if not faces_file.exists():
-        print(f"No faces.json found at {faces_file}")
-        return
+def format_vector(values, digits: int) -> str:
+    """pgvector text literal with the given number of significant digits."""
+    return "[" + ",".join(f"{x:.{digits}g}" for x in values) + "]"
 
-    with open(faces_file, "r") as f:
-        data = json.load(f)
 
-    faces = data.get("faces", [])
-    print(f"Found {len(faces)} faces")
+def legacy_face_clusters(faces_dir: Path) -> dict:
+    """face_id -> cluster_id from a cluster file's face lists (runs without cluster_labels.npy)."""
+    face_to_cluster = {}
+    _, clusters, _ = iter_clusters(faces_dir)
+    for cluster in clusters:
+        for face_id in cluster.get("face_ids", []):
+            face_to_cluster[face_id] = cluster.get("cluster_id", "")
+    return face_to_cluster
 
-    # Load embeddings
-    embeddings = None
-    if embeddings_file.exists():
-        embeddings = np.load(embeddings_file)
-        print(f"Loaded {len(embeddings)} embeddings")
 
-    # Load clusters.json to get face-to-cluster mapping
-    face_to_cluster = {}
-    clusters_file = faces_dir / "clusters.json"
-    if clusters_file.exists():
-        with open(clusters_file, "r") as f:
-            cluster_data = json.load(f)
-        for cluster in cluster_data.get("clusters", []):
-            cluster_id = cluster.get("cluster_id", "")
-            db_cluster_id = cluster_id_map.get(cluster_id)
-            for face_id in cluster.get("face_ids", []):
-                face_to_cluster[face_id] = db_cluster_id
-
-    face_rows = []
-    for face in faces:
-        face_id = face.get("face_id", "")
-        source_image = Path(face.get("source_image", "")).name
-
-        # Find image_id
-        image_id = image_id_map.get(source_image)
-
-        # Find document_id from source path
-        doc_id = None
-        source_path = face.get("source_image", "")
-        for filename, did in doc_id_map.items():
-            if filename in source_path:
-                doc_id = did
-                break
-
-        bbox = face.get("bbox", {})
-        embedding_idx = face.get("embedding_idx")
-
-        # Get embedding as list for pgvector
-        embedding_list = None
-        if embeddings is not None and embedding_idx is not None and embedding_idx < len(embeddings):
-            embedding_list = embeddings[embedding_idx].tolist()
-
-        cluster_id = face_to_cluster.get(face_id)
-
-        face_rows.append((
-            image_id,
-            doc_id,
-            json.dumps(bbox),
-            embedding_list,
-            cluster_id,
-            face.get("confidence", 0),
-            face.get("crop_path")
-        ))
+def load_faces(conn, faces_dir: Path, image_id_map: dict, doc_id_map: dict):
+    """Stream faces with embeddings into the faces table, BATCH_SIZE at a time."""
+    cur = conn.cursor()
 
-    if not face_rows:
-        return
+    store_dir = faces_dir / STORE_DIRNAME
+    journal = None
+    if FaceStore.exists(store_dir):
+        # Columnar store written by face_pipeline.py: stream records, no JSON parse
+        store = FaceStore.open(store_dir)
+        total, faces = len(store), store.iter_records(chunk_size=BATCH_SIZE)
+        print(f"Found {total} faces in {store_dir}")
+        # Every path each detected image was found at (duplicate copies are detected once)
+        journal = ImageJournal(store_dir)
+        journal.load()
+    else:
+        total, faces = iter_faces(faces_dir)
+        if total is None:
+            print(f"No faces found in {faces_dir}")
+            return
+        print(f"Found {total} faces")
+
+    # Memory-mapped embeddings (face store or legacy embeddings.npy)
+    embeddings = load_embeddings(faces_dir)
+    if embeddings is not None:
+        print(f"Loaded {len(embeddings)} embeddings")
 
-    # Insert faces in batches
-    # Note: pgvector expects the embedding as a string representation
-    for i in tqdm(range(0, len(face_rows), BATCH_SIZE), desc="Loading faces"):
-        batch = face_rows[i:i + BATCH_SIZE]
+    vector_type = embedding_column_type(cur)
+    digits = VECTOR_DIGITS[vector_type]
+    print(f"Embedding column type: {vector_type}")
+
+    # Face-to-cluster mapping: memory-mapped labels per store row, else the cluster file's face lists
+    labels = load_cluster_labels(faces_dir)
+    face_to_cluster = legacy_face_clusters(faces_dir) if labels is None else None
+
+    def cluster_key_for(face):
+        """cluster_id of the face's cluster file entry, resolved through face_cluster_keys."""
+        idx = face.get("embedding_idx")
+        if labels is not None and idx is not None and idx < len(labels):
+            return cluster_id_for(int(labels[idx]), idx)
+        return (face_to_cluster or {}).get(face.get("face_id", ""))
+
+    # Documents by filename stem, which is the document id extracted image names start with
+    doc_id_by_stem = {Path(filename).stem: did for filename, did in doc_id_map.items()}
+
+    # Note: pgvector expects the embedding as a string representation,
+    # cast to the column's type (vector, or halfvec after migration 004)
+    loaded = 0
+    with tqdm(total=total, desc="Loading faces") as pbar:
+        for chunk in iter_chunks(faces, BATCH_SIZE):
+            for face in chunk:
+                bbox = json.dumps(face.get("bbox", {}))
+                embedding_idx = face.get("embedding_idx")
 
-        for row in batch:
-            try:
                 embedding_str = None
-                if row[3] is not None:
-                    embedding_str = "[" + ",".join(str(x) for x in row[3]) + "]"
-
-                cur.execute("""
-                    INSERT INTO faces
-                    (image_id, document_id, bounding_box, embedding, cluster_id, confidence, face_crop_path)
-                    VALUES (%s, %s, %s, %s::vector, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (row[0], row[1], row[2], embedding_str, row[4], row[5], row[6]))
-            except Exception as e:
-                print(f"Error inserting face: {e}")
-                conn.rollback()
-                continue
+                if embeddings is not None and embedding_idx is not None and embedding_idx < len(embeddings):
+                    embedding_str = format_vector(embeddings[embedding_idx].tolist(), digits)
+
+                cluster_key = cluster_key_for(face)
+
+                # One row per image the face appears in
+                sources = face.get("source_images") or [face.get("source_image", "")]
+                if journal is not None:
+                    copies = journal.sources.get(face.get("image_sha256"), [])
+                    sources = sources + [p for p in copies if p not in sources]
+
+                for source_path in sources:
+                    # Find image_id
+                    image_id = image_id_map.get(Path(source_path).name)
+
+                    # Find document_id from the image name, else a document's own file name
+                    document = document_for_image(source_path) or Path(source_path).stem
+                    doc_id = doc_id_by_stem.get(document)
+
+                    try:
+                        cur.execute(f"""
+                            INSERT INTO faces
+                            (image_id, document_id, bounding_box, embedding, cluster_id, confidence, face_crop_path)
+                            VALUES (%s, %s, %s, %s::{vector_type},
+                                    (SELECT cluster_id FROM face_cluster_keys WHERE cluster_key = %s), %s, %s)
+                            ON CONFLICT DO NOTHING
+                        """, (image_id, doc_id, bbox, embedding_str, cluster_key,
+                              face.get("confidence", 0), face.get("crop_path")))
+                        loaded += 1
+                    except Exception as e:
+                        print(f"Error inserting face: {e}")
+                        conn.rollback()
 
-        conn.commit()
+            conn.commit()
+            pbar.update(len(chunk))
+
+    if not loaded:
+        return
 
     # Update has_faces flag on extracted_images
     cur.execute("""
@@ -404,7 +434,7 @@ def load_faces(conn, faces_dir: Path, image_id_map: dict, doc_id_map: dict, clus
     """)
     conn.commit()
 
-    print(f"Loaded {len(face_rows)} faces")
+    print(f"Loaded {loaded} face appearances")
 
 
 def load_mentioned_names(conn, input_dir: Path, doc_id_map: dict):
@@ -417,15 +447,9 @@ def load_mentioned_names(conn, input_dir: Path, doc_id_map: dict):
     name_rows = []
 
     # Check for any NER data in metadata files
-    for meta_file in input_dir.rglob("*.json"):
-        if "metadata" not in str(meta_file):
-            continue
-        if "_images" in meta_file.name:
-            continue
-
+    for meta_file in iter_document_metadata(input_dir):
         try:
-            with open(meta_file, "r") as f:
-                meta = json.load(f)
+            meta = read_metadata(meta_file)
 
             # Check for mentioned_names field (from search indexer)
             names = meta.get("mentioned_names", [])
@@ -472,6 +496,57 @@ def load_mentioned_names(conn, input_dir: Path, doc_id_map: dict):
     print(f"Loaded {len(name_rows)} mentioned names")
 
 
+def aggregate_rows(aggregates: dict) -> list[tuple]:
+    """Flatten an aggregates artifact into corpus_stats rows.
+
+    Rows are (scope, dataset_number, key, documents, pages, rank); dataset_number
+    is -1 for corpus-wide rows and key is '' where there is nothing to key on.
+    """
+    totals = aggregates.get("totals", {})
+    rows = [("total", -1, "", totals.get("documents", 0), totals.get("pages", 0), None)]
+
+    for entry in aggregates.get("document_types", []):
+        rows.append(("document_type", -1, entry["document_type"], entry["documents"], entry.get("pages", 0), None))
+
+    for rank, entry in enumerate(aggregates.get("top_names", []), start=1):
+        rows.append(("name", -1, entry["name"], entry["documents"], 0, rank))
+
+    for dataset in aggregates.get("datasets", []):
+        number = dataset["dataset_number"]
+        rows.append(("dataset", number, "", dataset["documents"], dataset.get("pages", 0), None))
+        for doc_type, count in dataset.get("document_types", {}).items():
+            rows.append(("dataset_document_type", number, doc_type, count, 0, None))
+        for rank, entry in enumerate(dataset.get("top_names", []), start=1):
+            rows.append(("dataset_name", number, entry["name"], entry["documents"], 0, rank))
+
+    return rows
+
+
+def load_corpus_stats(conn, aggregates_file: Path):
+    """Replace corpus_stats with the aggregates produced by build_search_index.py."""
+    cur = conn.cursor()
+
+    aggregates = read_aggregates(aggregates_file)
+    generated_at = aggregates.get("generated_at") or datetime.now().isoformat()
+    rows = [row + (generated_at,) for row in aggregate_rows(aggregates)]
+
+    insert_sql = """
+        INSERT INTO corpus_stats (scope, dataset_number, key, documents, pages, rank, generated_at)
+        VALUES %s
+    """
+
+    # Swap the whole table in one transaction so readers never see a partial set
+    try:
+        cur.execute("DELETE FROM corpus_stats")
+        for i in range(0, len(rows), BATCH_SIZE):
+            execute_values(cur, insert_sql, rows[i:i + BATCH_SIZE])
+        conn.commit()
+        print(f"Loaded {len(rows)} corpus stats rows from {aggregates_file}")
+    except Exception as e:
+        print(f"Error loading corpus stats: {e}")
+        conn.rollback()
+
+
 def update_search_index_status(conn, doc_id_map: dict):
     """Initialize search index status for all documents."""
     cur = conn.cursor()
@@ -500,11 +575,14 @@ def main():
     parser = argparse.ArgumentParser(description="Load processed data into PostgreSQL")
     parser.add_argument("--input", "-i", required=True, help="Input directory with processed files")
     parser.add_argument("--faces", "-f", help="Directory with face detection results")
+    parser.add_argument("--aggregates", "-a",
+                        help=f"Aggregates file from build_search_index.py (default: INPUT/{AGGREGATES_FILENAME} if present)")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be loaded without inserting")
     args = parser.parse_args()
 
     input_dir = Path(args.input)
     faces_dir = Path(args.faces) if args.faces else None
+    aggregates_file = Path(args.aggregates) if args.aggregates else input_dir / AGGREGATES_FILENAME
 
     if not input_dir.exists():
         print(f"Error: Input directory does not exist: {input_dir}")
@@ -514,22 +592,23 @@ def main():
         print("DRY RUN - No data will be inserted")
 
         # Count files
-        doc_files = list(input_dir.rglob("metadata/*.json"))
-        doc_files = [f for f in doc_files if "_images" not in f.name]
+        doc_files = list(iter_document_metadata(input_dir))
         print(f"Document metadata files: {len(doc_files)}")
 
         img_files = list(input_dir.rglob("*_images.json"))
         print(f"Image metadata files: {len(img_files)}")
 
+        if aggregates_file.exists():
+            rows = aggregate_rows(read_aggregates(aggregates_file))
+            print(f"Corpus stats rows: {len(rows)}")
+
         if faces_dir and faces_dir.exists():
-            if (faces_dir / "clusters.json").exists():
-                with open(faces_dir / "clusters.json") as f:
-                    data = json.load(f)
-                print(f"Face clusters: {len(data.get('clusters', []))}")
-            if (faces_dir / "faces.json").exists():
-                with open(faces_dir / "faces.json") as f:
-                    data = json.load(f)
-                print(f"Faces: {len(data.get('faces', []))}")
+            _, clusters, clusters_file = iter_clusters(faces_dir)
+            if clusters_file is not None:
+                print(f"Face clusters ({clusters_file.name}): {sum(1 for _ in clusters)}")
+            total, faces = iter_faces(faces_dir)
+            if total is not None:
+                print(f"Faces: {total}")
         return
 
     # Connect to database
@@ -555,17 +634,16 @@ def main():
         image_id_map = load_extracted_images(conn, input_dir, doc_id_map)
 
         # Load face data if provided
-        cluster_id_map = {}
         if faces_dir and faces_dir.exists():
             print("\n" + "=" * 50)
             print("LOADING FACE CLUSTERS")
             print("=" * 50)
-            cluster_id_map = load_face_clusters(conn, faces_dir)
+            load_face_clusters(conn, faces_dir)
 
             print("\n" + "=" * 50)
             print("LOADING FACES")
             print("=" * 50)
-            load_faces(conn, faces_dir, image_id_map, doc_id_map, cluster_id_map)
+            load_faces(conn, faces_dir, image_id_map, doc_id_map)
 
         # Load mentioned names
         print("\n" + "=" * 50)
@@ -579,6 +657,13 @@ def main():
         print("=" * 50)
         update_search_index_status(conn, doc_id_map)
 
+        # Materialize precomputed facet counts
+        if aggregates_file.exists():
+            print("\n" + "=" * 50)
+            print("LOADING CORPUS STATS")
+            print("=" * 50)
+            load_corpus_stats(conn, aggregates_file)
+
         # Print summary
         cur = conn.cursor()
 
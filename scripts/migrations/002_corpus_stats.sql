@@ -0,0 +1,26 @@
+-- ChatFiles.org Database Schema
+-- Migration 002: Precomputed corpus aggregates
+
+-- Facet counts written by build_search_index.py (aggregates.json) and
+-- materialized by load_database.py, so the browse and landing pages don't
+-- aggregate the documents and mentioned_names tables on every request.
+--
+-- scope:
+--   total                  corpus totals (dataset_number = -1, key = '')
+--   dataset                per dataset (key = '')
+--   document_type          per document type (dataset_number = -1)
+--   dataset_document_type  per dataset and document type
+--   name                   top mentioned names (rank 1..N, dataset_number = -1)
+--   dataset_name           top mentioned names per dataset
+CREATE TABLE IF NOT EXISTS corpus_stats (
+  scope VARCHAR(32) NOT NULL,
+  dataset_number INTEGER NOT NULL DEFAULT -1,
+  key VARCHAR(255) NOT NULL DEFAULT '',
+  documents BIGINT NOT NULL DEFAULT 0,
+  pages BIGINT NOT NULL DEFAULT 0,
+  rank INTEGER,
+  generated_at TIMESTAMP NOT NULL,
+  PRIMARY KEY (scope, dataset_number, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_corpus_stats_rank ON corpus_stats(scope, rank);
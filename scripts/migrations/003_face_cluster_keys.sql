@@ -0,0 +1,10 @@
+-- ChatFiles.org Database Schema
+-- Migration 003: Stable face cluster keys for incremental face runs
+
+-- face_pipeline.py --cluster-state keeps cluster ids across runs and writes
+-- clusters_delta.jsonl; load_database.py upserts on this key
+-- ('{state_id}:{cluster_id}') so new DataSets extend existing clusters
+-- instead of inserting a fresh set. NULL for clusters from full runs.
+ALTER TABLE face_clusters ADD COLUMN IF NOT EXISTS pipeline_cluster_id VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_face_clusters_pipeline_id ON face_clusters(pipeline_cluster_id);
@@ -0,0 +1,11 @@
+-- ChatFiles.org Database Schema
+-- Migration 004: Half-precision face embeddings (optional, pgvector >= 0.7.0)
+
+-- Stores faces.embedding as halfvec(512): 2 bytes per dimension instead of
+-- 4, so the table, its index and similarity scans touch half the pages.
+-- Run benchmark_embeddings.py first to check the float16 accuracy on your
+-- clusters. load_database.py detects the column type and sends halfvec
+-- literals once this has run.
+ALTER TABLE faces ALTER COLUMN embedding TYPE halfvec(512) USING embedding::halfvec(512);
+
+CREATE INDEX IF NOT EXISTS idx_faces_embedding_hnsw ON faces USING hnsw (embedding halfvec_cosine_ops);
@@ -8,7 +8,6 @@ Usage:
 """
 
 import argparse
-import json
 import os
 import subprocess
 import sys
@@ -24,6 +23,16 @@ except ImportError:
     print("Missing dependencies. Install with: pip install pymupdf tqdm")
     sys.exit(1)
 
+from pipeline_core import (
+    CLASSIFIER_VERSION,
+    classify_document_type,
+    iter_document_metadata,
+    read_metadata,
+    resolve_document_type,
+    text_path_for,
+    write_metadata,
+)
+
 
 def has_text_layer(pdf_path: str) -> bool:
     """Check if PDF already has a text layer."""
@@ -174,17 +183,18 @@ def process_pdf(args: tuple) -> dict:
         result["text_length"] = len(text)
         result["processing_time"] = round(time.time() - start_time, 2)
 
-        # Save metadata JSON
+        # Save metadata JSON (classified once here, later stages reuse it)
         metadata = {
             **result,
+            "document_type": classify_document_type(filename, text),
+            "classifier_version": CLASSIFIER_VERSION,
             "processed_at": datetime.now().isoformat(),
             "input_path": str(input_path),
             "output_pdf": str(output_pdf),
             "output_txt": str(output_txt)
         }
 
-        with open(output_json, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2)
+        write_metadata(output_json, metadata)
 
     except Exception as e:
         result["status"] = "error"
@@ -194,6 +204,30 @@ def process_pdf(args: tuple) -> dict:
     return result
 
 
+def reclassify_outputs(output_dir: Path) -> dict:
+    """Refresh document_type in existing metadata whose classification is stale."""
+    counts = {"updated": 0, "current": 0, "error": 0}
+
+    for meta_file in tqdm(list(iter_document_metadata(output_dir)), desc="Classifying documents"):
+        try:
+            meta = read_metadata(meta_file)
+            if meta.get("classifier_version") == CLASSIFIER_VERSION and meta.get("document_type"):
+                counts["current"] += 1
+                continue
+
+            # Drop the stale value so the classifier reads a text sample
+            meta.pop("document_type", None)
+            meta["document_type"] = resolve_document_type(meta, text_file=text_path_for(meta_file))
+            meta["classifier_version"] = CLASSIFIER_VERSION
+            write_metadata(meta_file, meta)
+            counts["updated"] += 1
+        except Exception as e:
+            print(f"Error classifying {meta_file}: {e}")
+            counts["error"] += 1
+
+    return counts
+
+
 def main():
     parser = argparse.ArgumentParser(description="OCR Pipeline for PDF processing")
     parser.add_argument("--input", "-i", required=True, help="Input directory with PDFs")
@@ -201,11 +235,19 @@ def main():
     parser.add_argument("--workers", "-w", type=int, default=8, help="Number of parallel workers")
     parser.add_argument("--resume", action="store_true", help="Skip already processed files")
     parser.add_argument("--skip-ocr", action="store_true", help="Skip OCR, just extract text")
+    parser.add_argument("--reclassify", action="store_true",
+                        help="Only update document_type in existing output metadata, then exit")
     args = parser.parse_args()
 
     input_dir = Path(args.input)
     output_dir = Path(args.output)
 
+    if args.reclassify:
+        counts = reclassify_outputs(output_dir)
+        print(f"Classifier {CLASSIFIER_VERSION}: {counts['updated']} updated, "
+              f"{counts['current']} already current, {counts['error']} errors")
+        return
+
     if not input_dir.exists():
         print(f"Error: Input directory does not exist: {input_dir}")
         sys.exit(1)
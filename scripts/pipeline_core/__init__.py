@@ -0,0 +1,34 @@
+"""
+Shared core for the ChatFiles.org processing scripts.
+
+Holds the pieces every pipeline stage needs to agree on: document
+classification, dataset-number parsing, metadata I/O and lazy loaders for
+the heavy ML dependencies. Nothing in here imports spaCy, InsightFace or
+scikit-learn at module load, so importing it is cheap.
+"""
+
+from .classify import CLASSIFIER_VERSION, classify_document_type, resolve_document_type
+from .datasets import parse_dataset_number, dataset_slug
+from .metadata import (
+    iter_document_metadata,
+    read_metadata,
+    read_text,
+    text_path_for,
+    write_metadata,
+)
+from .lazy import LazyModule, require
+
+__all__ = [
+    "CLASSIFIER_VERSION",
+    "classify_document_type",
+    "resolve_document_type",
+    "parse_dataset_number",
+    "dataset_slug",
+    "iter_document_metadata",
+    "read_metadata",
+    "read_text",
+    "text_path_for",
+    "write_metadata",
+    "LazyModule",
+    "require",
+]
@@ -0,0 +1,99 @@
+"""
+Precomputed corpus aggregates for the browse and landing pages.
+
+build_search_index.py already touches every document, so it tallies
+document and page counts per dataset and per document type plus the most
+mentioned names of every batch it indexes successfully, and writes them to
+``aggregates.json``.
+load_database.py --aggregates materializes that file into the
+``corpus_stats`` table (migrations/002_corpus_stats.sql).
+"""
+
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from .classify import CLASSIFIER_VERSION
+from .metadata import write_json_atomic
+
+AGGREGATES_FILENAME = "aggregates.json"
+DEFAULT_TOP_NAMES = 50
+
+
+class CorpusAggregates:
+    """Running counts over indexed documents."""
+
+    def __init__(self):
+        self.documents = 0
+        self.pages = 0
+        self.text_bytes = 0
+        self.dataset_documents = Counter()
+        self.dataset_pages = Counter()
+        self.type_documents = Counter()
+        self.type_pages = Counter()
+        self.dataset_types = defaultdict(Counter)
+        self.names = Counter()
+        self.dataset_names = defaultdict(Counter)
+
+    def add(self, doc: dict):
+        """Count one indexed document (as built by build_search_index.py)."""
+        dataset = doc.get("dataset_number", 0)
+        doc_type = doc.get("document_type") or "other"
+        pages = doc.get("page_count") or 0
+        names = set(doc.get("mentioned_names") or ())
+
+        self.documents += 1
+        self.pages += pages
+        self.text_bytes += doc.get("text_length") or 0
+        self.dataset_documents[dataset] += 1
+        self.dataset_pages[dataset] += pages
+        self.type_documents[doc_type] += 1
+        self.type_pages[doc_type] += pages
+        self.dataset_types[dataset][doc_type] += 1
+        self.names.update(names)
+        self.dataset_names[dataset].update(names)
+
+    @staticmethod
+    def _top(counter: Counter, limit: int) -> list[dict]:
+        # Ties are broken by name so the output is stable between runs
+        ranked = sorted(counter.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"name": name, "documents": count} for name, count in ranked]
+
+    def to_dict(self, top_names: int = DEFAULT_TOP_NAMES) -> dict:
+        """Return the JSON-serializable aggregates artifact."""
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "classifier_version": CLASSIFIER_VERSION,
+            "totals": {
+                "documents": self.documents,
+                "pages": self.pages,
+                "text_bytes": self.text_bytes,
+            },
+            "datasets": [
+                {
+                    "dataset_number": dataset,
+                    "documents": self.dataset_documents[dataset],
+                    "pages": self.dataset_pages[dataset],
+                    "document_types": dict(self.dataset_types[dataset].most_common()),
+                    "top_names": self._top(self.dataset_names[dataset], top_names),
+                }
+                for dataset in sorted(self.dataset_documents)
+            ],
+            "document_types": [
+                {"document_type": doc_type, "documents": count, "pages": self.type_pages[doc_type]}
+                for doc_type, count in self.type_documents.most_common()
+            ],
+            "top_names": self._top(self.names, top_names),
+        }
+
+
+def write_aggregates(path: Path, aggregates: dict):
+    """Write the aggregates artifact (compact JSON)."""
+    write_json_atomic(path, aggregates, indent=None)
+
+
+def read_aggregates(path: Path) -> dict:
+    """Load an aggregates artifact."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,148 @@
+"""
+Document type classification shared by every pipeline stage.
+
+Classification is rule based. Each ``Rule`` lists keywords to look for in
+the filename and in the first ``TEXT_SAMPLE_CHARS`` characters of the
+extracted text; rules are tried in order and the first match wins. All
+text keywords of the table are compiled into one regular expression, so
+the sample is scanned once no matter how many rules there are.
+
+ocr_pipeline.py classifies each document once and stores the result in its
+metadata JSON together with ``CLASSIFIER_VERSION``. Later stages call
+``resolve_document_type`` which reuses the stored value and only falls
+back to reading a text sample when the rule table has changed since.
+
+The values returned here must match the ``document_type`` enum in
+migrations/001_initial_schema.sql.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .metadata import read_text
+
+TEXT_SAMPLE_CHARS = 5000
+
+PHOTO_EXTENSIONS = (".jpg", ".png", ".gif", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".wmv")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A document type and the keywords that select it.
+
+    A rule matches if any ``filename_any`` keyword is in the filename, any
+    ``text_any`` keyword is in the text sample, or every ``text_all``
+    keyword is in the text sample. Matching is case-insensitive.
+    """
+
+    document_type: str
+    filename_any: tuple = ()
+    text_any: tuple = ()
+    text_all: tuple = ()
+
+
+DEFAULT_RULES = (
+    Rule("fbi_report", filename_any=("302", "fbi"), text_any=("federal bureau",)),
+    Rule("transcript", filename_any=("deposition",), text_any=("deposition",)),
+    Rule("email", filename_any=("email",), text_all=("from:", "to:")),
+    Rule("court_doc", filename_any=("court",), text_any=("plaintiff", "defendant")),
+    Rule("photo", filename_any=PHOTO_EXTENSIONS),
+    Rule("video", filename_any=VIDEO_EXTENSIONS),
+)
+
+
+def _compile_keywords(keywords: set) -> tuple:
+    """Compile keywords into one overlapping-match regex.
+
+    Returns (pattern, implied) where implied maps each keyword to every
+    keyword that is a prefix of it: the regex reports only the longest
+    alternative at a given position, so "from:" also has to count as
+    "from" when both are in the table.
+    """
+    if not keywords:
+        return None, {}
+
+    ordered = sorted(keywords, key=lambda k: (-len(k), k))
+    pattern = re.compile(
+        "(?=(" + "|".join(re.escape(k) for k in ordered) + "))",
+        re.IGNORECASE | re.DOTALL,
+    )
+    implied = {k: {p for p in keywords if k.startswith(p)} for k in keywords}
+    return pattern, implied
+
+
+class DocumentClassifier:
+    """Single-pass classifier compiled from a rule table."""
+
+    def __init__(self, rules=DEFAULT_RULES, default: str = "other", sample_chars: int = TEXT_SAMPLE_CHARS):
+        self.rules = tuple(rules)
+        self.default = default
+        self.sample_chars = sample_chars
+
+        self._filename_keywords = {k.lower() for r in self.rules for k in r.filename_any}
+        self._text_keywords = {k.lower() for r in self.rules for k in (*r.text_any, *r.text_all)}
+        self._filename_pattern, self._filename_implied = _compile_keywords(self._filename_keywords)
+        self._text_pattern, self._text_implied = _compile_keywords(self._text_keywords)
+
+        spec = repr((self.rules, self.default, self.sample_chars)).encode("utf-8")
+        self.version = hashlib.sha1(spec).hexdigest()[:12]
+
+    @staticmethod
+    def _scan(pattern, implied: dict, wanted: set, value: str) -> set:
+        """Return the set of keywords found in value (lowercased)."""
+        found = set()
+        if pattern is None or not value:
+            return found
+
+        for match in pattern.finditer(value):
+            found |= implied[match.group(1).lower()]
+            if len(found) == len(wanted):
+                break
+        return found
+
+    def classify(self, filename: str, text: str = "") -> str:
+        """Classify a document from its filename and (the start of) its text."""
+        in_filename = self._scan(self._filename_pattern, self._filename_implied,
+                                 self._filename_keywords, filename or "")
+        in_text = self._scan(self._text_pattern, self._text_implied,
+                             self._text_keywords, (text or "")[:self.sample_chars])
+
+        for rule in self.rules:
+            if any(k.lower() in in_filename for k in rule.filename_any):
+                return rule.document_type
+            if any(k.lower() in in_text for k in rule.text_any):
+                return rule.document_type
+            if rule.text_all and all(k.lower() in in_text for k in rule.text_all):
+                return rule.document_type
+
+        return self.default
+
+
+DEFAULT_CLASSIFIER = DocumentClassifier()
+CLASSIFIER_VERSION = DEFAULT_CLASSIFIER.version
+
+
+def classify_document_type(filename: str, text: str = "") -> str:
+    """Classify document type based on filename and content."""
+    return DEFAULT_CLASSIFIER.classify(filename, text)
+
+
+def resolve_document_type(meta: dict, text: Optional[str] = None, text_file: Optional[Path] = None) -> str:
+    """Return the document type for a metadata record.
+
+    Uses the classification stored by the OCR stage when it was made with
+    the current rule table. Otherwise classifies from ``text`` if the
+    caller already has it, or from a ``TEXT_SAMPLE_CHARS`` sample of
+    ``text_file``.
+    """
+    if meta.get("document_type") and meta.get("classifier_version") == CLASSIFIER_VERSION:
+        return meta["document_type"]
+
+    if text is None:
+        text = read_text(text_file, max_chars=TEXT_SAMPLE_CHARS) if text_file else ""
+
+    return classify_document_type(meta.get("filename", ""), text)
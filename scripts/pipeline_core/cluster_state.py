@@ -0,0 +1,166 @@
+"""
+Persistent face cluster state for incremental face_pipeline.py runs.
+
+A full run clusters every face from scratch. With ``--cluster-state DIR``
+the pipeline keeps the clusters it found in DIR and later runs (a new
+DataSet) only process the new faces: each is assigned to the nearest
+existing cluster centroid if it is close enough, and only the remainder
+is clustered. Cluster ids are stable across runs.
+
+    state.json    state_id, generation, next_id, known-person labels,
+                  faces absorbed per face store
+    ids.npy       int64 [c] cluster ids, ascending
+    sums.npy      float32 [c, 512] sum of normalized member embeddings
+    counts.npy    int64 [c] member counts
+
+Keeping sums rather than means lets a cluster's centroid be updated as
+faces join without revisiting its earlier members. The state records how
+many rows of each face store (by store id) its sums already hold, so
+clustering the same store again (--cluster-only, --resume) only adds the
+rows after those.
+
+Incremental runs write clusters_delta.jsonl instead of clusters.jsonl
+(``state_id`` and ``generation`` go in outputs.json), with per cluster a
+``status`` (new, updated or singleton), ``face_count`` (faces from this
+run) and ``total_face_count``. load_database.py upserts face_clusters on
+``{state_id}:{cluster_id}`` so clusters are never recreated.
+"""
+
+import json
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .face_cluster import DEFAULT_BATCH, assign_to_centroids, normalize_rows
+from .face_store import EMBEDDING_DIM
+from .metadata import write_json_atomic
+
+STATE_FILENAME = "state.json"
+CLUSTERS_DELTA_FILENAME = "clusters_delta.jsonl"
+STATE_VERSION = 1
+
+
+class ClusterState:
+    """Cluster ids and centroid sums carried between pipeline runs."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.state_id = uuid.uuid4().hex[:12]
+        self.generation = 0
+        self.next_id = 0
+        self.labels = {}  # str(cluster id) -> {"label", "match_confidence"} for known persons
+        self.absorbed = {}  # face store id -> rows of that store already in the sums and counts
+        self.ids = np.empty(0, dtype=np.int64)
+        self.sums = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.counts = np.empty(0, dtype=np.int64)
+
+        state_file = self.directory / STATE_FILENAME
+        if state_file.exists():
+            self._load(state_file)
+
+    def _load(self, state_file: Path):
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported cluster state version in {state_file}: {state.get('version')}")
+
+        self.state_id = state["state_id"]
+        self.generation = state["generation"]
+        self.next_id = state["next_id"]
+        self.labels = state.get("labels", {})
+        self.absorbed = state.get("absorbed", {})
+        self.ids = np.load(self.directory / "ids.npy")
+        self.sums = np.load(self.directory / "sums.npy")
+        self.counts = np.load(self.directory / "counts.npy")
+        if len(self.ids):
+            # Arrays are replaced before state.json; never reuse an id they already hold
+            self.next_id = max(self.next_id, int(self.ids.max()) + 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def centroids(self) -> np.ndarray:
+        """Normalized centroid of every cluster, in ``ids`` order."""
+        return normalize_rows(self.sums)
+
+    def count(self, cluster_id: int) -> int:
+        return int(self.counts[np.searchsorted(self.ids, cluster_id)])
+
+    def centroid(self, cluster_id: int) -> np.ndarray:
+        return normalize_rows(self.sums[np.searchsorted(self.ids, cluster_id)][None])[0]
+
+    def assign(self, embeddings, threshold: float, batch: int = DEFAULT_BATCH, rows: Optional[np.ndarray] = None):
+        """Nearest-centroid assignment (of only the given rows, if any).
+
+        Returns (cluster ids, similarities): the id of the most similar
+        centroid per face, or -1 where that similarity is below threshold.
+        """
+        best, sims = assign_to_centroids(embeddings, self.sums, threshold, batch, rows)
+        ids = np.where(best >= 0, self.ids[np.maximum(best, 0)] if len(self.ids) else -1, -1)
+        return ids, sims
+
+    def allocate_ids(self, count: int) -> int:
+        """Reserve ``count`` new cluster ids and return the first."""
+        first = self.next_id
+        self.next_id += count
+        return first
+
+    def accumulate(self, embeddings, labels: np.ndarray, batch: int = DEFAULT_BATCH):
+        """Add faces to the sums and counts of their clusters (labels >= 0).
+
+        Labels not in the state yet become new clusters.
+        """
+        new_ids = np.setdiff1d(np.unique(labels[labels >= 0]), self.ids)
+        if len(new_ids):
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.sums = np.concatenate([self.sums, np.zeros((len(new_ids), self.sums.shape[1]), dtype=np.float32)])
+            self.counts = np.concatenate([self.counts, np.zeros(len(new_ids), dtype=np.int64)])
+            order = np.argsort(self.ids, kind="stable")
+            self.ids, self.sums, self.counts = self.ids[order], self.sums[order], self.counts[order]
+
+        for i in range(0, len(labels), batch):
+            chunk = labels[i:i + batch]
+            mask = chunk >= 0
+            if not mask.any():
+                continue
+            rows = np.searchsorted(self.ids, chunk[mask])
+            np.add.at(self.sums, rows, normalize_rows(embeddings[i:i + batch])[mask])
+            np.add.at(self.counts, rows, 1)
+
+    def absorbed_faces(self, store_id: str) -> int:
+        """Rows of a face store (from the start) that are already in the state."""
+        return self.absorbed.get(store_id, 0)
+
+    def mark_absorbed(self, store_id: str, count: int):
+        self.absorbed[store_id] = count
+
+    def set_label(self, cluster_id: int, label: Optional[str], match_confidence: Optional[float]):
+        """Remember the known person a cluster was matched to."""
+        if label:
+            self.labels[str(cluster_id)] = {"label": label, "match_confidence": match_confidence}
+
+    def label(self, cluster_id: int) -> dict:
+        return self.labels.get(str(cluster_id), {"label": None, "match_confidence": None})
+
+    def save(self):
+        """Write the state, bumping its generation."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.generation += 1
+        for name, array in (("ids", self.ids), ("sums", self.sums), ("counts", self.counts)):
+            tmp_path = self.directory / f".{name}.tmp.npy"
+            np.save(tmp_path, array)
+            tmp_path.replace(self.directory / f"{name}.npy")
+
+        # state.json last: it is what marks the arrays as a consistent generation
+        write_json_atomic(self.directory / STATE_FILENAME, {
+            "version": STATE_VERSION,
+            "state_id": self.state_id,
+            "generation": self.generation,
+            "next_id": self.next_id,
+            "clusters": len(self.ids),
+            "faces": int(self.counts.sum()),
+            "labels": self.labels,
+            "absorbed": self.absorbed,
+        })
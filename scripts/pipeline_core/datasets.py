@@ -0,0 +1,35 @@
+"""
+Dataset number parsing.
+
+DOJ releases are split into numbered datasets and the number shows up in
+directory names in several spellings: ``DataSet_10``, ``DataSet 10``,
+``dataset10``, ``DS10``. Every stage uses this module so a document gets
+the same ``dataset_number`` in Meilisearch, PostgreSQL and R2.
+"""
+
+import re
+from pathlib import Path
+from typing import Union
+
+DATASET_PATTERNS = [
+    re.compile(r"data[_\s-]?set[_\s-]?(\d+)", re.IGNORECASE),
+    re.compile(r"(?<![A-Za-z])DS[_\s-]?(\d+)"),
+]
+
+
+def parse_dataset_number(path: Union[str, Path]) -> int:
+    """Extract the dataset number from a path or directory name, 0 if unknown."""
+    path_str = str(path)
+
+    for pattern in DATASET_PATTERNS:
+        match = pattern.search(path_str)
+        if match:
+            return int(match.group(1))
+
+    return 0
+
+
+def dataset_slug(path: Union[str, Path]) -> str:
+    """Return the canonical ``DataSet_{N}`` name used in R2 keys, or "unknown"."""
+    number = parse_dataset_number(path)
+    return f"DataSet_{number}" if number else "unknown"
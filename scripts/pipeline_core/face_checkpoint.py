@@ -0,0 +1,109 @@
+"""
+Resume support for face_pipeline.py.
+
+The face store already commits rows to disk on every flush. This module
+adds the other half of a checkpoint: which source images those rows
+cover. ``images.jsonl`` in the store directory gets one line per
+processed image (with or without faces), appended right after each
+store flush:
+
+    {"path": ..., "size": ..., "mtime": ..., "sha256": ..., "faces": 2, "end": 1234}
+
+``end`` is the store row count once the image's faces were added. On
+resume the store is truncated to the last committed ``end`` (rows past it
+belong to images that were never journaled), and images are skipped if
+their path, size and mtime match a journaled entry or, failing that, if
+their content hash does.
+
+Copies of an already-processed image are journaled with ``skipped`` and
+no faces; ``sources`` maps each content hash to every path it was found
+at, so faces can list all the images (and documents) they appear in.
+"""
+
+import json
+import os
+from pathlib import Path
+
+JOURNAL_NAME = "images.jsonl"
+
+
+class ImageJournal:
+    """Append-only log of the images whose faces are committed to a face store."""
+
+    def __init__(self, store_dir: Path):
+        self.path = Path(store_dir) / JOURNAL_NAME
+        self.pending = []
+        self.hashes = set()
+        self.stats = {}  # path -> (size, mtime)
+        self.sources = {}  # sha256 -> [paths]
+        self.end = 0
+        self.entries = 0
+
+    def load(self) -> int:
+        """Read committed entries; returns the store row count they cover.
+
+        A torn last line (crash mid-append) is ignored and trimmed.
+        """
+        if not self.path.exists():
+            return 0
+
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                self._remember(entry)
+
+        if valid_bytes < os.path.getsize(self.path):
+            os.truncate(self.path, valid_bytes)
+        return self.end
+
+    def _remember(self, entry: dict):
+        if entry.get("sha256"):
+            self.hashes.add(entry["sha256"])
+            paths = self.sources.setdefault(entry["sha256"], [])
+            if entry["path"] not in paths:
+                paths.append(entry["path"])
+        self.stats[entry["path"]] = (entry.get("size"), entry.get("mtime"))
+        self.end = max(self.end, entry.get("end", 0))
+        self.entries += 1
+
+    def unchanged(self, path: Path) -> bool:
+        """True if path was journaled with its current size and mtime."""
+        known = self.stats.get(str(path))
+        if known is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return known == (st.st_size, st.st_mtime_ns)
+
+    def add(self, path: Path, sha256, faces: int, end: int, skipped: bool = False):
+        """Queue an entry; it is written by the next commit."""
+        try:
+            st = os.stat(path)
+            size, mtime = st.st_size, st.st_mtime_ns
+        except OSError:
+            size = mtime = None
+        entry = {"path": str(path), "size": size, "mtime": mtime, "sha256": sha256, "faces": faces, "end": end}
+        if skipped:
+            entry["skipped"] = True
+        self.pending.append(entry)
+
+    def commit(self):
+        """Append queued entries. Call only after the face store is flushed."""
+        if not self.pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in self.pending:
+            self._remember(entry)
+        self.pending = []
@@ -0,0 +1,264 @@
+"""
+Scalable face clustering for face_pipeline.py.
+
+The pipeline used to run ``DBSCAN(eps=1 - SIMILARITY_THRESHOLD,
+min_samples=2, metric="cosine")``. With ``min_samples=2`` every face that
+has at least one neighbour within ``eps`` is a core point, so DBSCAN's
+clusters are exactly the connected components of the graph that links
+faces with cosine similarity >= the threshold; faces without such a
+neighbour are noise (singletons). This module builds that graph in
+batches and merges components with a union-find over a flat numpy array,
+so memory is O(n) plus one batch of edges instead of DBSCAN's
+neighbourhood lists.
+
+Backends:
+    exact   blocked brute force over the (memory-mapped) matrix. Same
+            output as the old DBSCAN call; O(n^2) time, bounded memory.
+    hnsw    hnswlib HNSW index, top-``k`` neighbours per face filtered to
+            the radius. Near-linear time; the index needs roughly
+            n * (512 * 4 + M * 8) bytes of RAM. Components only need one
+            surviving edge to stay connected, so the top-k cap and ANN
+            recall rarely change the result.
+    auto    exact up to EXACT_MAX_FACES faces, hnsw above (if installed).
+"""
+
+import itertools
+from typing import Iterator, Optional
+
+import numpy as np
+
+EXACT_MAX_FACES = 50000
+DEFAULT_BATCH = 4096
+UNCLUSTERED = -2  # label for faces kept out of clusters and singletons (low quality)
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return float32 L2-normalized copies of the given rows."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def read_rows(embeddings, rows: Optional[np.ndarray], start: int, stop: int):
+    """embeddings[start:stop], or rows[start:stop] of embeddings when a row subset is given.
+
+    Only the requested batch is read, so a subset of a memory-mapped store
+    is never copied into memory as a whole.
+    """
+    return embeddings[start:stop] if rows is None else embeddings[rows[start:stop]]
+
+
+def _count(embeddings, rows: Optional[np.ndarray]) -> int:
+    return len(embeddings) if rows is None else len(rows)
+
+
+class UnionFind:
+    """Vectorized union-find over node ids 0..n-1."""
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, nodes: np.ndarray) -> np.ndarray:
+        """Return the root of each node, compressing the paths walked."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        roots = self.parent[nodes]
+        while True:
+            parents = self.parent[roots]
+            if np.array_equal(parents, roots):
+                break
+            roots = parents
+        self.parent[nodes] = roots
+        return roots
+
+    def union_edges(self, a: np.ndarray, b: np.ndarray):
+        """Merge the components of every edge (a[i], b[i])."""
+        if len(a) == 0:
+            return
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        ra = self.find(a)
+        rb = self.find(b)
+        differ = ra != rb
+        if not differ.any():
+            return
+        ra, rb = ra[differ], rb[differ]
+
+        # Edges within a batch can chain (r1-r2, r2-r3); resolve them as a
+        # small graph over the roots involved, then point each root at the
+        # smallest root of its component.
+        roots, inverse = np.unique(np.concatenate([ra, rb]), return_inverse=True)
+        m = len(ra)
+        graph = coo_matrix((np.ones(m, dtype=np.int8), (inverse[:m], inverse[m:])), shape=(len(roots), len(roots)))
+        _, component = connected_components(graph, directed=False)
+        smallest = np.full(component.max() + 1, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(smallest, component, roots)
+        self.parent[roots] = smallest[component]
+
+    def components(self) -> np.ndarray:
+        """Return the root of every node."""
+        return self.find(np.arange(len(self.parent), dtype=np.int64))
+
+
+def _exact_edges(embeddings, threshold: float, batch: int, rows: Optional[np.ndarray] = None):
+    """Yield (a, b) index arrays of all pairs with similarity >= threshold (a < b)."""
+    n = _count(embeddings, rows)
+    for i in range(0, n, batch):
+        block = normalize_rows(read_rows(embeddings, rows, i, i + batch))
+        for j in range(i, n, batch):
+            other = block if j == i else normalize_rows(read_rows(embeddings, rows, j, j + batch))
+            close = block @ other.T >= threshold
+            if j == i:
+                close = np.triu(close, k=1)
+            hits, cols = np.nonzero(close)
+            if len(hits):
+                yield hits + i, cols + j
+
+
+def build_hnsw_index(embeddings, m: int = 16, ef_construction: int = 200, batch: int = DEFAULT_BATCH,
+                     threads: int = -1, ids: Optional[np.ndarray] = None, rows: Optional[np.ndarray] = None):
+    """Build an inner-product HNSW index over normalized embeddings (or their rows subset)."""
+    import hnswlib
+
+    n = _count(embeddings, rows)
+    index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+    index.init_index(max_elements=max(n, 1), ef_construction=ef_construction, M=m)
+    for i in range(0, n, batch):
+        labels = np.arange(i, min(i + batch, n)) if ids is None else ids[i:i + batch]
+        index.add_items(normalize_rows(read_rows(embeddings, rows, i, i + batch)), labels, num_threads=threads)
+    return index
+
+
+def _hnsw_edges(embeddings, threshold: float, k: int, ef: int, m: int, batch: int, threads: int,
+                rows: Optional[np.ndarray] = None):
+    """Yield (a, b) index arrays of approximate radius-neighbour pairs."""
+    n = _count(embeddings, rows)
+    index = build_hnsw_index(embeddings, m=m, batch=batch, threads=threads, rows=rows)
+    k = min(k + 1, n)  # +1: every face finds itself
+    index.set_ef(max(ef, k))
+
+    for i in range(0, n, batch):
+        labels, distances = index.knn_query(normalize_rows(read_rows(embeddings, rows, i, i + batch)), k=k,
+                                            num_threads=threads)
+        # "ip" distance is 1 - dot product
+        hits, cols = np.nonzero(1.0 - distances >= threshold)
+        a = hits.astype(np.int64) + i
+        b = labels[hits, cols].astype(np.int64)
+        keep = a != b
+        yield a[keep], b[keep]
+
+
+def resolve_backend(backend: str, n: int) -> str:
+    """Pick the concrete backend for "auto"."""
+    if backend != "auto":
+        return backend
+    if n <= EXACT_MAX_FACES:
+        return "exact"
+    try:
+        import hnswlib  # noqa: F401
+        return "hnsw"
+    except ImportError:
+        print("Warning: hnswlib not installed (pip install hnswlib); clustering with the exact O(n^2) backend")
+        return "exact"
+
+
+def cluster_embeddings(embeddings, threshold: float, backend: str = "auto", k: int = 32, ef: int = 64,
+                       m: int = 16, batch: int = DEFAULT_BATCH, threads: int = -1,
+                       rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cluster embeddings by cosine similarity.
+
+    Returns one label per face: clusters of two or more faces are numbered
+    0.. in order of their first face, singletons get -1 (as with DBSCAN).
+    With rows, only those rows of embeddings are clustered, read batch by
+    batch, and the labels are per entry of rows.
+    """
+    n = _count(embeddings, rows)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    backend = resolve_backend(backend, n)
+    if backend == "exact":
+        edges = _exact_edges(embeddings, threshold, batch, rows)
+    elif backend == "hnsw":
+        edges = _hnsw_edges(embeddings, threshold, k, ef, m, batch, threads, rows)
+    else:
+        raise ValueError(f"Unknown clustering backend: {backend}")
+
+    uf = UnionFind(n)
+    for a, b in edges:
+        uf.union_edges(a, b)
+
+    roots = uf.components()
+    _, first_index, inverse, counts = np.unique(roots, return_index=True, return_inverse=True, return_counts=True)
+
+    # Number multi-face components by the position of their first face
+    order = np.argsort(first_index, kind="stable")
+    is_cluster = counts[order] >= 2
+    component_label = np.full(len(counts), -1, dtype=np.int64)
+    component_label[order[is_cluster]] = np.arange(is_cluster.sum(), dtype=np.int64)
+    return component_label[inverse]
+
+
+def assign_to_centroids(embeddings, centroids: np.ndarray, threshold: float, batch: int = DEFAULT_BATCH,
+                        rows: Optional[np.ndarray] = None):
+    """Nearest-centroid lookup in blocks.
+
+    Returns (centroid row, similarity) per embedding (per entry of rows if
+    given); the row is -1 where the best similarity is below threshold.
+    """
+    n = _count(embeddings, rows)
+    best = np.full(n, -1, dtype=np.int64)
+    best_sim = np.full(n, -np.inf, dtype=np.float32)
+    if n == 0 or len(centroids) == 0:
+        return best, best_sim
+
+    centroids = normalize_rows(centroids)
+    for i in range(0, n, batch):
+        block = normalize_rows(read_rows(embeddings, rows, i, i + batch))
+        block_rows = np.arange(len(block))
+        for j in range(0, len(centroids), batch):
+            sims = block @ centroids[j:j + batch].T
+            arg = sims.argmax(axis=1)
+            top = sims[block_rows, arg]
+            better = top > best_sim[i:i + len(block)]
+            best[i:i + len(block)][better] = arg[better] + j
+            best_sim[i:i + len(block)][better] = top[better]
+
+    best[best_sim < threshold] = -1
+    return best, best_sim
+
+
+def cluster_members(labels: np.ndarray) -> Iterator[tuple]:
+    """Yield (cluster_id, face indices) pairs, singletons as "singleton_{idx}".
+
+    Clusters come first in label order, then singletons (-1) in face order;
+    UNCLUSTERED faces are left out. Only the sort order is held in memory.
+    """
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    first = int(np.searchsorted(sorted_labels, 0))
+    bounds = np.flatnonzero(np.diff(sorted_labels[first:])) + first + 1
+    for lo, hi in zip(itertools.chain([first], bounds), itertools.chain(bounds, [len(order)])):
+        if lo < hi:
+            yield int(sorted_labels[lo]), order[lo:hi]
+    for idx in np.flatnonzero(labels == -1):
+        yield f"singleton_{idx}", np.array([idx])
+
+
+def cluster_centroids(embeddings, labels: np.ndarray, batch: int = DEFAULT_BATCH) -> np.ndarray:
+    """Mean normalized embedding per cluster label (labels >= 0), computed in batches."""
+    n_clusters = int(labels.max()) + 1 if len(labels) and labels.max() >= 0 else 0
+    sums = np.zeros((n_clusters, embeddings.shape[1]), dtype=np.float32)
+    counts = np.zeros(n_clusters, dtype=np.int64)
+
+    for i in range(0, len(embeddings), batch):
+        chunk_labels = labels[i:i + batch]
+        mask = chunk_labels >= 0
+        if not mask.any():
+            continue
+        np.add.at(sums, chunk_labels[mask], normalize_rows(embeddings[i:i + batch])[mask])
+        np.add.at(counts, chunk_labels[mask], 1)
+
+    return sums / np.maximum(counts, 1)[:, None]
+
@@ -0,0 +1,156 @@
+"""
+Line-delimited outputs of face_pipeline.py.
+
+    faces.jsonl          one face per line (the old faces.json records);
+                         each run appends the store rows not written yet
+    clusters.jsonl       one cluster per line, rewritten by every clustering
+                         (clusters_delta.jsonl for --cluster-state runs)
+    cluster_labels.npy   int64 cluster label per face store row
+    outputs.json         run summary: cluster totals, which cluster file is
+                         current, and how much of faces.jsonl is committed
+
+faces.jsonl is only trusted up to the byte count in outputs.json, so an
+append cut short by a crash is overwritten by the next one. Readers
+stream both files in fixed-size chunks; cluster_labels.npy is memory-
+mapped, so the loader maps faces to clusters without holding the
+clusters' face lists. The single-document faces.json / clusters.json of
+older runs are still read (whole) when no outputs.json exists.
+"""
+
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from .cluster_state import CLUSTERS_DELTA_FILENAME
+from .metadata import write_json_atomic
+
+FACES_FILENAME = "faces.jsonl"
+CLUSTERS_FILENAME = "clusters.jsonl"
+LABELS_FILENAME = "cluster_labels.npy"
+OUTPUTS_FILENAME = "outputs.json"
+LEGACY_FACES_FILENAME = "faces.json"
+LEGACY_CLUSTERS_FILENAMES = ("clusters_delta.json", "clusters.json")
+CHUNK_SIZE = 1000
+
+
+def read_summary(faces_dir: Path) -> dict:
+    """The outputs.json of a run, or {} for runs from before it existed."""
+    path = Path(faces_dir) / OUTPUTS_FILENAME
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_summary(faces_dir: Path, summary: dict):
+    write_json_atomic(Path(faces_dir) / OUTPUTS_FILENAME, summary)
+
+
+def append_jsonl(path: Path, records: Iterable[dict], committed_bytes: int = 0) -> int:
+    """Append records after the first committed_bytes of path; returns the new size.
+
+    Anything past committed_bytes (a torn earlier append) is dropped first.
+    """
+    path = Path(path)
+    with open(path, "ab") as f:
+        f.truncate(committed_bytes)
+        for chunk in iter_chunks(records):
+            f.write("".join(json.dumps(record) + "\n" for record in chunk).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        # tell() on an "ab" file still reports the pre-truncate size if nothing was written
+        return os.fstat(f.fileno()).st_size
+
+
+def write_jsonl(path: Path, records: Iterable[dict]) -> int:
+    """Replace path with one record per line (tmp file + rename); returns the count."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for chunk in iter_chunks(records):
+            f.write("".join(json.dumps(record) + "\n" for record in chunk))
+            count += len(chunk)
+    os.replace(tmp_path, path)
+    return count
+
+
+def iter_jsonl(path: Path, limit_bytes: Optional[int] = None) -> Iterator[dict]:
+    """Yield one record per line, stopping at limit_bytes if given."""
+    with open(path, "rb") as f:
+        position = 0
+        for line in f:
+            position += len(line)
+            if limit_bytes is not None and position > limit_bytes:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_chunks(items: Iterable, size: int = CHUNK_SIZE) -> Iterator[list]:
+    """Group an iterable into lists of at most size items."""
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def cluster_id_for(label: int, row: int) -> Optional[str]:
+    """cluster_id of the clusters file entry holding face store row `row`."""
+    if label >= 0:
+        return str(label)
+    if label == -1:
+        return f"singleton_{row}"
+    return None  # left unclustered (low quality)
+
+
+def load_cluster_labels(faces_dir: Path) -> Optional[np.ndarray]:
+    """Memory-mapped cluster label per face store row, if the run wrote them."""
+    path = Path(faces_dir) / LABELS_FILENAME
+    return np.load(path, mmap_mode="r") if path.exists() else None
+
+
+def iter_clusters(faces_dir: Path):
+    """Return (summary, cluster iterator, file) for a run's current cluster file.
+
+    The summary holds the run totals and, for incremental runs, state_id.
+    """
+    faces_dir = Path(faces_dir)
+    summary = read_summary(faces_dir).get("clusters")
+    if summary is not None:
+        path = faces_dir / summary["file"]
+        return summary, iter_jsonl(path), path
+
+    for name in LEGACY_CLUSTERS_FILENAMES:
+        path = faces_dir / name
+        if path.exists():
+            with open(path, "r") as f:
+                data = json.load(f)
+            clusters = data.pop("clusters", [])
+            return data, iter(clusters), path
+    return {}, iter(()), None
+
+
+def iter_faces(faces_dir: Path):
+    """Return (face count or None, face iterator) from faces.jsonl or a legacy faces.json."""
+    faces_dir = Path(faces_dir)
+    summary = read_summary(faces_dir)
+    if summary and (faces_dir / FACES_FILENAME).exists():
+        return summary.get("faces_written"), iter_jsonl(faces_dir / FACES_FILENAME, summary.get("faces_bytes"))
+
+    legacy = faces_dir / LEGACY_FACES_FILENAME
+    if legacy.exists():
+        with open(legacy, "r") as f:
+            faces = json.load(f).get("faces", [])
+        return len(faces), iter(faces)
+    return None, iter(())
+
+
+def clusters_filename(incremental: bool) -> str:
+    return CLUSTERS_DELTA_FILENAME if incremental else CLUSTERS_FILENAME
@@ -0,0 +1,224 @@
+"""
+Two-tier face detection for large scans.
+
+Most extracted images are document pages with no faces, often 5000px on
+the long side. Running the detector on the full frame means resizing the
+whole page to the detector input and then discarding it. TieredDetector
+instead:
+
+    1. (mode "skin") rejects colour images with almost no skin-tone pixels,
+       judged on a 128px thumbnail; greyscale images always pass,
+    2. runs the detector on a copy downscaled to ``max_side`` with a lower
+       score threshold, and rejects the image if nothing is found,
+    3. re-detects each candidate region (box plus margin, overlapping
+       regions merged) at full resolution, so crops and landmarks come from
+       the original pixels and small faces get more detector resolution.
+
+Rejected images never reach the full-resolution detector. ``audit_rate``
+runs full-frame detection on a random sample of images as well and
+compares the two, which gives the recall the prefilter costs.
+"""
+
+import random
+
+import numpy as np
+
+from .lazy import LazyModule
+
+cv2 = LazyModule("cv2", "pip install opencv-python")
+
+PREFILTER_MODES = ("off", "downscale", "skin")
+AUDIT_IOU = 0.5
+
+
+def skin_ratio(img, thumb_side: int = 128):
+    """Fraction of skin-tone pixels in a thumbnail, or None for greyscale images."""
+    h, w = img.shape[:2]
+    scale = thumb_side / max(h, w)
+    thumb = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) \
+        if scale < 1 else img
+    if thumb.ndim < 3 or (np.abs(thumb[..., 0].astype(np.int16) - thumb[..., 2]).max() <= 8):
+        return None
+
+    # Classic YCrCb skin range
+    ycrcb = cv2.cvtColor(thumb, cv2.COLOR_BGR2YCrCb)
+    mask = cv2.inRange(ycrcb, (0, 133, 77), (255, 173, 127))
+    return float(np.count_nonzero(mask)) / mask.size
+
+
+def merge_regions(regions: np.ndarray) -> np.ndarray:
+    """Union overlapping (x1, y1, x2, y2) boxes until none overlap."""
+    regions = [list(r) for r in regions]
+    merged = True
+    while merged and len(regions) > 1:
+        merged = False
+        out = []
+        for region in regions:
+            for other in out:
+                if region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]:
+                    other[0], other[1] = min(other[0], region[0]), min(other[1], region[1])
+                    other[2], other[3] = max(other[2], region[2]), max(other[3], region[3])
+                    merged = True
+                    break
+            else:
+                out.append(region)
+        regions = out
+    return np.array(regions, dtype=np.int64).reshape(-1, 4)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two sets of (x1, y1, x2, y2) boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class TieredDetector:
+    """Prefilter plus full-resolution region re-detection around an InsightFace detector."""
+
+    def __init__(self, det_model, mode: str = "downscale", max_side: int = 640, threshold: float = 0.3,
+                 margin: float = 0.5, min_skin: float = 0.01, min_face_size: int = 0,
+                 audit_rate: float = 0.0, seed: int = 0):
+        if mode not in PREFILTER_MODES:
+            raise ValueError(f"Unknown prefilter mode: {mode}")
+        self.det_model = det_model
+        self.mode = mode
+        self.max_side = max_side
+        self.threshold = threshold
+        self.margin = margin
+        self.min_skin = min_skin
+        self.min_face_size = min_face_size
+        self.audit_rate = audit_rate
+        self.rng = random.Random(seed)
+        self.stats = self.empty_stats()
+
+    @staticmethod
+    def empty_stats() -> dict:
+        return {
+            "images": 0,
+            "small_images": 0,
+            "rejected_skin": 0,
+            "rejected_downscale": 0,
+            "candidate_regions": 0,
+            "audited_images": 0,
+            "audit_reference_faces": 0,
+            "audit_found_faces": 0,
+        }
+
+    def take_stats(self) -> dict:
+        """Return the counters collected so far and reset them."""
+        stats, self.stats = self.stats, self.empty_stats()
+        return stats
+
+    def _full_frame(self, img):
+        return self.det_model.detect(img, max_num=0, metric="default")
+
+    def _screen(self, img):
+        """Low-threshold detection on a downscaled copy; returns boxes in full-res coordinates."""
+        h, w = img.shape[:2]
+        scale = self.max_side / max(h, w)
+        small = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+        det_thresh = self.det_model.det_thresh
+        self.det_model.det_thresh = self.threshold
+        try:
+            bboxes, _ = self.det_model.detect(small, max_num=0, metric="default")
+        finally:
+            self.det_model.det_thresh = det_thresh
+        return bboxes[:, :4] / scale
+
+    def _tiered(self, img):
+        """Returns (bboxes, kpss) like det_model.detect, or None if rejected with the reason."""
+        if self.mode == "skin":
+            ratio = skin_ratio(img)
+            if ratio is not None and ratio < self.min_skin:
+                return None, "rejected_skin"
+
+        boxes = self._screen(img)
+        if len(boxes) == 0:
+            return None, "rejected_downscale"
+
+        h, w = img.shape[:2]
+        pad = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])[:, None] * self.margin
+        regions = np.hstack([boxes[:, :2] - pad, boxes[:, 2:] + pad])
+        regions = np.clip(regions, 0, [w, h, w, h]).astype(np.int64)
+        regions = merge_regions(regions)
+        self.stats["candidate_regions"] += len(regions)
+
+        all_bboxes, all_kpss = [], []
+        for x1, y1, x2, y2 in regions:
+            bboxes, kpss = self.det_model.detect(img[y1:y2, x1:x2], max_num=0, metric="default")
+            if len(bboxes) == 0:
+                continue
+            offset = np.array([x1, y1], dtype=bboxes.dtype)
+            bboxes = bboxes.copy()
+            bboxes[:, 0:4] += np.tile(offset, 2)
+            all_bboxes.append(bboxes)
+            if kpss is not None:
+                all_kpss.append(kpss + offset)
+
+        if not all_bboxes:
+            return (np.empty((0, 5), dtype=np.float32), np.empty((0, 5, 2), dtype=np.float32)), None
+        kpss = np.concatenate(all_kpss) if len(all_kpss) == len(all_bboxes) else None
+        return (np.concatenate(all_bboxes), kpss), None
+
+    def _audit(self, img, bboxes):
+        """Compare against full-frame detection for the recall estimate."""
+        reference, _ = self._full_frame(img)
+        reference = reference[:, :4]
+        if self.min_face_size:
+            size = np.minimum(reference[:, 2] - reference[:, 0], reference[:, 3] - reference[:, 1])
+            reference = reference[size >= self.min_face_size]
+
+        self.stats["audited_images"] += 1
+        self.stats["audit_reference_faces"] += len(reference)
+        if len(reference) and len(bboxes):
+            found = box_iou(reference, bboxes[:, :4]).max(axis=1) >= AUDIT_IOU
+            self.stats["audit_found_faces"] += int(found.sum())
+
+    def detect(self, img):
+        """Drop-in for det_model.detect(img, max_num=0): returns (bboxes, kpss)."""
+        self.stats["images"] += 1
+        if self.mode == "off" or max(img.shape[:2]) <= self.max_side:
+            # Already detector-sized: nothing to save
+            self.stats["small_images"] += int(self.mode != "off")
+            return self._full_frame(img)
+
+        result, rejected = self._tiered(img)
+        if rejected:
+            self.stats[rejected] += 1
+            result = (np.empty((0, 5), dtype=np.float32), None)
+
+        if self.audit_rate and self.rng.random() < self.audit_rate:
+            self._audit(img, result[0])
+        return result
+
+
+def merge_stats(total: dict, stats: dict) -> dict:
+    """Add one set of prefilter counters into another."""
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def prefilter_report(stats: dict) -> str:
+    """Format skip rate and audited recall."""
+    images = stats.get("images", 0)
+    rejected = stats.get("rejected_skin", 0) + stats.get("rejected_downscale", 0)
+    lines = [
+        f"Prefilter: {rejected}/{images} images skipped ({rejected / max(images, 1):.1%}) "
+        f"[skin {stats.get('rejected_skin', 0)}, downscaled detection {stats.get('rejected_downscale', 0)}], "
+        f"{stats.get('candidate_regions', 0)} regions re-detected at full resolution"
+    ]
+    if stats.get("audited_images"):
+        reference = stats["audit_reference_faces"]
+        found = stats["audit_found_faces"]
+        recall = f"{found / reference:.1%}" if reference else "n/a (no faces in sample)"
+        lines.append(f"  Audit: {stats['audited_images']} images, {found}/{reference} full-frame faces "
+                     f"also found, recall {recall}")
+    return "\n".join(lines)
@@ -0,0 +1,114 @@
+"""
+Face quality scoring for face_pipeline.py.
+
+Every detected face gets a quality in [0, 1], the geometric mean of four
+component scores, each also in [0, 1]:
+
+    detection   the detector's confidence
+    pose        frontalness from the 5 landmarks: nose offset from the eye
+                midpoint (yaw) and nose height between eyes and mouth (pitch),
+                measured after undoing in-plane rotation
+    sharpness   variance of the Laplacian of the face at 112px,
+                v / (v + SHARPNESS_HALF) so SHARPNESS_HALF scores 0.5
+    size        shorter box side / 112px (the recognition input size)
+
+A geometric mean lets any one very poor component (a profile, a smear)
+pull the face down. The components are recorded with the face so the
+gate can be tuned afterwards without re-running detection.
+"""
+
+import numpy as np
+
+from .lazy import LazyModule
+
+cv2 = LazyModule("cv2", "pip install opencv-python")
+
+QUALITY_MODES = ("drop", "downweight")
+QUALITY_FIELDS = ("quality", "sharpness", "pose")
+REFERENCE_SIDE = 112
+SHARPNESS_HALF = 100.0
+MAX_YAW = 0.6  # nose offset / eye distance at which pose scores 0
+MAX_PITCH = 0.35  # deviation of nose height ratio from 0.5 at which pose scores 0
+
+
+def sharpness_score(img, bbox) -> float:
+    """Laplacian-variance sharpness of the face region, normalized to 112px."""
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = (int(round(v)) for v in bbox[:4])
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return 0.0
+
+    face = img[y1:y2, x1:x2]
+    if face.ndim == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    face = cv2.resize(face, (REFERENCE_SIDE, REFERENCE_SIDE), interpolation=cv2.INTER_AREA)
+    variance = float(cv2.Laplacian(face, cv2.CV_64F).var())
+    return variance / (variance + SHARPNESS_HALF)
+
+
+def pose_score(kps) -> float:
+    """Frontalness from 5-point landmarks (eyes, nose, mouth corners); 1.0 if unknown."""
+    if kps is None:
+        return 1.0
+    kps = np.asarray(kps, dtype=np.float64)
+    left_eye, right_eye, nose = kps[0], kps[1], kps[2]
+    mouth = (kps[3] + kps[4]) / 2
+    eye_mid = (left_eye + right_eye) / 2
+
+    eye_vec = right_eye - left_eye
+    eye_dist = np.hypot(*eye_vec)
+    if eye_dist < 1e-6:
+        return 0.0
+
+    # Rotate into the eye line's frame so head tilt doesn't read as yaw
+    cos, sin = eye_vec / eye_dist
+    rotate = np.array([[cos, sin], [-sin, cos]])
+    nose_rel = rotate @ (nose - eye_mid)
+    mouth_rel = rotate @ (mouth - eye_mid)
+
+    yaw = abs(nose_rel[0]) / eye_dist
+    pitch = abs(nose_rel[1] / mouth_rel[1] - 0.5) if mouth_rel[1] > 1e-6 else 1.0
+    return float(np.clip(1 - yaw / MAX_YAW, 0, 1) * np.clip(1 - pitch / MAX_PITCH, 0, 1))
+
+
+def face_quality(img, bbox, kps, det_score: float) -> dict:
+    """Quality score and its recorded components for one detected face."""
+    side = min(bbox[2] - bbox[0], bbox[3] - bbox[1])
+    size = float(np.clip(side / REFERENCE_SIDE, 0, 1))
+    sharpness = sharpness_score(img, bbox)
+    pose = pose_score(kps)
+    detection = float(np.clip(det_score, 0, 1))
+
+    quality = float(np.prod([detection, pose, sharpness, size]) ** 0.25)
+    return {"quality": round(quality, 4), "sharpness": round(sharpness, 4), "pose": round(pose, 4)}
+
+
+class QualityGate:
+    """Scores faces and decides which ones are embedded.
+
+    mode "drop" discards faces below ``min_quality`` before embedding;
+    "downweight" keeps them, and clustering only uses them to join clusters
+    formed by better faces.
+    """
+
+    def __init__(self, min_quality: float = 0.0, mode: str = "downweight"):
+        if mode not in QUALITY_MODES:
+            raise ValueError(f"Unknown quality mode: {mode}")
+        self.min_quality = min_quality
+        self.mode = mode
+        self.dropped = 0
+
+    def check(self, img, face) -> bool:
+        """Score a face (sets ``face.quality``); False if it should be dropped."""
+        face.quality = face_quality(img, face.bbox, getattr(face, "kps", None), face.det_score)
+        if self.mode == "drop" and face.quality["quality"] < self.min_quality:
+            self.dropped += 1
+            return False
+        return True
+
+    @property
+    def cluster_floor(self) -> float:
+        """Quality below which faces stay out of the clustering graph."""
+        return self.min_quality if self.mode == "downweight" else 0.0
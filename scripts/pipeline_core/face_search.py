@@ -0,0 +1,265 @@
+"""
+Query-by-face search over face_pipeline.py output.
+
+FaceIndex keeps a persisted HNSW index over the face store's embeddings
+in ``face_index/`` next to the store:
+
+    index.json    indexed row count, HNSW parameters and the face_id of
+                  the last indexed row (to notice a rewritten store)
+    faces.hnsw    hnswlib index; labels are face store rows (embedding_idx)
+
+``update()`` only adds store rows past the indexed count, so after a
+--resume or incremental run the index catches up in time proportional to
+the new faces. A store that was rewritten (fewer rows, or another face at
+the last indexed row) is re-indexed from scratch. Rows not indexed yet,
+and every row when hnswlib is missing, are scanned exactly, so a search
+always covers the whole store.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .face_cluster import DEFAULT_BATCH, normalize_rows
+from .face_outputs import cluster_id_for, iter_clusters, load_cluster_labels
+from .face_store import EMBEDDING_DIM, STORE_DIRNAME, FaceStore
+from .lazy import LazyModule
+from .metadata import write_json_atomic
+
+cv2 = LazyModule("cv2", "pip install opencv-python")
+hnswlib = LazyModule("hnswlib", "pip install hnswlib")
+
+INDEX_DIRNAME = "face_index"
+INDEX_META = "index.json"
+INDEX_FILE = "faces.hnsw"
+INDEX_VERSION = 1
+
+# extract_images.py names images {document_id}_page{n}_img{i}_{hash}.{ext}
+# (without the _{hash} suffix in older runs)
+_IMAGE_NAME = re.compile(r"^(?P<document>.+)_page\d+_img\d+(?:_[0-9a-f]+)?$")
+
+
+def document_for_image(source_image: str) -> Optional[str]:
+    """Document id an extracted image came from, or None if the name doesn't say."""
+    match = _IMAGE_NAME.match(Path(source_image).stem)
+    return match.group("document") if match else None
+
+
+def _merge_top_k(rows_a, scores_a, rows_b, scores_b, k: int):
+    """Merge two [q, *] candidate lists into the best k per query."""
+    rows = np.concatenate([rows_a, rows_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1)
+    k = min(k, rows.shape[1])
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(rows, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+class FaceIndex:
+    """Persisted, incrementally updated nearest-neighbour index over a face store."""
+
+    def __init__(self, faces_dir: Path, m: int = 16, ef_construction: int = 200, ef: int = 128):
+        self.faces_dir = Path(faces_dir)
+        self.store = FaceStore.open(self.faces_dir / STORE_DIRNAME)
+        self.index_dir = self.faces_dir / INDEX_DIRNAME
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.index = None
+        self.count = 0
+        self.labels = load_cluster_labels(self.faces_dir)
+        self._clusters = None
+        self._load()
+
+    def _last_face_id(self, count: int) -> str:
+        return self.store.columns["face_id"].get(count - 1) if count else ""
+
+    def _load(self):
+        meta_path = self.index_dir / INDEX_META
+        if not meta_path.exists() or not hnswlib.available():
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        count = meta.get("count", 0)
+        if (meta.get("version") != INDEX_VERSION or count > len(self.store)
+                or meta.get("last_face_id") != self._last_face_id(count)):
+            print(f"Face store changed since {self.index_dir} was built; it will be rebuilt")
+            return
+
+        self.m = meta.get("m", self.m)
+        self.ef_construction = meta.get("ef_construction", self.ef_construction)
+        if count:
+            self.index = hnswlib.Index(space="ip", dim=EMBEDDING_DIM)
+            self.index.load_index(str(self.index_dir / INDEX_FILE), max_elements=count)
+        self.count = count
+
+    @property
+    def pending(self) -> int:
+        """Store rows not in the index yet."""
+        return len(self.store) - self.count
+
+    def update(self, batch: int = DEFAULT_BATCH, threads: int = -1) -> int:
+        """Index the store rows added since the last update; returns how many."""
+        if not hnswlib.available():
+            print("hnswlib not installed (pip install hnswlib); searches scan the store instead")
+            return 0
+
+        n = len(self.store)
+        added = n - self.count
+        if added <= 0:
+            return 0
+
+        if self.index is None:
+            self.index = hnswlib.Index(space="ip", dim=EMBEDDING_DIM)
+            self.index.init_index(max_elements=n, ef_construction=self.ef_construction, M=self.m)
+        else:
+            self.index.resize_index(n)
+
+        embeddings = self.store.embeddings
+        for i in range(self.count, n, batch):
+            stop = min(i + batch, n)
+            self.index.add_items(normalize_rows(embeddings[i:stop]), np.arange(i, stop), num_threads=threads)
+        self.count = n
+        self.save()
+        return added
+
+    def save(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if self.index is not None:
+            tmp_path = self.index_dir / f".{INDEX_FILE}.tmp"
+            self.index.save_index(str(tmp_path))
+            tmp_path.replace(self.index_dir / INDEX_FILE)
+        write_json_atomic(self.index_dir / INDEX_META, {
+            "version": INDEX_VERSION,
+            "count": self.count,
+            "last_face_id": self._last_face_id(self.count),
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+        })
+
+    def _scan(self, queries: np.ndarray, start: int, k: int, batch: int):
+        """Exact top-k over store rows [start, n) in blocks."""
+        embeddings = self.store.embeddings
+        n = len(self.store)
+        rows = np.empty((len(queries), 0), dtype=np.int64)
+        scores = np.empty((len(queries), 0), dtype=np.float32)
+        for i in range(start, n, batch):
+            sims = queries @ normalize_rows(embeddings[i:min(i + batch, n)]).T
+            top = np.argpartition(-sims, min(k, sims.shape[1]) - 1, axis=1)[:, :k]
+            rows, scores = _merge_top_k(rows, scores, top + i, np.take_along_axis(sims, top, axis=1), k)
+        return rows, scores
+
+    def search(self, queries, k: int = 10, batch: int = DEFAULT_BATCH):
+        """Top-k most similar faces per query embedding.
+
+        Returns (store rows [q, k], cosine similarities [q, k]) sorted by
+        descending similarity; k is capped at the number of faces.
+        """
+        queries = normalize_rows(np.asarray(queries).reshape(-1, EMBEDDING_DIM))
+        k = min(k, len(self.store))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+
+        rows = np.empty((len(queries), 0), dtype=np.int64)
+        scores = np.empty((len(queries), 0), dtype=np.float32)
+        if self.index is not None and self.count:
+            index_k = min(k, self.count)
+            self.index.set_ef(max(self.ef, index_k))
+            labels, distances = self.index.knn_query(queries, k=index_k)
+            # "ip" distance is 1 - dot product
+            rows, scores = labels.astype(np.int64), (1.0 - distances).astype(np.float32)
+        if self.count < len(self.store):
+            tail_rows, tail_scores = self._scan(queries, self.count, k, batch)
+            rows, scores = _merge_top_k(rows, scores, tail_rows, tail_scores, k)
+        return rows, scores
+
+    def cluster_of(self, row: int, face_id: str) -> Optional[str]:
+        """Cluster id of a face: from cluster_labels.npy, else the cluster file's face lists."""
+        if self.labels is not None:
+            return cluster_id_for(int(self.labels[row]), row) if row < len(self.labels) else None
+        if self._clusters is None:
+            self._clusters = {}
+            _, clusters, _ = iter_clusters(self.faces_dir)
+            for cluster in clusters:
+                for member in cluster.get("face_ids", []):
+                    self._clusters[member] = cluster.get("cluster_id")
+        return self._clusters.get(face_id)
+
+    def describe(self, rows: np.ndarray, scores: np.ndarray) -> list:
+        """Turn one query's rows and scores into result dicts."""
+        results = []
+        for row, score in zip(rows, scores):
+            record = self.store.record(int(row))
+            results.append({
+                "face_id": record["face_id"],
+                "score": round(float(score), 4),
+                "source_image": record["source_image"],
+                "document": document_for_image(record["source_image"]),
+                "crop_path": record.get("crop_path") or None,
+                "cluster_id": self.cluster_of(int(row), record["face_id"]),
+                "embedding_idx": int(row),
+            })
+        return results
+
+
+def top_clusters(results: list) -> list:
+    """Clusters among the hits of one query, by best score, with their hit counts."""
+    clusters = {}
+    for hit in results:
+        if hit["cluster_id"] is None:
+            continue
+        entry = clusters.setdefault(hit["cluster_id"], {"cluster_id": hit["cluster_id"], "score": hit["score"], "hits": 0})
+        entry["score"] = max(entry["score"], hit["score"])
+        entry["hits"] += 1
+    return sorted(clusters.values(), key=lambda c: (-c["score"], -c["hits"]))
+
+
+def embed_query(face_app, img, all_faces: bool = False, crop: bool = False) -> list:
+    """Embeddings to search for in a photo or face crop: [(bbox or None, embedding)].
+
+    Photos are run through detection and the largest face is used (every
+    face with ``all_faces``). ``crop`` skips detection and embeds the whole
+    image as an aligned face crop, which is also the fallback when nothing
+    is detected (crops written by face_pipeline.py are often too tight for
+    the detector).
+    """
+    if not crop:
+        faces = [face for face in face_app.get(img) if getattr(face, "embedding", None) is not None]
+        if faces:
+            faces.sort(key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]), reverse=True)
+            return [([int(v) for v in face.bbox[:4]], face.embedding) for face in faces[:None if all_faces else 1]]
+
+    recognition = face_app.models["recognition"]
+    size = recognition.input_size[0]
+    aligned = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+    return [(None, recognition.get_feat([aligned]).flatten())]
+
+
+class FaceSearch:
+    """Photo-in, faces-out search: embeds the query faces and looks them up in a FaceIndex."""
+
+    def __init__(self, faces_dir: Path, face_app, update: bool = True, **index_kwargs):
+        self.face_app = face_app
+        self.index = FaceIndex(faces_dir, **index_kwargs)
+        if update and self.index.pending:
+            self.index.update()
+
+    def search_image(self, image, k: int = 10, all_faces: bool = False, crop: bool = False) -> list:
+        """Search with an image path or BGR array; one entry per query face.
+
+        Each entry is {"bbox", "results": top-k face dicts, "clusters"}.
+        """
+        img = cv2.imread(str(image)) if isinstance(image, (str, Path)) else image
+        if img is None:
+            raise ValueError(f"Could not read image: {image}")
+
+        queries = embed_query(self.face_app, img, all_faces=all_faces, crop=crop)
+        rows, scores = self.index.search(np.stack([embedding for _, embedding in queries]), k=k)
+        entries = []
+        for (bbox, _), query_rows, query_scores in zip(queries, rows, scores):
+            results = self.index.describe(query_rows, query_scores)
+            entries.append({"bbox": bbox, "results": results, "clusters": top_clusters(results)})
+        return entries
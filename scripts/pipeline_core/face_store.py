@@ -0,0 +1,467 @@
+"""
+Append-only on-disk store for detected faces.
+
+face_pipeline.py appends faces here as they are detected instead of
+holding them in Python lists. The store is a directory of column files:
+
+    store.json          manifest: store id, committed row count and column schema
+    embeddings.f32      float32 [n, 512] embedding matrix (.f16 for float16,
+                        .i8 for int8 plus embedding_scale.f32 per row)
+    bbox.i32            int32 [n, 4] crop box (x, y, w, h)
+    confidence.f32      float32 [n] detection score
+    quality.f32         float32 [n] face quality, plus sharpness/pose components
+    face_id.str/.off    UTF-8 string heap + int64 offsets [n + 1]
+    ...
+
+Fixed-width columns are memory-mapped and grow by doubling, so appends
+are amortized O(1) and readers (clustering, load_database.py) get numpy
+views of the files without copying. Only rows up to the manifest's
+``count`` are valid; ``flush`` advances it, so after a crash the store
+reopens at the last flush.
+
+The embedding format is chosen when a store is created (see
+``face_columns``). int8 rows are quantized symmetrically per vector, the
+row's largest magnitude mapping to 127, and are dequantized on read.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .metadata import write_json_atomic
+
+STORE_DIRNAME = "face_store"
+MANIFEST_NAME = "store.json"
+STORE_VERSION = 1
+EMBEDDING_DIM = 512
+INITIAL_CAPACITY = 1024
+
+# name -> (dtype, row shape); strings use dtype "str"
+FACE_COLUMNS = {
+    "embeddings": ("<f4", (EMBEDDING_DIM,)),
+    "bbox": ("<i4", (4,)),
+    "confidence": ("<f4", ()),
+    "quality": ("<f4", ()),
+    "sharpness": ("<f4", ()),
+    "pose": ("<f4", ()),
+    "face_id": ("str", ()),
+    "source_image": ("str", ()),
+    "crop_path": ("str", ()),
+    "image_sha256": ("str", ()),
+}
+
+# Embedding storage formats: name -> column dtype
+EMBEDDING_FORMATS = {"float32": "<f4", "float16": "<f2", "int8": "|i1"}
+SCALE_COLUMN = "embedding_scale"
+_EMBEDDING_COLUMNS = ("embeddings", SCALE_COLUMN)
+
+_SUFFIXES = {"<f4": ".f32", "<f2": ".f16", "<i4": ".i32", "<i8": ".i64", "|i1": ".i8", "|u1": ".u8"}
+
+
+def _to_python(value, dtype: str):
+    """Convert a column value for JSON; float32 is rounded to its real precision."""
+    if isinstance(value, np.ndarray) or isinstance(value, np.generic):
+        value = value.tolist()
+    if dtype in ("<f4", "<f2") and isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def face_columns(embedding_format: str = "float32") -> dict:
+    """Column schema for a new store whose embeddings use the given format."""
+    if embedding_format not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format: {embedding_format}")
+    columns = {"embeddings": (EMBEDDING_FORMATS[embedding_format], (EMBEDDING_DIM,))}
+    if embedding_format == "int8":
+        columns[SCALE_COLUMN] = ("<f4", ())
+    columns.update((name, spec) for name, spec in FACE_COLUMNS.items() if name != "embeddings")
+    return columns
+
+
+def quantize_int8(embeddings):
+    """Symmetric per-vector int8 quantization; returns (rows, scales) with row ~= q * scale."""
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    rows = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+
+def encode_embeddings(embeddings, embedding_format: str):
+    """Convert float32 embeddings to a storage format; returns (rows, scales or None)."""
+    if embedding_format == "int8":
+        return quantize_int8(embeddings)
+    dtype = EMBEDDING_FORMATS[embedding_format]
+    return np.asarray(embeddings, dtype=np.float32).reshape(-1, EMBEDDING_DIM).astype(dtype), None
+
+
+def decode_embeddings(rows, scales=None) -> np.ndarray:
+    """Convert stored embedding rows (and int8 scales) back to float32."""
+    rows = np.asarray(rows).astype(np.float32)
+    if scales is None:
+        return rows
+    scales = np.asarray(scales, dtype=np.float32)
+    return rows * (scales[..., None] if rows.ndim > 1 else scales)
+
+
+class QuantizedEmbeddings:
+    """Read-only [n, 512] float32 view of int8 rows, dequantized on indexing."""
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, rows: np.ndarray, scales: np.ndarray):
+        self.rows = rows
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def shape(self) -> tuple:
+        return self.rows.shape
+
+    def __getitem__(self, key) -> np.ndarray:
+        return decode_embeddings(self.rows[key], self.scales[key])
+
+    def __array__(self, dtype=None, copy=None):
+        embeddings = self[:]
+        return embeddings if dtype is None else embeddings.astype(dtype)
+
+
+class GrowableArray:
+    """Fixed-width column backed by a memory-mapped file that grows by doubling."""
+
+    def __init__(self, path: Path, dtype: str, row_shape: tuple = (), count: int = 0, writable: bool = True):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+        self.count = count
+        self.writable = writable
+        self._map = None
+        self.capacity = 0
+
+        if writable:
+            self.path.touch(exist_ok=True)
+            existing = os.path.getsize(self.path) // self.row_bytes
+            self._remap(max(existing, count, INITIAL_CAPACITY))
+
+    def _remap(self, capacity: int):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        os.truncate(self.path, capacity * self.row_bytes)
+        self._map = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity,) + self.row_shape)
+        self.capacity = capacity
+
+    def append(self, rows) -> int:
+        """Append rows and return the index of the first one."""
+        rows = np.asarray(rows, dtype=self.dtype).reshape((-1,) + self.row_shape)
+        start = self.count
+        needed = start + len(rows)
+        if needed > self.capacity:
+            capacity = self.capacity
+            while capacity < needed:
+                capacity *= 2
+            self._remap(capacity)
+        self._map[start:needed] = rows
+        self.count = needed
+        return start
+
+    def truncate(self, count: int):
+        """Drop rows past count (their bytes are overwritten by later appends)."""
+        self.count = min(self.count, count)
+
+    def view(self) -> np.ndarray:
+        """Return the valid rows as a numpy view of the file (no copy)."""
+        if self._map is not None:
+            return self._map[:self.count]
+        if self.count == 0:
+            return np.empty((0,) + self.row_shape, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.count,) + self.row_shape)
+
+    def flush(self):
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._map = None
+
+
+def string_at(view: tuple, index: int) -> str:
+    """String `index` of a StringColumn.view(), for reading many without remapping."""
+    heap, offsets = view
+    return bytes(heap[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+
+class StringColumn:
+    """Variable-length UTF-8 strings: a byte heap plus int64 offsets."""
+
+    def __init__(self, base_path: Path, count: int = 0, writable: bool = True):
+        self.heap_path = Path(f"{base_path}.str")
+        self.offsets = GrowableArray(Path(f"{base_path}.off"), "<i8", (), count + 1 if writable else 0, writable)
+        self.writable = writable
+        self._heap = None
+
+        if writable:
+            if self.offsets.count == 1 and count == 0:
+                self.offsets._map[0] = 0
+            end = int(self.offsets._map[count]) if count else 0
+            self.heap_path.touch(exist_ok=True)
+            self._heap = open(self.heap_path, "r+b")
+            self._heap.truncate(end)
+            self._heap.seek(end)
+        else:
+            self.offsets.count = count + 1
+
+    def append(self, values: list):
+        if not values:
+            return
+        encoded = [(v or "").encode("utf-8") for v in values]
+        start = int(self.offsets.view()[-1])
+        ends = start + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        self._heap.write(b"".join(encoded))
+        self.offsets.append(ends)
+
+    def truncate(self, count: int):
+        self.offsets.truncate(count + 1)
+        end = int(self.offsets.view()[-1])
+        self._heap.truncate(end)
+        self._heap.seek(end)
+
+    def view(self):
+        """Return (heap bytes, offsets) as memory-mapped arrays."""
+        if self._heap is not None:
+            self._heap.flush()
+        offsets = self.offsets.view()
+        size = int(offsets[-1]) if len(offsets) else 0
+        if size == 0:
+            return np.empty(0, dtype=np.uint8), offsets
+        return np.memmap(self.heap_path, dtype=np.uint8, mode="r", shape=(size,)), offsets
+
+    def get(self, index: int) -> str:
+        return string_at(self.view(), index)
+
+    def __iter__(self) -> Iterator[str]:
+        view = self.view()
+        for i in range(len(view[1]) - 1):
+            yield string_at(view, i)
+
+    def flush(self):
+        if self._heap is not None:
+            self._heap.flush()
+        self.offsets.flush()
+
+    def close(self):
+        self.flush()
+        if self._heap is not None:
+            self._heap.close()
+            self._heap = None
+        self.offsets.close()
+
+
+class FaceStore:
+    """Columnar, memory-mapped table of detected faces and their embeddings."""
+
+    def __init__(self, directory: Path, mode: str = "a", columns: Optional[dict] = None):
+        """Open a store.
+
+        mode "w" starts a new store (removing any existing rows), "a" appends to
+        an existing one from its last flush, "r" opens it read-only.
+        """
+        self.directory = Path(directory)
+        self.writable = mode in ("w", "a")
+        manifest = self._read_manifest()
+
+        if mode == "w" or manifest is None:
+            if not self.writable:
+                raise FileNotFoundError(f"No face store at {self.directory}")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for path in self.directory.iterdir():
+                if path.name != MANIFEST_NAME:
+                    path.unlink()
+            self.schema = dict(columns or FACE_COLUMNS)
+            self.count = 0
+            self.store_id = uuid.uuid4().hex[:12]
+        else:
+            self.schema = {name: (spec[0], tuple(spec[1])) for name, spec in manifest["columns"].items()}
+            # New columns can be added to an existing store, but its embedding format is fixed
+            for name, spec in (columns or {}).items():
+                if name not in _EMBEDDING_COLUMNS:
+                    self.schema.setdefault(name, spec)
+            self.count = manifest["count"]
+            # Stores written before ids were recorded get one on their next flush
+            self.store_id = manifest.get("store_id") or uuid.uuid4().hex[:12]
+
+        self.columns = {}
+        for name, (dtype, shape) in self.schema.items():
+            base = self.directory / name
+            if dtype == "str":
+                self.columns[name] = StringColumn(base, self.count, self.writable)
+            else:
+                path = Path(f"{base}{_SUFFIXES[dtype]}")
+                self.columns[name] = GrowableArray(path, dtype, shape, self.count, self.writable)
+                if self.writable:
+                    self.columns[name].truncate(self.count)
+
+        if self.writable:
+            self.flush()
+
+    @classmethod
+    def open(cls, directory: Path) -> "FaceStore":
+        """Open an existing store read-only."""
+        return cls(directory, mode="r")
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        return (Path(directory) / MANIFEST_NAME).exists()
+
+    def _read_manifest(self) -> Optional[dict]:
+        path = self.directory / MANIFEST_NAME
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def embedding_format(self) -> str:
+        """Storage format of the embedding column (a key of EMBEDDING_FORMATS)."""
+        dtype = self.schema["embeddings"][0]
+        return next(name for name, fmt in EMBEDDING_FORMATS.items() if fmt == dtype)
+
+    def append(self, records: list, embeddings) -> range:
+        """Append faces; records are face dicts as produced by detect_faces.
+
+        Embeddings are float32 and converted to the store's format. Returns
+        the row indices assigned, which double as embedding_idx.
+        """
+        if not records:
+            return range(self.count, self.count)
+
+        n = len(records)
+        rows, scales = encode_embeddings(embeddings, self.embedding_format)
+        for name, (dtype, shape) in self.schema.items():
+            column = self.columns[name]
+            if name == "embeddings":
+                column.append(rows)
+            elif name == SCALE_COLUMN:
+                column.append(scales)
+            elif name == "bbox":
+                column.append([[r["bbox"]["x"], r["bbox"]["y"], r["bbox"]["w"], r["bbox"]["h"]] for r in records])
+            elif dtype == "str":
+                column.append([r.get(name) or "" for r in records])
+            else:
+                column.append([r.get(name, 0) for r in records])
+
+        start = self.count
+        self.count += n
+        return range(start, self.count)
+
+    def truncate(self, count: int):
+        """Drop rows past count."""
+        for column in self.columns.values():
+            column.truncate(count)
+        self.count = min(self.count, count)
+
+    @property
+    def embeddings(self):
+        """The [n, 512] embedding matrix as a memory-mapped view.
+
+        float16 stores return the float16 view; int8 stores return a
+        QuantizedEmbeddings that dequantizes the rows it is indexed with.
+        """
+        rows = self.columns["embeddings"].view()
+        if SCALE_COLUMN in self.columns:
+            return QuantizedEmbeddings(rows, self.columns[SCALE_COLUMN].view())
+        return rows
+
+    def column(self, name: str):
+        """Return a fixed-width column view, or an iterator for string columns."""
+        column = self.columns[name]
+        return column.view() if isinstance(column, GrowableArray) else iter(column)
+
+    def record(self, index: int) -> dict:
+        """Return one face as a dict in the faces.json format."""
+        record = {}
+        for name, (dtype, _) in self.schema.items():
+            column = self.columns[name]
+            if name in _EMBEDDING_COLUMNS:
+                continue
+            elif name == "bbox":
+                x, y, w, h = (int(v) for v in column.view()[index])
+                record["bbox"] = {"x": x, "y": y, "w": w, "h": h}
+            elif dtype == "str":
+                record[name] = column.get(index)
+            else:
+                record[name] = _to_python(column.view()[index], dtype)
+        record["embedding_idx"] = index
+        return record
+
+    def iter_records(self, start: int = 0, stop: Optional[int] = None, chunk_size: int = 10000) -> Iterator[dict]:
+        """Yield face dicts in row order, reading columns chunk by chunk."""
+        stop = self.count if stop is None else min(stop, self.count)
+        string_columns = {name: self.columns[name].view() for name, (dtype, _) in self.schema.items() if dtype == "str"}
+        fixed_columns = {name: self.columns[name].view() for name, (dtype, _) in self.schema.items()
+                         if dtype != "str" and name not in _EMBEDDING_COLUMNS}
+
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            fixed = {name: view[chunk_start:chunk_stop].tolist() for name, view in fixed_columns.items()}
+            for offset in range(chunk_stop - chunk_start):
+                index = chunk_start + offset
+                record = {}
+                for name, (heap, offsets) in string_columns.items():
+                    record[name] = bytes(heap[offsets[index]:offsets[index + 1]]).decode("utf-8")
+                for name, values in fixed.items():
+                    if name == "bbox":
+                        x, y, w, h = values[offset]
+                        record["bbox"] = {"x": x, "y": y, "w": w, "h": h}
+                    else:
+                        record[name] = _to_python(values[offset], self.schema[name][0])
+                record["embedding_idx"] = index
+                yield record
+
+    def flush(self):
+        """Persist column data, then commit the row count in the manifest."""
+        if not self.writable:
+            return
+        for column in self.columns.values():
+            column.flush()
+        write_json_atomic(self.directory / MANIFEST_NAME, {
+            "version": STORE_VERSION,
+            "store_id": self.store_id,
+            "count": self.count,
+            "columns": {name: [dtype, list(shape)] for name, (dtype, shape) in self.schema.items()},
+        })
+
+    def close(self):
+        if self.writable:
+            self.flush()
+        for column in self.columns.values():
+            if hasattr(column, "close"):
+                column.close()
+
+
+def load_embeddings(faces_dir: Path) -> Optional[np.ndarray]:
+    """Return the embedding matrix of a face pipeline output without copying.
+
+    Reads the face store if present, else a legacy embeddings.npy (memory-mapped).
+    Rows come back float32 or float16; int8 stores are dequantized on indexing.
+    """
+    faces_dir = Path(faces_dir)
+    store_dir = faces_dir / STORE_DIRNAME
+    if FaceStore.exists(store_dir):
+        return FaceStore.open(store_dir).embeddings
+
+    npy = faces_dir / "embeddings.npy"
+    if npy.exists():
+        return np.load(npy, mmap_mode="r")
+    return None
@@ -0,0 +1,104 @@
+"""
+Lazy loading for heavy optional dependencies.
+
+spaCy, InsightFace, OpenCV and scikit-learn each take hundreds of
+milliseconds (spaCy models: seconds) to import. The scripts reference them
+through ``LazyModule`` proxies and cached loader functions so that
+``--help``, argument errors and dry runs start instantly, and the cost is
+only paid by the stage that actually uses the model.
+"""
+
+import importlib
+import sys
+from functools import lru_cache
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str, install_hint: str = ""):
+        self._name = name
+        self._install_hint = install_hint
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                hint = f" Install with: {self._install_hint}" if self._install_hint else ""
+                raise ImportError(f"{self._name} is required but not installed.{hint}") from e
+        return self._module
+
+    def available(self) -> bool:
+        """Return True if the module can be imported."""
+        try:
+            self._load()
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def require(*modules: LazyModule):
+    """Import the given lazy modules now, exiting with an install hint if any is missing."""
+    for module in modules:
+        try:
+            module._load()
+        except ImportError as e:
+            print(f"Missing dependencies. {e}")
+            sys.exit(1)
+
+
+@lru_cache(maxsize=None)
+def load_spacy_model(name: str = "en_core_web_sm"):
+    """Load a spaCy pipeline once per process, or return None if unavailable."""
+    try:
+        import spacy
+        return spacy.load(name)
+    except (ImportError, OSError):
+        print("Warning: spaCy not available. Install with: pip install spacy && python -m spacy download en_core_web_sm")
+        return None
+
+
+def insightface_available() -> bool:
+    """Return True if InsightFace can be imported."""
+    try:
+        import insightface.app  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def load_face_analysis(providers: list, ctx_id: int, det_size=(640, 640), name: str = "buffalo_l",
+                       sess_options=None):
+    """Create and prepare an InsightFace FaceAnalysis app.
+
+    InsightFace only hands ``providers`` to the ONNX Runtime sessions it
+    creates, so with ``sess_options`` (e.g. a per-worker thread count) each
+    model's session is rebuilt with them after ``prepare()``.
+    """
+    from insightface.app import FaceAnalysis
+
+    face_app = FaceAnalysis(name=name, providers=providers)
+    face_app.prepare(ctx_id=ctx_id, det_size=det_size)
+
+    if sess_options is not None:
+        import onnxruntime
+
+        for model in face_app.models.values():
+            model.session = onnxruntime.InferenceSession(model.model_file, sess_options=sess_options,
+                                                         providers=providers)
+            threads = model.session.get_session_options().intra_op_num_threads
+            if threads != sess_options.intra_op_num_threads:
+                raise RuntimeError(f"ONNX Runtime session of {model.model_file} uses {threads} threads, "
+                                   f"not {sess_options.intra_op_num_threads}")
+    return face_app
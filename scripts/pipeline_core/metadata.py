@@ -0,0 +1,88 @@
+"""
+Readers and writers for the per-document metadata JSON and text files
+produced by ocr_pipeline.py.
+
+Layout of a processed dataset::
+
+    DataSet_10/
+        metadata/{stem}.json          document metadata
+        metadata/{stem}_images.json   image metadata (extract_images.py)
+        text/{stem}.txt               extracted text
+        pdfs/{filename}.pdf
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Read once at import: os.umask can only be read by setting it, which isn't thread-safe
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def is_document_metadata(path: Path) -> bool:
+    """True for document metadata JSONs (not image metadata or manifests)."""
+    name = path.name
+    return (
+        name.endswith(".json")
+        and "_images" not in name
+        and "manifest" not in name
+        and path.parent.name == "metadata"
+    )
+
+
+def iter_document_metadata(input_dir: Path) -> Iterator[Path]:
+    """Yield every document metadata JSON below input_dir in a stable order."""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        if os.path.basename(root) != "metadata":
+            continue
+        for name in sorted(files):
+            path = Path(root) / name
+            if is_document_metadata(path):
+                yield path
+
+
+def text_path_for(meta_file: Path) -> Path:
+    """Return the text file that belongs to a metadata JSON."""
+    return meta_file.parent.parent / "text" / f"{meta_file.stem}.txt"
+
+
+def read_metadata(meta_file: Path) -> dict:
+    """Load a metadata JSON file."""
+    with open(meta_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path: Path, data, indent: Optional[int] = 2):
+    """Write a JSON file atomically (tmp file + rename)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            # mkstemp creates the file 0600; give it the mode open() would
+            os.fchmod(f.fileno(), 0o666 & ~_UMASK)
+            json.dump(data, f, indent=indent)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_metadata(meta_file: Path, metadata: dict):
+    """Write a metadata JSON file atomically."""
+    write_json_atomic(meta_file, metadata)
+
+
+def read_text(text_file: Path, max_chars: Optional[int] = None) -> str:
+    """Read an extracted text file, optionally only its first max_chars characters."""
+    if not text_file.exists():
+        return ""
+
+    with open(text_file, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read() if max_chars is None else f.read(max_chars)
@@ -0,0 +1,79 @@
+"""
+Pre-compressed uploads of text objects.
+
+Extracted text compresses 5-10x. With ``--compress`` the uploader stores
+it gzip- or brotli-compressed with a matching Content-Encoding
+header, so R2 keeps (and serves) the small form and browsers decompress
+transparently. Each compressed body is decompressed again and compared
+with the original bytes before it is sent.
+
+Compression is deterministic (gzip without a timestamp, fixed levels),
+so the same file always gives the same body, size and MD5. Sync checks
+compare that body against the stored object's size and ETag.
+"""
+
+import gzip
+import hashlib
+from typing import Optional
+
+from .lazy import LazyModule
+
+brotli = LazyModule("brotli", "pip install brotli")
+
+# Only text/ objects: no KEY_RULES entry uploads JSON, the site gets that from the API
+COMPRESSIBLE_SUFFIXES = {".txt"}
+ENCODINGS = ("gzip", "br")
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Bodies that don't shrink below this share of the original are stored as they are
+MAX_RATIO = 0.95
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return brotli.decompress(data)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def encode_body(data: bytes, encoding: str) -> tuple:
+    """(body, content encoding or None) to store for data.
+
+    Raises ValueError if the compressed body doesn't decompress to data.
+    """
+    body = compress(data, encoding)
+    if len(body) > MAX_RATIO * len(data):
+        return data, None
+    if decompress(body, encoding) != data:
+        raise ValueError(f"{encoding} round trip changed the data")
+    return body, encoding
+
+
+class EncodedBody:
+    """A file's bytes as they will be stored: compressed or not, with size and MD5."""
+
+    def __init__(self, body: bytes, encoding: Optional[str]):
+        self.body = body
+        self.encoding = encoding
+        self.size = len(body)
+        self.md5 = hashlib.md5(body).hexdigest()
+
+    @classmethod
+    def from_file(cls, path, encoding: str) -> "EncodedBody":
+        with open(path, "rb") as f:
+            return cls(*encode_body(f.read(), encoding))
+
+    def matches(self, remote: Optional[tuple]) -> bool:
+        """True if a remote (size, etag) holds exactly this body; only sizes count if the ETag is unknown."""
+        if remote is None or remote[0] != self.size:
+            return False
+        return remote[1] is None or remote[1].strip('"').lower() == self.md5
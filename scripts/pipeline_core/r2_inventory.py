@@ -0,0 +1,133 @@
+"""
+Local inventory of the objects already in an R2 bucket.
+
+upload_to_r2.py used to send a HEAD request per file to find out whether
+it was uploaded before. R2Inventory instead pages through
+``list_objects_v2`` once per key prefix (1000 objects per request) and
+caches key, size and ETag in a tab-separated file:
+
+    # r2-inventory 1
+    # bucket    chatfiles-archive
+    # prefix    documents/DataSet_1/    2026-10-19T06:00:00
+    documents/DataSet_1/EFTA00001.pdf    48213    "9b2cf535f27731c974343645a3985328"
+
+A prefix listed within ``max_age`` is not listed again. Uploads are added
+with ``record`` as they finish, so the cache stays current between
+listings and a rerun skips everything a previous run uploaded.
+"""
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+INVENTORY_VERSION = "1"
+LIST_PAGE_SIZE = 1000
+# Above this many distinct key directories, list whole top-level prefixes instead
+MAX_PREFIXES = 256
+
+
+def key_prefix(key: str) -> str:
+    """Directory prefix of a key: "images/DataSet_1/" for "images/DataSet_1/x.png"."""
+    return key.rsplit("/", 1)[0] + "/" if "/" in key else ""
+
+
+def key_prefixes(keys: Iterable[str], max_prefixes: int = MAX_PREFIXES) -> list:
+    """The directory prefixes ("images/DataSet_1/") covering keys, coarsened if there are many."""
+    prefixes = {key_prefix(key) for key in keys}
+    if len(prefixes) > max_prefixes:
+        prefixes = {prefix.split("/", 1)[0] + "/" if prefix else "" for prefix in prefixes}
+    # Drop prefixes nested in another one; listing the parent covers them
+    ordered = sorted(prefixes)
+    return [p for i, p in enumerate(ordered) if not any(p.startswith(q) for q in ordered[:i])]
+
+
+class R2Inventory:
+    """key -> (size, ETag) of a bucket's objects, listed in bulk and cached on disk."""
+
+    def __init__(self, path: Path, bucket: str):
+        self.path = Path(path)
+        self.bucket = bucket
+        self.objects = {}  # key -> (size, etag)
+        self.listed = {}  # prefix -> datetime of last listing
+        self.requests = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            header = f.readline().split()
+            if header[1:] != ["r2-inventory", INVENTORY_VERSION]:
+                return
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if fields[0] == "# bucket":
+                    if fields[1] != self.bucket:
+                        # Another bucket's inventory: start over
+                        self.objects, self.listed = {}, {}
+                        return
+                elif fields[0] == "# prefix":
+                    self.listed[fields[1]] = datetime.fromisoformat(fields[2])
+                elif len(fields) == 3:
+                    self.objects[fields[0]] = (int(fields[1]), fields[2] or None)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.objects
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(size, etag) of an object, or None if it is not in the bucket."""
+        return self.objects.get(key)
+
+    def is_fresh(self, prefix: str, max_age: timedelta) -> bool:
+        """True if prefix (or a parent prefix) was listed within max_age."""
+        now = datetime.now()
+        return any(prefix.startswith(listed) and now - when <= max_age for listed, when in self.listed.items())
+
+    def refresh(self, client, prefixes: Iterable[str], max_age: timedelta = timedelta(hours=24),
+                progress=None) -> int:
+        """List every prefix not listed within max_age; returns the objects listed."""
+        listed = 0
+        paginator = client.get_paginator("list_objects_v2")
+        for prefix in prefixes:
+            if self.is_fresh(prefix, max_age):
+                continue
+
+            started = datetime.now()
+            # Objects deleted since the last listing must not linger
+            for key in [k for k in self.objects if k.startswith(prefix)]:
+                del self.objects[key]
+
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix,
+                                           PaginationConfig={"PageSize": LIST_PAGE_SIZE}):
+                self.requests += 1
+                for obj in page.get("Contents", []):
+                    self.objects[obj["Key"]] = (obj["Size"], obj.get("ETag"))
+                    listed += 1
+                if progress:
+                    progress(prefix, listed)
+
+            self.listed = {p: t for p, t in self.listed.items() if not p.startswith(prefix)}
+            self.listed[prefix] = started
+            self.save()
+        return listed
+
+    def record(self, key: str, size: int, etag: Optional[str]):
+        """Note an object the uploader just wrote."""
+        self.objects[key] = (size, etag)
+
+    def save(self):
+        """Write the inventory (tmp file + rename)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"# r2-inventory {INVENTORY_VERSION}\n")
+            f.write(f"# bucket\t{self.bucket}\n")
+            for prefix, when in sorted(self.listed.items()):
+                f.write(f"# prefix\t{prefix}\t{when.isoformat(timespec='seconds')}\n")
+            for key, (size, etag) in self.objects.items():
+                f.write(f"{key}\t{size}\t{etag or ''}\n")
+        os.replace(tmp_path, self.path)
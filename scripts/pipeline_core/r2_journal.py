@@ -0,0 +1,176 @@
+"""
+Resume support for upload_to_r2.py.
+
+Every file the uploader finishes with, uploaded, skipped or failed, is
+appended to ``.r2_journal_{bucket}.jsonl`` in the input directory as
+soon as its result comes in:
+
+    {"path": ..., "key": ..., "size": ..., "mtime": ..., "status": "uploaded", "etag": ..., "change": "new", "at": ...}
+
+A later line for the same path replaces the earlier one. On restart,
+files whose latest entry is uploaded or skipped with the same key, size,
+mtime and --compress setting are done and are skipped without an
+inventory lookup or a HEAD request. A torn last line (crash mid-append) is ignored and trimmed, and
+the journal is compacted to one line per file when superseded lines make
+up most of it.
+
+The upload-progress.json summary (the format the Node uploader writes)
+is derived from the journal's latest entries.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .metadata import write_json_atomic
+
+# Seconds between fsyncs; a process crash loses nothing, an OS crash at most this much
+FSYNC_INTERVAL = 2.0
+DONE_STATUSES = ("uploaded", "skipped")
+
+
+class UploadJournal:
+    """Append-only log of finished uploads, with the latest entry per file kept in memory."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.latest = {}  # path -> (key, size, mtime, status, compress)
+        self.counts = {"uploaded": 0, "skipped": 0, "error": 0}
+        self.uploaded_bytes = 0
+        self.lines = 0
+        self.last_file = None
+        self.started = time.time()
+        self._file = None
+        self._last_sync = time.monotonic()
+
+    def load(self) -> int:
+        """Read the journal; returns how many files it has done."""
+        if not self.path.exists():
+            return 0
+
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                self._remember(entry)
+
+        if valid_bytes < os.path.getsize(self.path):
+            os.truncate(self.path, valid_bytes)
+        if self.lines > 2 * len(self.latest) + 1000:
+            self.compact()
+        return sum(self.counts[status] for status in DONE_STATUSES)
+
+    def _remember(self, entry: dict):
+        previous = self.latest.get(entry["path"])
+        if previous is not None:
+            self.counts[previous[3]] -= 1
+            if previous[3] == "uploaded":
+                self.uploaded_bytes -= previous[1]
+        # Entries from before "compress" was journaled only have the encoding they were stored with
+        compress = entry.get("compress", entry.get("encoding"))
+        self.latest[entry["path"]] = (entry["key"], entry["size"], entry.get("mtime"), entry["status"], compress)
+        self.counts[entry["status"]] += 1
+        if entry["status"] == "uploaded":
+            self.uploaded_bytes += entry["size"]
+        self.last_file = entry["path"]
+        self.lines += 1
+
+    def done(self, path: str, key: str, size: int, mtime: int, compress: Optional[str] = None) -> bool:
+        """True if path was uploaded (or found in the bucket) as key with this size and mtime.
+
+        compress is the --compress encoding this run stores the file with
+        (None if stored as is); a file done under another setting isn't done.
+        """
+        entry = self.latest.get(path)
+        return (entry is not None and entry[3] in DONE_STATUSES
+                and entry[:3] == (key, size, mtime) and entry[4] == compress)
+
+    def append(self, result: dict):
+        """Journal one finished file (a process_file result)."""
+        entry = {
+            "path": result["local_path"],
+            "key": result["r2_key"],
+            "size": result["size"],
+            "mtime": result.get("mtime"),
+            "status": result["status"],
+            "etag": result.get("etag"),
+            "change": result.get("change"),
+            "at": datetime.now().isoformat(timespec="seconds"),
+        }
+        if result.get("compress"):
+            entry["compress"] = result["compress"]
+        if result.get("content_encoding"):
+            entry["stored_size"] = result["stored_size"]
+            entry["encoding"] = result["content_encoding"]
+        if result.get("error"):
+            entry["error"] = result["error"]
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+        self._remember(entry)
+
+    def position(self) -> int:
+        """Current end of the journal, to read back one run's entries with iter_entries."""
+        if self._file is not None:
+            self._file.flush()
+        return os.path.getsize(self.path) if self.path.exists() else 0
+
+    def iter_entries(self, start: int = 0) -> Iterator[dict]:
+        """Yield journal entries from byte offset start."""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def compact(self):
+        """Rewrite the journal with only the latest entry per file (tmp file + rename)."""
+        self.close()
+        latest = {}
+        for entry in self.iter_entries():
+            latest[entry["path"]] = entry
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in latest.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.lines = len(latest)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def summary(self) -> dict:
+        """upload-progress.json contents for the journal as it stands."""
+        return {
+            "uploaded": self.counts["uploaded"],
+            "skipped": self.counts["skipped"],
+            "errors": self.counts["error"],
+            "uploadedBytes": self.uploaded_bytes,
+            "lastFile": self.last_file,
+            "startTime": int(self.started * 1000),
+            "updatedTime": int(time.time() * 1000),
+            "journal": str(self.path),
+        }
+
+    def write_summary(self, path: Path):
+        write_json_atomic(path, self.summary())
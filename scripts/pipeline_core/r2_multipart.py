@@ -0,0 +1,177 @@
+"""
+Multipart uploads to R2 that survive errors and crashed runs.
+
+Large files are split into fixed-size parts sent on several threads. The
+uploader keeps the upload id of every unfinished upload in a state file
+(``.r2_multipart.json``), keyed by object key together with the local
+file's size and mtime and the part size. If a run dies, the next run asks
+R2 which parts it already has (``list_parts``) and sends only the rest.
+A tracked upload is aborted instead when the local file or the part size
+changed since it started. ``clean_abandoned`` aborts incomplete uploads
+the state file doesn't know about once they are older than
+``abandoned_after``, so R2 stops storing their parts.
+
+Every request, single PUTs included, goes through one TransferBudget
+(r2_scheduler), so part concurrency doesn't multiply the requests in
+flight and throttling of any request slows all of them down.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable
+
+from .metadata import write_json_atomic
+from .r2_scheduler import MIB, TransferBudget
+
+# R2 (like S3) needs parts of at least 5 MiB, except the last, and at most 10000 parts
+MIN_PART_SIZE = 5 * MIB
+MAX_PARTS = 10000
+STATE_VERSION = 1
+
+
+def part_size_for(size: int, part_size: int) -> int:
+    """part_size, raised to the R2 minimum and enough to stay within MAX_PARTS."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while -(-size // part_size) > MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def read_part(path, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+class MultipartUploader:
+    """Resumable, parallel multipart uploads sharing one TransferBudget."""
+
+    def __init__(self, client, bucket: str, state_path: Path, budget: TransferBudget,
+                 part_size: int = 8 * MIB, part_concurrency: int = 4):
+        self.client = client
+        self.bucket = bucket
+        self.state_path = Path(state_path)
+        self.budget = budget
+        self.part_size = part_size
+        self.part_concurrency = part_concurrency
+        self.resumed_parts = 0
+        self.resumed_bytes = 0
+        self.aborted = 0
+        self._lock = threading.Lock()
+        self.uploads = self._load()  # key -> {upload_id, size, mtime_ns, part_size, started}
+
+    def _load(self) -> dict:
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") != STATE_VERSION or state.get("bucket") != self.bucket:
+            return {}
+        return state.get("uploads", {})
+
+    def _save(self):
+        with self._lock:
+            write_json_atomic(self.state_path, {"version": STATE_VERSION, "bucket": self.bucket, "uploads": self.uploads})
+
+    def _abort(self, key: str, upload_id: str):
+        try:
+            self.budget.call(lambda: self.client.abort_multipart_upload(Bucket=self.bucket, Key=key,
+                                                                        UploadId=upload_id))
+            with self._lock:
+                self.aborted += 1
+        except Exception as e:
+            # Already completed or aborted elsewhere
+            print(f"Could not abort multipart upload of {key}: {e}")
+
+    def clean_abandoned(self, prefixes: Iterable[str], abandoned_after: timedelta) -> int:
+        """Abort incomplete uploads under prefixes that this state doesn't track and are older than abandoned_after."""
+        cutoff = datetime.now(timezone.utc) - abandoned_after
+        known = {entry["upload_id"] for entry in self.uploads.values()}
+        aborted = self.aborted
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        for prefix in prefixes:
+            pages = self.budget.call(lambda: list(paginator.paginate(Bucket=self.bucket, Prefix=prefix)),
+                                     timed=False)
+            for page in pages:
+                for upload in page.get("Uploads", []):
+                    initiated = upload.get("Initiated")
+                    if upload["UploadId"] in known or (initiated is not None and initiated > cutoff):
+                        continue
+                    self._abort(upload["Key"], upload["UploadId"])
+        return self.aborted - aborted
+
+    def _resume(self, key: str, stat, part_size: int) -> tuple:
+        """(upload_id, {part number: (etag, size)}) of a resumable earlier upload, else (None, {})."""
+        entry = self.uploads.get(key)
+        if entry is None:
+            return None, {}
+        if (entry["size"], entry["mtime_ns"], entry["part_size"]) != (stat.st_size, stat.st_mtime_ns, part_size):
+            self._abort(key, entry["upload_id"])
+            return None, {}
+
+        paginator = self.client.get_paginator("list_parts")
+        try:
+            pages = self.budget.call(lambda: list(paginator.paginate(Bucket=self.bucket, Key=key,
+                                                                     UploadId=entry["upload_id"])),
+                                     timed=False)
+        except Exception:
+            # Upload no longer exists (completed, aborted or expired)
+            return None, {}
+        parts = {}
+        for page in pages:
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = (part["ETag"], part["Size"])
+        return entry["upload_id"], parts
+
+    def upload(self, local_path, key: str, content_type: str) -> str:
+        """Upload a file in parts, resuming an earlier attempt; returns the object's ETag.
+
+        On failure the upload is left open (and tracked) so the next run
+        continues where this one stopped.
+        """
+        stat = os.stat(local_path)
+        size = stat.st_size
+        part_size = part_size_for(size, self.part_size)
+        count = max(1, -(-size // part_size))
+
+        upload_id, done = self._resume(key, stat, part_size)
+        # Parts of the wrong size can't be reused
+        done = {n: p for n, p in done.items() if p[1] == min(part_size, size - (n - 1) * part_size)}
+        if upload_id is None:
+            upload_id = self.budget.call(lambda: self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=key, ContentType=content_type))["UploadId"]
+            with self._lock:
+                self.uploads[key] = {"upload_id": upload_id, "size": size, "mtime_ns": stat.st_mtime_ns,
+                                     "part_size": part_size, "started": datetime.now().isoformat()}
+            self._save()
+        else:
+            with self._lock:
+                self.resumed_parts += len(done)
+                self.resumed_bytes += sum(p[1] for p in done.values())
+
+        def send(number: int) -> tuple:
+            offset = (number - 1) * part_size
+            length = min(part_size, size - offset)
+            # Read once the budget has a slot for it, so waiting parts hold no buffers
+            response = self.budget.call(lambda: self.client.upload_part(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                Body=read_part(local_path, offset, length)), length)
+            return number, response["ETag"]
+
+        etags = {n: p[0] for n, p in done.items()}
+        missing = [n for n in range(1, count + 1) if n not in done]
+        with ThreadPoolExecutor(max_workers=self.part_concurrency) as executor:
+            for number, etag in executor.map(send, missing):
+                etags[number] = etag
+
+        parts = [{"PartNumber": n, "ETag": etags[n]} for n in sorted(etags)]
+        response = self.budget.call(lambda: self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}))
+        with self._lock:
+            self.uploads.pop(key, None)
+        self._save()
+        return response.get("ETag")
@@ -0,0 +1,209 @@
+"""
+Request scheduling for R2 uploads: adaptive concurrency, retries, rates.
+
+Every request of an upload run goes through one TransferBudget, which
+
+- limits the requests in flight with an AdaptiveLimit. The limit grows
+  while requests succeed and it is used up: by one per success until the
+  first sign of congestion (slow start), then by about one per round of
+  requests. It
+  is halved on a 429/503 (SlowDown) response and cut by 10% when the
+  smoothed latency per request rises to LATENCY_TOLERANCE times the
+  lowest seen.
+- retries throttled, 5xx and connection errors itself with full-jitter
+  exponential backoff, sleeping outside its slot. botocore's own retries
+  should be turned off (``total_max_attempts=1``) so every throttle is
+  seen here.
+- caps upload bandwidth with a token bucket.
+- counts requests, retries, throttles and bytes for live MB/s and req/s.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+MIB = 1 << 20
+THROTTLE_STATUS = {429, 503}
+RETRY_STATUS = THROTTLE_STATUS | {500, 502, 504}
+THROTTLE_CODES = {"SlowDown", "TooManyRequests", "RequestLimitExceeded", "Throttling", "ServiceUnavailable"}
+CONNECTION_ERRORS = {"EndpointConnectionError", "ConnectionClosedError", "ReadTimeoutError",
+                     "ConnectTimeoutError", "ConnectionError", "ResponseStreamingError"}
+LATENCY_TOLERANCE = 2.0
+# Slow upward drift of the latency baseline, so it follows lasting changes
+BASELINE_DRIFT = 1.0005
+DECREASE_COOLDOWN = 1.0
+# Share of the limit that must be in flight before it is raised
+UTILIZATION = 0.75
+RATE_WINDOW = 5.0
+
+
+def classify_error(error: Exception):
+    """"throttle", "retry" (transient) or None (don't retry) for a failed request."""
+    response = getattr(error, "response", None) or {}
+    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    code = response.get("Error", {}).get("Code")
+    if status in THROTTLE_STATUS or code in THROTTLE_CODES:
+        return "throttle"
+    if status in RETRY_STATUS or type(error).__name__ in CONNECTION_ERRORS:
+        return "retry"
+    return None
+
+
+class AdaptiveLimit:
+    """Limit on requests in flight, adjusted from throttling responses and latency."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, adaptive: bool = True):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.peak = int(self.limit)
+        self.slow_start = True
+        self.baseline = None
+        self.smoothed = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        self.slow_start = False
+        # One cut per burst of bad responses, not one per response
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+
+    def on_success(self, latency: float, nbytes: int):
+        if not self.adaptive:
+            return
+        # Latency per request, discounted for the time spent sending the body
+        unit = latency / (1 + nbytes / MIB)
+        with self._cond:
+            self.smoothed = unit if self.smoothed is None else 0.9 * self.smoothed + 0.1 * unit
+            self.baseline = self.smoothed if self.baseline is None else min(self.baseline * BASELINE_DRIFT,
+                                                                            self.smoothed)
+            if self.smoothed > LATENCY_TOLERANCE * self.baseline:
+                self._decrease(0.9)
+            elif self.in_flight >= self.limit * UTILIZATION:
+                # Only grow a limit that is actually used up
+                self.limit = min(self.maximum, self.limit + (1 if self.slow_start else 1 / self.limit))
+                self.peak = max(self.peak, int(self.limit))
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        if not self.adaptive:
+            return
+        with self._cond:
+            self._decrease(0.5)
+
+
+class TransferBudget:
+    """Shared scheduler for every request of a run: concurrency, retries, bandwidth, stats."""
+
+    def __init__(self, max_requests: int, max_bytes_per_sec: float = 0, min_requests: int = 2,
+                 adaptive: bool = True, retries: int = 6, backoff: float = 0.5, max_backoff: float = 30.0):
+        initial = min(max_requests, 4) if adaptive else max_requests
+        self.limit = AdaptiveLimit(initial, min_requests, max_requests, adaptive)
+        self.max_requests = max_requests
+        self.rate = max_bytes_per_sec
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.retried = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.started = time.monotonic()
+        self._recent = deque()  # (finish time, bytes) within RATE_WINDOW
+        self._recent_bytes = 0
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def _throttle(self, nbytes: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + nbytes / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def _trim(self, now: float):
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent_bytes -= self._recent.popleft()[1]
+
+    def _record(self, nbytes: int):
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += nbytes
+            self._recent.append((now, nbytes))
+            self._recent_bytes += nbytes
+            self._trim(now)
+
+    def call(self, fn, nbytes: int = 0, timed: bool = True):
+        """Run fn() (one request sending nbytes) within the budget, retrying transient failures.
+
+        Pass timed=False for calls that page through listings, whose
+        duration says nothing about per-request latency.
+        """
+        attempt = 0
+        while True:
+            self.limit.acquire()
+            try:
+                self._throttle(nbytes)
+                start = time.monotonic()
+                try:
+                    result = fn()
+                except Exception as e:
+                    kind = classify_error(e)
+                    if kind is None or attempt >= self.retries:
+                        raise
+                    with self._lock:
+                        self.retried += 1
+                        self.throttled += kind == "throttle"
+                    if kind == "throttle":
+                        self.limit.on_throttle()
+                else:
+                    if timed:
+                        self.limit.on_success(time.monotonic() - start, nbytes)
+                    self._record(nbytes)
+                    return result
+            finally:
+                self.limit.release()
+
+            # Full jitter: spreads the retries of a throttled burst
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            attempt += 1
+
+    def rates(self) -> tuple:
+        """(MB/s, requests/s) over the last RATE_WINDOW seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            window = min(RATE_WINDOW, max(now - self.started, 1e-3))
+            return self._recent_bytes / MIB / window, len(self._recent) / window
+
+    def status(self) -> dict:
+        """Live numbers for a progress bar."""
+        mb_per_sec, requests_per_sec = self.rates()
+        return {
+            "MB/s": f"{mb_per_sec:.1f}",
+            "req/s": f"{requests_per_sec:.0f}",
+            "conc": int(self.limit.limit),
+            "throttled": self.throttled,
+        }
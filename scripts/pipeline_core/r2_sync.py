@@ -0,0 +1,204 @@
+"""
+Content comparison of local files against R2 objects.
+
+S3-compatible stores report an ETag per object: the hex MD5 of the body
+for a single PUT, and ``md5(part MD5s) + "-N"`` for an N-part multipart
+upload. Comparing that against the same digest of the local file tells
+whether a file whose key and size match was changed since it was
+uploaded (a re-OCR'd PDF, an updated text file).
+
+Hashing a large tree is expensive, so HashCache keeps the digests in a
+tab-separated file keyed by (path, size, mtime):
+
+    # r2-hashes 1
+    /data/DataSet_1/EFTA00001.pdf    48213    1760860800000000000    9b2c...    8388608=3f1a...-2
+
+A file is only hashed again once its size or mtime changes.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .r2_multipart import part_size_for
+
+HASHES_VERSION = "1"
+HASH_BLOCK = 1 << 20
+# boto3's default multipart_chunksize
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+def normalize_etag(etag: Optional[str]) -> Optional[str]:
+    return etag.strip('"').lower() if etag else None
+
+
+def etag_parts(etag: str) -> int:
+    """Part count of a multipart ETag ("...-N"); 1 for a single-PUT ETag."""
+    _, _, parts = etag.rpartition("-")
+    return int(parts) if "-" in etag and parts.isdigit() else 1
+
+
+def candidate_part_sizes(size: int, parts: int, preferred: int = DEFAULT_PART_SIZE) -> list:
+    """Part sizes that split size bytes into exactly `parts` parts, most likely first."""
+    # The uploader's part size, as MultipartUploader adjusts it for this file
+    candidates = [part_size_for(size, preferred), preferred, DEFAULT_PART_SIZE]
+    # Uploaders that pick the part size from the file size round it to whole MiB
+    mib = 1 << 20
+    candidates.append(math.ceil(size / parts / mib) * mib)
+    seen = []
+    for part_size in candidates:
+        if part_size > 0 and math.ceil(size / part_size) == parts and part_size not in seen:
+            seen.append(part_size)
+    return seen
+
+
+def file_digests(path, part_size: Optional[int] = None):
+    """(MD5 hex, multipart ETag for part_size or None) of a file in one read."""
+    whole = hashlib.md5()
+    parts = []
+    part = hashlib.md5()
+    part_fill = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            whole.update(block)
+            while part_size and block:
+                take = block[:part_size - part_fill]
+                part.update(take)
+                part_fill += len(take)
+                block = block[len(take):]
+                if part_fill == part_size:
+                    parts.append(part.digest())
+                    part, part_fill = hashlib.md5(), 0
+    if not part_size:
+        return whole.hexdigest(), None
+    if part_fill or not parts:
+        parts.append(part.digest())
+    return whole.hexdigest(), f"{hashlib.md5(b''.join(parts)).hexdigest()}-{len(parts)}"
+
+
+class HashCache:
+    """MD5 / multipart ETags of local files, cached on disk by (path, size, mtime).
+
+    part_size is the uploader's multipart part size, tried first when
+    matching multipart ETags.
+    """
+
+    def __init__(self, path: Path, part_size: int = DEFAULT_PART_SIZE):
+        self.path = Path(path)
+        self.part_size = part_size
+        self.entries = {}  # local path -> [size, mtime_ns, md5, {part_size: etag}]
+        self.hashed_files = 0
+        self.hashed_bytes = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            if f.readline().split()[1:] != ["r2-hashes", HASHES_VERSION]:
+                return
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 5:
+                    continue
+                multipart = dict(item.split("=", 1) for item in fields[4].split(",") if item)
+                self.entries[fields[0]] = [int(fields[1]), int(fields[2]), fields[3] or None,
+                                           {int(k): v for k, v in multipart.items()}]
+
+    def _entry(self, local_path: str, stat=None) -> list:
+        stat = stat or os.stat(local_path)
+        with self._lock:
+            entry = self.entries.get(local_path)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                entry = [stat.st_size, stat.st_mtime_ns, None, {}]
+                self.entries[local_path] = entry
+                self._dirty = True
+            return entry
+
+    def _hash(self, local_path: str, entry: list, part_size: Optional[int] = None):
+        md5, multipart = file_digests(local_path, part_size)
+        with self._lock:
+            entry[2] = md5
+            if multipart:
+                entry[3][part_size] = multipart
+            self.hashed_files += 1
+            self.hashed_bytes += entry[0]
+            self._dirty = True
+
+    def md5(self, local_path: str) -> str:
+        entry = self._entry(str(local_path))
+        if entry[2] is None:
+            self._hash(str(local_path), entry)
+        return entry[2]
+
+    def multipart_etag(self, local_path: str, part_size: int) -> str:
+        entry = self._entry(str(local_path))
+        if part_size not in entry[3]:
+            self._hash(str(local_path), entry, part_size)
+        return entry[3][part_size]
+
+    def matches(self, local_path: str, remote_etag: str) -> bool:
+        """True if the local file has the content behind remote_etag."""
+        remote_etag = normalize_etag(remote_etag)
+        parts = etag_parts(remote_etag)
+        if parts == 1:
+            return self.md5(local_path) == remote_etag
+        size = self._entry(str(local_path))[0]
+        return any(self.multipart_etag(local_path, candidate) == remote_etag
+                   for candidate in candidate_part_sizes(size, parts, self.part_size))
+
+    def remember(self, local_path: str, etag: Optional[str], stat=None):
+        """Take an upload's ETag as the file's digest, so it is not hashed on the next sync."""
+        etag = normalize_etag(etag)
+        if not etag:
+            return
+        entry = self._entry(str(local_path), stat)
+        with self._lock:
+            parts = etag_parts(etag)
+            if parts == 1:
+                entry[2] = etag
+            else:
+                # Made by MultipartUploader with the configured part size
+                entry[3][part_size_for(entry[0], self.part_size)] = etag
+            self._dirty = True
+
+    def save(self):
+        """Write the cache (tmp file + rename) if anything changed."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(f"# r2-hashes {HASHES_VERSION}\n")
+                for local_path, (size, mtime_ns, md5, multipart) in self.entries.items():
+                    if md5 is None and not multipart:
+                        continue
+                    parts = ",".join(f"{k}={v}" for k, v in sorted(multipart.items()))
+                    f.write(f"{local_path}\t{size}\t{mtime_ns}\t{md5 or ''}\t{parts}\n")
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+def sync_status(local_path: str, size: int, remote: Optional[tuple], hashes: Optional[HashCache]) -> str:
+    """"new", "changed" or "unchanged" for a local file against a remote (size, etag).
+
+    Without a hash cache only sizes are compared. Objects whose ETag is
+    unknown count as unchanged when the size matches.
+    """
+    if remote is None:
+        return "new"
+    remote_size, remote_etag = remote
+    if remote_size != size:
+        return "changed"
+    if hashes is None or not remote_etag:
+        return "unchanged"
+    return "unchanged" if hashes.matches(local_path, remote_etag) else "changed"
@@ -0,0 +1,177 @@
+"""
+Reference gallery of known persons for face_pipeline.py.
+
+Reference photos live in ``reference_faces/<Person_Name>/*.jpg``. Each
+photo's embedding is cached under the SHA-256 of its bytes, so a run only
+embeds photos it has not seen before; renaming or moving a photo between
+people costs nothing. Every photo keeps its own embedding (no per-person
+mean), and a person's score for a query is their best-matching photo.
+
+    gallery.json     version, model name, sha256 -> {person, path, row}
+    embeddings.npy   float32 [m, 512] normalized embeddings, by row
+
+Photos in which no face was found are cached with row -1 so they are not
+re-run either.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from .face_cluster import DEFAULT_BATCH, normalize_rows
+from .face_store import EMBEDDING_DIM
+from .metadata import write_json_atomic
+
+GALLERY_FILENAME = "gallery.json"
+GALLERY_VERSION = 1
+REFERENCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_reference_photos(reference_dir: Path):
+    """Yield (person name, photo path) for every photo under reference_dir."""
+    for person_dir in sorted(Path(reference_dir).iterdir()):
+        if not person_dir.is_dir() or person_dir.name.startswith("."):
+            continue
+        person_name = person_dir.name.replace("_", " ")
+        for img_path in sorted(person_dir.iterdir()):
+            if img_path.suffix.lower() in REFERENCE_EXTENSIONS:
+                yield person_name, img_path
+
+
+class ReferenceGallery:
+    """Cached per-photo embeddings of known persons, matched as one matrix."""
+
+    def __init__(self, cache_dir: Path, model: str = "buffalo_l"):
+        self.cache_dir = Path(cache_dir)
+        self.model = model
+        self.entries = {}  # sha256 -> {"person", "path", "row"}
+        self.embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+        # Gallery view, rows grouped by person (built by _index)
+        self.persons = []
+        self.matrix = self.embeddings
+        self.person_starts = np.empty(0, dtype=np.int64)
+
+        gallery_file = self.cache_dir / GALLERY_FILENAME
+        if gallery_file.exists():
+            with open(gallery_file, "r") as f:
+                cached = json.load(f)
+            # Embeddings from another model are not comparable; start over
+            if cached.get("version") == GALLERY_VERSION and cached.get("model") == model:
+                self.entries = cached["entries"]
+                self.embeddings = np.load(self.cache_dir / "embeddings.npy")
+                self._index()
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def sync(self, reference_dir: Path, embed: Callable[[Path], Optional[np.ndarray]]) -> dict:
+        """Bring the gallery in line with reference_dir, embedding only new photos.
+
+        ``embed(path)`` returns one embedding or None if no face was found.
+        Returns counts of cached, embedded and faceless photos.
+        """
+        stats = {"cached": 0, "embedded": 0, "no_face": 0}
+        entries = {}
+        rows = []
+
+        for person_name, img_path in iter_reference_photos(reference_dir):
+            sha = file_sha256(img_path)
+            if sha in entries:
+                continue
+
+            cached = self.entries.get(sha)
+            if cached is not None:
+                embedding = self.embeddings[cached["row"]] if cached["row"] >= 0 else None
+                stats["cached"] += 1
+            else:
+                embedding = embed(img_path)
+                stats["embedded"] += 1
+
+            if embedding is None:
+                entries[sha] = {"person": person_name, "path": str(img_path), "row": -1}
+                stats["no_face"] += 1
+                continue
+
+            entries[sha] = {"person": person_name, "path": str(img_path), "row": len(rows)}
+            rows.append(np.asarray(embedding, dtype=np.float32))
+
+        self.entries = entries
+        self.embeddings = normalize_rows(np.stack(rows)) if rows else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.save()
+        self._index()
+        return stats
+
+    def _index(self):
+        """Group embedding rows by person for the matching reductions."""
+        people = {}
+        for entry in self.entries.values():
+            if entry["row"] >= 0:
+                people.setdefault(entry["person"], []).append(entry["row"])
+
+        self.persons = sorted(people)
+        rows = [row for person in self.persons for row in sorted(people[person])]
+        sizes = [len(people[person]) for person in self.persons]
+        self.matrix = self.embeddings[rows] if rows else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.person_starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64) if sizes else \
+            np.empty(0, dtype=np.int64)
+
+    def photo_counts(self) -> dict:
+        """Number of usable photos per person."""
+        counts = {}
+        for entry in self.entries.values():
+            if entry["row"] >= 0:
+                counts[entry["person"]] = counts.get(entry["person"], 0) + 1
+        return counts
+
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_dir / ".embeddings.tmp.npy"
+        np.save(tmp_path, self.embeddings)
+        tmp_path.replace(self.cache_dir / "embeddings.npy")
+        write_json_atomic(self.cache_dir / GALLERY_FILENAME, {
+            "version": GALLERY_VERSION,
+            "model": self.model,
+            "entries": self.entries,
+        })
+
+    def match(self, queries, top_k: int = 3, batch: int = DEFAULT_BATCH):
+        """Score every query against every person.
+
+        Returns (person indices [n, k], scores [n, k]) sorted by descending
+        score, where a person's score is the cosine similarity of their best
+        photo. ``k`` is min(top_k, number of persons).
+        """
+        n = len(queries)
+        k = min(top_k, len(self.persons))
+        top_idx = np.empty((n, k), dtype=np.int64)
+        top_scores = np.empty((n, k), dtype=np.float32)
+        if n == 0 or k == 0:
+            return top_idx, top_scores
+
+        for i in range(0, n, batch):
+            sims = normalize_rows(queries[i:i + batch]) @ self.matrix.T
+            # Best photo per person: max over each person's contiguous rows
+            per_person = np.maximum.reduceat(sims, self.person_starts, axis=1)
+            if k < per_person.shape[1]:
+                idx = np.argpartition(-per_person, k - 1, axis=1)[:, :k]
+            else:
+                idx = np.broadcast_to(np.arange(k), (len(per_person), k))
+            scores = np.take_along_axis(per_person, idx, axis=1)
+            order = np.argsort(-scores, axis=1, kind="stable")
+            top_idx[i:i + batch] = np.take_along_axis(idx, order, axis=1)
+            top_scores[i:i + batch] = np.take_along_axis(scores, order, axis=1)
+
+        return top_idx, top_scores
@@ -0,0 +1,77 @@
+"""
+Per-stage timing for the threaded face pipeline.
+
+Each stage of face_pipeline.py's overlapped mode (decode, infer, write)
+owns a StageStats. Threads wrap their work in ``stats.busy()`` and their
+queue waits in ``stats.waiting()``; at the end ``stage_report`` shows how
+busy every stage was relative to the threads it had, which tells whether
+disk I/O or the model is the bottleneck.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Busy and wait time accumulated by the threads of one stage."""
+
+    def __init__(self, name: str, threads: int):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def busy(self, items: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.busy_seconds += elapsed
+                self.items += items
+
+    @contextmanager
+    def waiting(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.wait_seconds += elapsed
+
+    def utilization(self, wall_seconds: float) -> float:
+        """Fraction of the stage's thread-time spent working."""
+        if wall_seconds <= 0:
+            return 0.0
+        return self.busy_seconds / (wall_seconds * self.threads)
+
+    def to_dict(self, wall_seconds: float) -> dict:
+        return {
+            "stage": self.name,
+            "threads": self.threads,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "utilization": round(self.utilization(wall_seconds), 4),
+        }
+
+
+def stage_report(stages: list, wall_seconds: float) -> str:
+    """Format a utilization table for the given stages."""
+    lines = [f"Stage utilization over {wall_seconds:.1f}s:"]
+    for stage in stages:
+        lines.append(
+            f"  {stage.name:<8} {stage.threads:>3} threads {stage.items:>9} items  "
+            f"busy {stage.busy_seconds:>8.1f}s  waiting {stage.wait_seconds:>8.1f}s  "
+            f"utilization {stage.utilization(wall_seconds):>6.1%}"
+        )
+    if stages:
+        bottleneck = max(stages, key=lambda s: s.utilization(wall_seconds))
+        lines.append(f"  Bottleneck: {bottleneck.name}")
+    return "\n".join(lines)
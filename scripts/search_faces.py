@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Face Search for ChatFiles.org
+Finds the faces and clusters most similar to the face in a photo or face
+crop, across the output of face_pipeline.py.
+
+The first search builds face_index/ next to the face store; later ones add
+only faces detected since (after --resume or incremental runs).
+
+Usage:
+    python search_faces.py --faces ~/epstein_faces/ --image photo.jpg --top-k 10
+    python search_faces.py --faces ~/epstein_faces/ --build
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from pipeline_core.face_search import FaceIndex, FaceSearch
+from pipeline_core.face_store import STORE_DIRNAME, FaceStore
+from pipeline_core.lazy import insightface_available, load_face_analysis
+
+
+def print_entry(image: Path, entry: dict):
+    where = f" face at {entry['bbox']}" if entry["bbox"] else " (whole image as face crop)"
+    print(f"\n{image}{where}")
+    print(f"  {'score':>6}  {'face_id':<28} {'cluster':<18} {'document':<28} source image")
+    for hit in entry["results"]:
+        print(f"  {hit['score']:>6.3f}  {hit['face_id']:<28} {str(hit['cluster_id'] or '-'):<18} "
+              f"{str(hit['document'] or '-'):<28} {hit['source_image']}")
+    if entry["clusters"]:
+        print("  Clusters: " + ", ".join(f"{c['cluster_id']} ({c['score']:.3f}, {c['hits']} hits)"
+                                         for c in entry["clusters"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search detected faces by photo")
+    parser.add_argument("--faces", "-f", required=True, help="face_pipeline.py output directory")
+    parser.add_argument("--image", nargs="+", default=[], help="Photos or face crops to search with")
+    parser.add_argument("--top-k", type=int, default=10, help="Faces returned per query face")
+    parser.add_argument("--all-faces", action="store_true",
+                        help="Search with every face in the photo (default: the largest)")
+    parser.add_argument("--crop", action="store_true", help="Inputs are face crops: skip detection")
+    parser.add_argument("--build", action="store_true", help="Only bring the index up to date")
+    parser.add_argument("--no-update", action="store_true",
+                        help="Don't index new faces first (they are still scanned exactly)")
+    parser.add_argument("--ef", type=int, default=128, help="HNSW search breadth (higher: better recall, slower)")
+    parser.add_argument("--gpu", action="store_true", help="Use GPU for the query embedding")
+    parser.add_argument("--json-out", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    faces_dir = Path(args.faces)
+    if not FaceStore.exists(faces_dir / STORE_DIRNAME):
+        print(f"No face store found in {faces_dir}")
+        sys.exit(1)
+
+    if args.build or not args.image:
+        index = FaceIndex(faces_dir, ef=args.ef)
+        start = time.perf_counter()
+        added = index.update()
+        print(f"Indexed {added} new faces in {time.perf_counter() - start:.1f}s "
+              f"({index.count} of {len(index.store)} faces in {index.index_dir})")
+        return
+
+    if not insightface_available():
+        print("Missing dependencies. Install with: pip install insightface onnxruntime")
+        sys.exit(1)
+    providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if args.gpu else ["CPUExecutionProvider"]
+    face_app = load_face_analysis(providers, ctx_id=0 if args.gpu else -1)
+
+    search = FaceSearch(faces_dir, face_app, update=not args.no_update, ef=args.ef)
+    print(f"Searching {len(search.index.store)} faces ({search.index.count} indexed)")
+
+    output = []
+    for image in args.image:
+        start = time.perf_counter()
+        try:
+            entries = search.search_image(image, k=args.top_k, all_faces=args.all_faces, crop=args.crop)
+        except ValueError as e:
+            print(f"Error: {e}")
+            continue
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for entry in entries:
+            print_entry(Path(image), entry)
+        print(f"  ({elapsed_ms:.0f} ms including embedding)")
+        output.append({"image": str(image), "faces": entries})
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\nResults saved: {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,39 +3,78 @@
 Cloudflare R2 Upload Script for ChatFiles.org
 Uploads processed files to R2 storage.
 
+Files already in the bucket are skipped by checking a local inventory
+(key, size, ETag) built by listing the bucket in pages of 1000, instead of
+a HEAD request per file. With --sync, files whose size matches are also
+compared by MD5 against the object's ETag, so changed files are uploaded
+again; --dry-run --sync reports the difference without uploading.
+
+Files of --multipart-threshold MB or more are uploaded in parallel parts
+and resumed by the next run if this one is interrupted. All requests
+share one request budget: concurrency starts low and adapts between
+--min-workers and --workers to the latency and 429/503 responses seen,
+throttled and failed requests are retried with jittered backoff, and the
+progress bar shows live MB/s and requests/s.
+
+The input tree is walked once and files are compared and uploaded while
+the walk is still going. Each finished file is appended to a journal
+(.r2_journal_BUCKET.jsonl), so a rerun skips everything already done
+without asking R2, and upload-progress.json is refreshed from it.
+
+With --compress gzip|br, .txt files are stored compressed with
+a Content-Encoding header after a local round-trip check.
+
 Usage:
     python upload_to_r2.py --input ~/epstein_processed/ --bucket chatfiles-archive --workers 16
+    python upload_to_r2.py --input ~/epstein_processed/ --bucket chatfiles-archive --sync --dry-run
+    python upload_to_r2.py --input ~/epstein_processed/ --bucket chatfiles-archive --compress gzip
 """
 
 import argparse
+import fnmatch
 import json
 import os
 import sys
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-import hashlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timedelta
 
 try:
     import boto3
     from botocore.config import Config
+    from botocore.exceptions import ClientError
     from tqdm import tqdm
 except ImportError:
     print("Missing dependencies. Install with: pip install boto3 tqdm")
     sys.exit(1)
 
+from pipeline_core.r2_compress import COMPRESSIBLE_SUFFIXES, ENCODINGS, EncodedBody, brotli
+from pipeline_core.r2_inventory import R2Inventory, key_prefix, key_prefixes
+from pipeline_core.r2_journal import UploadJournal
+from pipeline_core.r2_multipart import MultipartUploader
+from pipeline_core.r2_scheduler import MIB, TransferBudget
+from pipeline_core.r2_sync import HashCache, sync_status
+
+
+def get_r2_client(max_connections: int = 10):
+    """Create Cloudflare R2 client using S3-compatible API.
 
-def get_r2_client():
-    """Create Cloudflare R2 client using S3-compatible API."""
+    Retries are left to TransferBudget; max_connections should cover its
+    largest concurrency so requests don't queue for a pooled connection.
+    R2_ENDPOINT_URL replaces the account's endpoint (e.g. the local
+    stand-in in bench/s3_standin.py), and then R2_ACCOUNT_ID isn't needed.
+    """
     account_id = os.environ.get("R2_ACCOUNT_ID")
     access_key = os.environ.get("R2_ACCESS_KEY_ID")
     secret_key = os.environ.get("R2_SECRET_ACCESS_KEY")
+    endpoint_url = os.environ.get("R2_ENDPOINT_URL")
 
-    if not all([account_id, access_key, secret_key]):
+    if not all([account_id or endpoint_url, access_key, secret_key]):
         print("Error: Missing R2 credentials. Set R2_ACCOUNT_ID, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY")
         sys.exit(1)
 
-    endpoint_url = f"https://{account_id}.r2.cloudflarestorage.com"
+    endpoint_url = endpoint_url or f"https://{account_id}.r2.cloudflarestorage.com"
 
     client = boto3.client(
         "s3",
@@ -44,31 +83,148 @@ def get_r2_client():
         aws_secret_access_key=secret_key,
         config=Config(
             signature_version="s3v4",
-            retries={"max_attempts": 3}
+            retries={"total_max_attempts": 1},
+            max_pool_connections=max_connections
         )
     )
 
     return client
 
 
-def file_exists_in_r2(client, bucket: str, key: str) -> bool:
-    """Check if file already exists in R2."""
+def head_r2_object(client, bucket: str, key: str, budget: TransferBudget):
+    """(size, ETag) of an object in R2, or None if it doesn't exist."""
     try:
-        client.head_object(Bucket=bucket, Key=key)
-        return True
-    except:
-        return False
+        response = budget.call(lambda: client.head_object(Bucket=bucket, Key=key))
+    except ClientError as e:
+        # Only a 404 means missing; throttling, auth and other errors fail the file
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 404 or e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response["ContentLength"], response.get("ETag")
+
+
+# (parent directory, file name pattern, key template). The first matching rule
+# gives a file its only key; a None template skips the file.
+KEY_RULES = [
+    ("face_crops", "*.jpg", "faces/crops/{name}"),
+    (None, "*.pdf", "documents/{dataset}/{name}"),
+    (None, "_*.txt", None),  # internal files
+    (None, "*.txt", "text/{dataset}/{name}"),
+    (None, "*.png", "images/{dataset}/{name}"),
+    (None, "*.jpg", "images/{dataset}/{name}"),
+]
+
+
+def dataset_of(name: str):
+    """DataSet_N-style directory name as used in keys, or None."""
+    return name.replace(" ", "_") if "dataset" in name.lower() else None
+
+
+def r2_key_for(name: str, parent: str, dataset) -> str:
+    """The R2 key of a file from KEY_RULES, or None if it isn't uploaded."""
+    for rule_parent, pattern, template in KEY_RULES:
+        if (rule_parent is None or rule_parent == parent) and fnmatch.fnmatchcase(name, pattern):
+            return template.format(name=name, dataset=dataset or "unknown") if template else None
+    return None
+
+
+def iter_files(input_dir: Path):
+    """Walk input_dir once, yielding (local path, R2 key, size, mtime_ns) as files are found.
+
+    The dataset is the outermost directory whose name contains "dataset",
+    carried down the walk instead of rescanned per file.
+    """
+    dataset = next(filter(None, (dataset_of(part) for part in Path(input_dir).parts)), None)
+    stack = [(str(input_dir), dataset)]
+    while stack:
+        directory, dataset = stack.pop()
+        parent = os.path.basename(directory)
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            print(f"Cannot read {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, dataset or dataset_of(entry.name)))
+                elif entry.is_file():
+                    r2_key = r2_key_for(entry.name, parent, dataset)
+                    if r2_key is not None:
+                        stat = entry.stat()
+                        yield entry.path, r2_key, stat.st_size, stat.st_mtime_ns
+
+
+def print_diff(diff: dict, unchanged: int, limit: int = 20):
+    """Print what a sync would upload."""
+    for status in ("new", "changed"):
+        entries = diff[status]
+        size = sum(entry["size"] for entry in entries)
+        print(f"\n{status.capitalize()}: {len(entries)} files, {size / 1024 / 1024:.2f} MB")
+        for entry in entries[:limit]:
+            was = f", was {entry['remote_size']} bytes" if entry["remote_size"] is not None else ""
+            print(f"  {entry['local_path']} -> {entry['r2_key']} ({entry['size']} bytes{was})")
+        if len(entries) > limit:
+            print(f"  ... and {len(entries) - limit} more")
+    print(f"\nUnchanged: {unchanged} files")
+
+
+def compressed(job: dict, local: str, size: int) -> bool:
+    """True if this run stores the file compressed (--compress, text types, single PUT)."""
+    return (job["compress"] is not None and size < job["multipart_threshold"]
+            and os.path.splitext(local)[1].lower() in COMPRESSIBLE_SUFFIXES)
+
+
+def process_file(job: dict, local: str, r2_key: str, size: int, mtime: int, remote=None, change=None) -> dict:
+    """Compare one file against the bucket and upload it if it is new or changed.
+
+    job holds the run's shared settings (client, bucket, remote_of, hashes,
+    uploader, ...). change/remote are passed in when the caller already
+    compared the file. Files stored compressed are compared by the size and
+    MD5 of their compressed body.
+    """
+    result = {"local_path": local, "r2_key": r2_key, "status": "pending", "size": size, "mtime": mtime,
+              "etag": None, "error": None, "change": change, "remote_size": None,
+              "compress": job["compress"] if compressed(job, local, size) else None}
+    encoded = None
+    if change is None:
+        try:
+            if compressed(job, local, size):
+                encoded = EncodedBody.from_file(local, job["compress"])
+            change = "new"
+            if job["skip_existing"]:
+                remote = job["remote_of"](r2_key)
+                if encoded is not None:
+                    change = "new" if remote is None else "unchanged" if encoded.matches(remote) else "changed"
+                else:
+                    change = sync_status(local, size, remote, job["hashes"])
+        except Exception as e:
+            result.update(status="error", error=str(e))
+            return result
+    result.update(change=change, remote_size=remote[0] if remote is not None else None)
+
+    if change == "unchanged":
+        result.update(status="skipped", etag=remote[1])
+    elif not job["dry_run"]:
+        result.update(upload_file((job["client"], job["bucket"], local, r2_key,
+                                   job["uploader"], job["multipart_threshold"], encoded)))
+    return result
 
 
 def upload_file(args: tuple) -> dict:
-    """Upload a single file to R2."""
-    client, bucket, local_path, r2_key, skip_existing = args
+    """Upload a single file to R2, in parts if it is multipart_threshold bytes or larger.
+
+    encoded (an EncodedBody or None) is sent instead of the file's bytes.
+    """
+    client, bucket, local_path, r2_key, uploader, multipart_threshold, encoded = args
 
     result = {
         "local_path": str(local_path),
         "r2_key": r2_key,
         "status": "pending",
         "size": 0,
+        "etag": None,
         "error": None
     }
 
@@ -76,11 +232,6 @@ def upload_file(args: tuple) -> dict:
         local_path = Path(local_path)
         result["size"] = local_path.stat().st_size
 
-        # Skip if already exists
-        if skip_existing and file_exists_in_r2(client, bucket, r2_key):
-            result["status"] = "skipped"
-            return result
-
         # Determine content type
         ext = local_path.suffix.lower()
         content_types = {
@@ -97,13 +248,32 @@ def upload_file(args: tuple) -> dict:
         content_type = content_types.get(ext, "application/octet-stream")
 
         # Upload
-        with open(local_path, "rb") as f:
-            client.put_object(
+        if encoded is not None:
+            extra = {"ContentEncoding": encoded.encoding} if encoded.encoding else {}
+            response = uploader.budget.call(lambda: client.put_object(
                 Bucket=bucket,
                 Key=r2_key,
-                Body=f,
-                ContentType=content_type
-            )
+                Body=encoded.body,
+                ContentType=content_type,
+                **extra
+            ), encoded.size)
+            result["etag"] = response.get("ETag")
+            result["stored_size"] = encoded.size
+            result["content_encoding"] = encoded.encoding
+        elif result["size"] >= multipart_threshold:
+            result["etag"] = uploader.upload(local_path, r2_key, content_type)
+        else:
+            def put():
+                # Opened per attempt so a retry sends the file from the start
+                with open(local_path, "rb") as f:
+                    return client.put_object(
+                        Bucket=bucket,
+                        Key=r2_key,
+                        Body=f,
+                        ContentType=content_type
+                    )
+            response = uploader.budget.call(put, result["size"])
+            result["etag"] = response.get("ETag")
 
         result["status"] = "uploaded"
 
@@ -114,99 +284,90 @@ def upload_file(args: tuple) -> dict:
     return result
 
 
-def collect_files(input_dir: Path) -> list[tuple]:
-    """Collect all files to upload with their R2 keys."""
-    files = []
-
-    # PDFs: /documents/DataSet_{N}/{filename}.pdf
-    for pdf in input_dir.rglob("*.pdf"):
-        # Determine dataset from path
-        dataset = "unknown"
-        for part in pdf.parts:
-            if "DataSet" in part or "dataset" in part.lower():
-                dataset = part.replace(" ", "_")
-                break
-
-        r2_key = f"documents/{dataset}/{pdf.name}"
-        files.append((str(pdf), r2_key))
-
-    # Text files: /text/DataSet_{N}/{filename}.txt
-    for txt in input_dir.rglob("*.txt"):
-        if txt.name.startswith("_"):  # Skip internal files
-            continue
-
-        dataset = "unknown"
-        for part in txt.parts:
-            if "DataSet" in part or "dataset" in part.lower():
-                dataset = part.replace(" ", "_")
-                break
-
-        r2_key = f"text/{dataset}/{txt.name}"
-        files.append((str(txt), r2_key))
-
-    # Images: /images/DataSet_{N}/{document_id}_page{N}_img{M}.png
-    for img in input_dir.rglob("*.png"):
-        dataset = "unknown"
-        for part in img.parts:
-            if "DataSet" in part or "dataset" in part.lower():
-                dataset = part.replace(" ", "_")
-                break
-
-        r2_key = f"images/{dataset}/{img.name}"
-        files.append((str(img), r2_key))
-
-    for img in input_dir.rglob("*.jpg"):
-        dataset = "unknown"
-        for part in img.parts:
-            if "DataSet" in part or "dataset" in part.lower():
-                dataset = part.replace(" ", "_")
-                break
-
-        r2_key = f"images/{dataset}/{img.name}"
-        files.append((str(img), r2_key))
-
-    # Face crops: /faces/crops/{face_id}.jpg
-    for face in input_dir.rglob("face_crops/*.jpg"):
-        r2_key = f"faces/crops/{face.name}"
-        files.append((str(face), r2_key))
-
-    return files
-
-
 def main():
     parser = argparse.ArgumentParser(description="Upload files to Cloudflare R2")
     parser.add_argument("--input", "-i", required=True, help="Input directory with processed files")
     parser.add_argument("--bucket", "-b", required=True, help="R2 bucket name")
-    parser.add_argument("--workers", "-w", type=int, default=16, help="Number of parallel upload workers")
-    parser.add_argument("--skip-existing", action="store_true", default=True, help="Skip already uploaded files")
-    parser.add_argument("--dry-run", action="store_true", help="List files without uploading")
+    parser.add_argument("--workers", "-w", type=int, default=16,
+                        help="Number of parallel upload workers (upper limit of the adaptive concurrency)")
+    parser.add_argument("--min-workers", type=int, default=2, help="Lower limit of the adaptive concurrency")
+    parser.add_argument("--adaptive", action=argparse.BooleanOptionalAction, default=True,
+                        help="Adapt concurrency to latency and throttling (default: on)")
+    parser.add_argument("--retries", type=int, default=6,
+                        help="Retries per request on throttling, 5xx and connection errors")
+    parser.add_argument("--skip-existing", action=argparse.BooleanOptionalAction, default=True,
+                        help="Skip files already in the bucket with the same size (default: on)")
+    parser.add_argument("--existence-check", choices=["inventory", "head"], default="inventory",
+                        help="How --skip-existing finds existing objects: bulk listing cached locally, "
+                             "or one HEAD request per file")
+    parser.add_argument("--inventory",
+                        help="Inventory cache file (default: INPUT/.r2_inventory_BUCKET.tsv)")
+    parser.add_argument("--inventory-max-age", type=float, default=24,
+                        help="Hours before a listed prefix is listed again")
+    parser.add_argument("--refresh-inventory", action="store_true", help="Relist all prefixes now")
+    parser.add_argument("--sync", action="store_true",
+                        help="Also compare content (MD5/ETag) of same-size files and re-upload changed ones")
+    parser.add_argument("--hash-cache",
+                        help="File digest cache for --sync (default: INPUT/.r2_hashes.tsv)")
+    parser.add_argument("--report", help="Write the new/changed/unchanged diff as JSON to this file")
+    parser.add_argument("--multipart-threshold", type=float, default=64,
+                        help="Upload files of this many MB or more in parts")
+    parser.add_argument("--part-size", type=float, default=8, help="Multipart part size in MB (min 5)")
+    parser.add_argument("--part-concurrency", type=int, default=4, help="Parts sent in parallel per file")
+    parser.add_argument("--max-requests", type=int,
+                        help="Requests in flight across all files and parts (default: --workers)")
+    parser.add_argument("--max-bandwidth", type=float, default=0, help="Upload limit in MB/s (0: unlimited)")
+    parser.add_argument("--abandoned-after", type=float, default=24,
+                        help="Hours after which unknown incomplete multipart uploads are aborted")
+    parser.add_argument("--compress", choices=ENCODINGS,
+                        help="Store .txt files compressed with this Content-Encoding")
+    parser.add_argument("--ignore-journal", action="store_true",
+                        help="Check every file against the bucket, even those the journal has as done")
+    parser.add_argument("--progress-file", help="Progress summary (default: INPUT/upload-progress.json)")
+    parser.add_argument("--summary", action="store_true",
+                        help="Only write the progress summary from the journal and print it")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List files without uploading (with --sync: report what would change)")
     args = parser.parse_args()
 
+    if args.sync and not args.skip_existing:
+        parser.error("--sync compares against the bucket and can't be combined with --no-skip-existing")
+
+    if args.compress == "br" and not brotli.available():
+        print("Missing dependencies. Install with: pip install brotli")
+        sys.exit(1)
+
     input_dir = Path(args.input)
 
     if not input_dir.exists():
         print(f"Error: Input directory does not exist: {input_dir}")
         sys.exit(1)
 
-    # Collect files
-    print(f"Scanning {input_dir} for files...")
-    files = collect_files(input_dir)
-    print(f"Found {len(files)} files to upload")
+    journal = UploadJournal(input_dir / f".r2_journal_{args.bucket}.jsonl")
+    journaled = journal.load()
+    progress_path = Path(args.progress_file) if args.progress_file else input_dir / "upload-progress.json"
+    if args.summary:
+        journal.write_summary(progress_path)
+        print(json.dumps(journal.summary(), indent=2))
+        return
 
-    if not files:
-        print("No files found!")
-        sys.exit(1)
+    files = iter_files(input_dir)
 
-    if args.dry_run:
+    if args.dry_run and not args.sync:
         print("\nDry run - files that would be uploaded:")
-        for local, r2_key in files[:20]:
-            print(f"  {local} -> {r2_key}")
-        if len(files) > 20:
-            print(f"  ... and {len(files) - 20} more")
+        count = 0
+        for local, r2_key, _, _ in files:
+            if count < 20:
+                print(f"  {local} -> {r2_key}")
+            count += 1
+        if count > 20:
+            print(f"  ... and {count - 20} more")
+        print(f"Found {count} files to upload")
         return
 
-    # Get R2 client
-    client = get_r2_client()
+    # Get R2 client, with a connection per request the budget can have in flight
+    max_requests = args.max_requests or args.workers
+    client = get_r2_client(max_connections=max_requests + 2)
 
     # Verify bucket exists
     try:
@@ -216,61 +377,202 @@ def main():
         print(f"Error accessing bucket {args.bucket}: {e}")
         sys.exit(1)
 
-    # Prepare upload tasks
-    upload_args = [
-        (client, args.bucket, local, r2_key, args.skip_existing)
-        for local, r2_key in files
-    ]
-
     # Upload with progress
+    found = 0
     uploaded = 0
     skipped = 0
     errors = 0
     total_bytes = 0
+    stored_bytes = 0
+
+    resumed = 0
+    changes = {"new": 0, "changed": 0}
+    # File lists are only kept for the diff report
+    diff = {"new": [], "changed": []} if args.report or args.dry_run else None
+    if journaled:
+        print(f"Journal: {journaled} files done by earlier runs ({journal.path})")
+    run_start = journal.position()
+
+    inventory = None
+    part_size = int(args.part_size * MIB)
+    hashes = None
+    if args.sync:
+        hashes = HashCache(Path(args.hash_cache) if args.hash_cache else input_dir / ".r2_hashes.tsv", part_size)
+    if args.skip_existing and args.existence_check == "inventory":
+        inventory_path = Path(args.inventory) if args.inventory else input_dir / f".r2_inventory_{args.bucket}.tsv"
+        inventory = R2Inventory(inventory_path, args.bucket)
+        max_age = timedelta(0) if args.refresh_inventory else timedelta(hours=args.inventory_max_age)
+        remote_of = inventory.get
+    else:
+        remote_of = lambda key: head_r2_object(client, args.bucket, key, budget)
+
+    budget = TransferBudget(max_requests, args.max_bandwidth * MIB, min_requests=args.min_workers,
+                            adaptive=args.adaptive, retries=args.retries)
+    uploader = MultipartUploader(client, args.bucket, input_dir / f".r2_multipart_{args.bucket}.json", budget,
+                                 part_size=part_size, part_concurrency=args.part_concurrency)
+    multipart_threshold = int(args.multipart_threshold * MIB)
+
+    job = {
+        "client": client,
+        "bucket": args.bucket,
+        "skip_existing": args.skip_existing,
+        "remote_of": remote_of,
+        "hashes": hashes,
+        "uploader": uploader,
+        "multipart_threshold": multipart_threshold,
+        "dry_run": args.dry_run,
+        "compress": args.compress,
+    }
+    prefixes = set()
+    listed = 0
+    last_status = [0.0]
+    last_summary = [time.monotonic()]
+    large_files = 0
+
+    def record(result: dict, pbar):
+        nonlocal uploaded, skipped, errors, total_bytes, stored_bytes
+        if result["status"] == "skipped":
+            skipped += 1
+        elif result["status"] == "uploaded":
+            uploaded += 1
+            total_bytes += result["size"]
+            stored_bytes += result.get("stored_size", result["size"])
+            if inventory is not None:
+                inventory.record(result["r2_key"], result.get("stored_size", result["size"]), result["etag"])
+            if hashes is not None and not result.get("content_encoding"):
+                hashes.remember(result["local_path"], result["etag"])
+        elif result["status"] == "error":
+            errors += 1
+        if result["change"] in changes:
+            changes[result["change"]] += 1
+            if diff is not None:
+                diff[result["change"]].append(result)
+        if not args.dry_run:
+            journal.append(result)
+
+        pbar.update(1)
+        if time.monotonic() - last_status[0] >= 0.5:
+            last_status[0] = time.monotonic()
+            pbar.set_postfix({
+                "found": found,
+                "uploaded": uploaded,
+                "skipped": skipped,
+                "errors": errors,
+                "MB": f"{total_bytes / 1024 / 1024:.1f}",
+                **budget.status(),
+            })
+        if not args.dry_run and time.monotonic() - last_summary[0] >= 5:
+            last_summary[0] = time.monotonic()
+            journal.write_summary(progress_path)
+
+    # Files are compared and uploaded while the walk goes on; at most
+    # `window` of them wait in the executor at a time
+    window = args.workers * 4
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor, \
+                tqdm(desc="Checking" if args.dry_run else "Uploading files", unit=" files") as pbar:
+            pending = set()
+            for local, r2_key, size, mtime in files:
+                found += 1
+                compress = args.compress if compressed(job, local, size) else None
+                if not args.ignore_journal and journal.done(local, r2_key, size, mtime, compress):
+                    # Done by an earlier run, unchanged since and stored as this run would: no remote check
+                    resumed += 1
+                    skipped += 1
+                    pbar.update(1)
+                    continue
+                prefix = key_prefix(r2_key)
+                if prefix not in prefixes:
+                    prefixes.add(prefix)
+                    if inventory is not None:
+                        # List each key prefix the first time the walk reaches it
+                        listed += budget.call(lambda: inventory.refresh(client, [prefix], max_age), timed=False)
+                if size >= multipart_threshold:
+                    large_files += 1
+
+                if inventory is not None and hashes is None and not compressed(job, local, size):
+                    # Size-only inventory checks are a dict lookup: no need for a worker
+                    remote = inventory.get(r2_key)
+                    change = sync_status(local, size, remote, None)
+                    if change == "unchanged" or args.dry_run:
+                        record(process_file(job, local, r2_key, size, mtime, remote, change), pbar)
+                        continue
+                    future = executor.submit(process_file, job, local, r2_key, size, mtime, remote, change)
+                else:
+                    future = executor.submit(process_file, job, local, r2_key, size, mtime)
+
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result(), pbar)
+
+            for future in as_completed(pending):
+                record(future.result(), pbar)
+    finally:
+        # Keep what was uploaded even if the run is interrupted
+        if inventory is not None:
+            inventory.save()
+        if hashes is not None:
+            hashes.save()
+        journal.close()
+        if not args.dry_run:
+            journal.write_summary(progress_path)
+
+    if not found:
+        print("No files found!")
+        sys.exit(1)
+
+    if inventory is not None:
+        print(f"Inventory: {len(inventory)} objects ({listed} listed now in {inventory.requests} requests, "
+              f"{len(prefixes)} prefixes) cached in {inventory.path}")
+    if hashes is not None:
+        print(f"Hashed {hashes.hashed_files} files ({hashes.hashed_bytes / 1024 / 1024:.1f} MB), "
+              f"the rest from {hashes.path}")
+    print(f"Found {found} files. Already in bucket: {skipped} ({resumed} from the journal), "
+          f"new: {changes['new']}, changed: {changes['changed']}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({
+                "bucket": args.bucket,
+                "compared_at": datetime.now().isoformat(),
+                "compare": "content" if args.sync else "size",
+                "counts": {**changes, "unchanged": skipped},
+                **{status: [{key: entry[key] for key in ("local_path", "r2_key", "size", "remote_size")}
+                            for entry in entries]
+                   for status, entries in diff.items()},
+            }, f, indent=2)
+        print(f"Diff report saved: {args.report}")
+
+    if args.dry_run:
+        print_diff(diff, skipped)
+        return
+
+    # Abort multipart uploads left behind by runs that can't be resumed
+    if uploader.uploads or large_files:
+        aborted = uploader.clean_abandoned(key_prefixes(prefixes), timedelta(hours=args.abandoned_after))
+        if aborted:
+            print(f"Aborted {aborted} abandoned multipart uploads")
 
-    manifest = []
-
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(upload_file, arg): arg for arg in upload_args}
-
-        with tqdm(total=len(futures), desc="Uploading files") as pbar:
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    if result["status"] == "uploaded":
-                        uploaded += 1
-                        total_bytes += result["size"]
-                    elif result["status"] == "skipped":
-                        skipped += 1
-                    else:
-                        errors += 1
-
-                    manifest.append(result)
-
-                except Exception as e:
-                    errors += 1
-
-                pbar.update(1)
-                pbar.set_postfix({
-                    "uploaded": uploaded,
-                    "skipped": skipped,
-                    "errors": errors,
-                    "MB": f"{total_bytes / 1024 / 1024:.1f}"
-                })
-
-    # Save manifest
+    # Save manifest: this run's journal entries, streamed
     manifest_path = input_dir / "r2_manifest.json"
     with open(manifest_path, "w") as f:
-        json.dump({
+        header = json.dumps({
             "bucket": args.bucket,
             "uploaded_at": datetime.now().isoformat(),
-            "total_files": len(files),
+            "total_files": found,
             "uploaded": uploaded,
             "skipped": skipped,
+            "resumed_from_journal": resumed,
             "errors": errors,
             "total_bytes": total_bytes,
-            "files": manifest
-        }, f, indent=2)
+            "stored_bytes": stored_bytes,
+        }, indent=2)
+        f.write(header[:-2] + ',\n  "files": [')
+        for i, entry in enumerate(journal.iter_entries(run_start)):
+            f.write(("," if i else "") + "\n    " + json.dumps(entry))
+        f.write("\n  ]\n}\n")
 
     # Print summary
     print("\n" + "=" * 50)
@@ -280,7 +582,20 @@ def main():
     print(f"Files skipped: {skipped}")
     print(f"Errors: {errors}")
     print(f"Total size: {total_bytes / 1024 / 1024:.2f} MB")
+    if args.compress and total_bytes:
+        print(f"Stored size: {stored_bytes / 1024 / 1024:.2f} MB ({stored_bytes / total_bytes:.0%}, {args.compress})")
+    elapsed = time.monotonic() - budget.started
+    print(f"Requests: {budget.requests} ({budget.requests / elapsed:.1f}/s, "
+          f"{budget.bytes_sent / 1024 / 1024 / elapsed:.1f} MB/s), retried: {budget.retried}, "
+          f"throttled: {budget.throttled}")
+    print(f"Concurrency: peak {budget.limit.peak}, final {int(budget.limit.limit)} of {max_requests}")
+    if uploader.resumed_parts:
+        print(f"Resumed multipart: {uploader.resumed_parts} parts ({uploader.resumed_bytes / 1024 / 1024:.2f} MB) "
+              f"not sent again")
+    if uploader.uploads:
+        print(f"Unfinished multipart uploads: {len(uploader.uploads)} (resumed by the next run)")
     print(f"Manifest saved: {manifest_path}")
+    print(f"Progress: {progress_path}")
     print("=" * 50)
 
 
@@ -1,34 +1,19 @@
 import Link from 'next/link';
-import { query } from '@/lib/database';
+import { getDocumentAggregates } from '@/lib/database';
 import { notableNames } from '@/lib/notable-names';
 
 async function getBrowseData() {
   try {
-    const [datasets, types] = await Promise.all([
-      // Get documents by dataset
-      query<{ dataset_number: number; count: string }>(
-        `SELECT dataset_number, COUNT(*) as count
-         FROM documents
-         GROUP BY dataset_number
-         ORDER BY dataset_number`
-      ),
-      // Get documents by type
-      query<{ document_type: string; count: string }>(
-        `SELECT COALESCE(document_type, 'other') as document_type, COUNT(*) as count
-         FROM documents
-         GROUP BY document_type
-         ORDER BY count DESC`
-      ),
-    ]);
+    const aggregates = await getDocumentAggregates(0);
 
     return {
-      datasets: datasets.map(d => ({
+      datasets: aggregates.documents_by_dataset.map(d => ({
         number: d.dataset_number,
-        documents: parseInt(d.count, 10),
+        documents: d.count,
       })),
-      types: types.map(t => ({
+      types: aggregates.documents_by_type.map(t => ({
         type: t.document_type,
-        count: parseInt(t.count, 10),
+        count: t.count,
       })),
     };
   } catch (error) {
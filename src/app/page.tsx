@@ -2,7 +2,7 @@
 // Build trigger: 2026-02-06-ads-removed
 import Link from "next/link";
 import SearchBar from "@/components/ui/SearchBar";
-import { query } from "@/lib/database";
+import { getDocumentAggregates, query } from "@/lib/database";
 import RecentlySearched from "@/components/ui/RecentlySearched";
 
 // 100 Notable individuals from the DOJ Epstein Files
@@ -48,34 +48,20 @@ function shuffleWithSeed(array: string[], seed: number): string[] {
 
 async function getStats() {
   try {
-    const [docCount, imageCount, faceCount, pageSum, byDataset, byType, topNames] = await Promise.all([
-      query<{ count: string }>('SELECT COUNT(*) as count FROM documents'),
+    const [aggregates, imageCount, faceCount] = await Promise.all([
+      getDocumentAggregates(20),
       query<{ count: string }>('SELECT COUNT(*) as count FROM extracted_images'),
       query<{ count: string }>('SELECT COUNT(*) as count FROM faces'),
-      query<{ total: string }>('SELECT COALESCE(SUM(page_count), 0) as total FROM documents'),
-      query<{ dataset_number: number; count: string }>(
-        'SELECT dataset_number, COUNT(*) as count FROM documents GROUP BY dataset_number ORDER BY dataset_number'
-      ),
-      query<{ document_type: string; count: string }>(
-        'SELECT document_type, COUNT(*) as count FROM documents GROUP BY document_type ORDER BY count DESC'
-      ),
-      query<{ name: string; total: string }>(
-        `SELECT name, SUM(frequency) as total
-         FROM mentioned_names
-         GROUP BY name
-         ORDER BY total DESC
-         LIMIT 20`
-      ),
     ]);
 
     return {
-      totalDocuments: parseInt(docCount[0]?.count || '0', 10),
-      totalPages: parseInt(pageSum[0]?.total || '0', 10),
+      totalDocuments: aggregates.total_documents,
+      totalPages: aggregates.total_pages,
       totalImages: parseInt(imageCount[0]?.count || '0', 10),
       totalFaces: parseInt(faceCount[0]?.count || '0', 10),
-      byDataset: byDataset.map(d => ({ number: d.dataset_number, count: parseInt(d.count, 10) })),
-      byType: byType.map(t => ({ type: t.document_type || 'other', count: parseInt(t.count, 10) })),
-      topNames: topNames.map(n => ({ name: n.name, count: parseInt(n.total, 10) })),
+      byDataset: aggregates.documents_by_dataset.map(d => ({ number: d.dataset_number, count: d.count })),
+      byType: aggregates.documents_by_type.map(t => ({ type: t.document_type || 'other', count: t.count })),
+      topNames: aggregates.top_names,
     };
   } catch (error) {
     console.error('Failed to fetch stats:', error);
@@ -362,6 +362,99 @@ export async function getStats(): Promise<{
   }
 }
 
+export interface DocumentAggregates {
+  total_documents: number;
+  total_pages: number;
+  documents_by_dataset: { dataset_number: number; count: number }[];
+  documents_by_type: { document_type: string; count: number }[];
+  top_names: { name: string; count: number }[];
+}
+
+/**
+ * Get document facet counts for the browse and landing pages.
+ * Reads the precomputed corpus_stats table (scripts/migrations/002_corpus_stats.sql)
+ * and only aggregates the documents tables when it is missing or empty.
+ */
+export async function getDocumentAggregates(topNames = 10): Promise<DocumentAggregates> {
+  try {
+    const rows = await query<{
+      scope: string;
+      dataset_number: number;
+      key: string;
+      documents: string;
+      pages: string;
+    }>(
+      `SELECT scope, dataset_number, key, documents, pages
+       FROM corpus_stats
+       WHERE scope IN ('total', 'dataset', 'document_type')
+          OR (scope = 'name' AND rank <= $1)
+       ORDER BY scope, rank, dataset_number, documents DESC`,
+      [topNames]
+    );
+
+    const total = rows.find((r) => r.scope === 'total');
+    if (total) {
+      return {
+        total_documents: parseInt(total.documents, 10),
+        total_pages: parseInt(total.pages, 10),
+        documents_by_dataset: rows
+          .filter((r) => r.scope === 'dataset')
+          .map((r) => ({ dataset_number: r.dataset_number, count: parseInt(r.documents, 10) })),
+        documents_by_type: rows
+          .filter((r) => r.scope === 'document_type')
+          .map((r) => ({ document_type: r.key, count: parseInt(r.documents, 10) })),
+        top_names: rows
+          .filter((r) => r.scope === 'name')
+          .map((r) => ({ name: r.key, count: parseInt(r.documents, 10) })),
+      };
+    }
+  } catch (error) {
+    // corpus_stats not migrated yet; fall through to live aggregation
+    console.warn('corpus_stats unavailable, aggregating documents:', error);
+  }
+
+  const [docCount, pageSum, byDataset, byType, names] = await Promise.all([
+    query<{ count: string }>('SELECT COUNT(*) as count FROM documents'),
+    query<{ total: string }>('SELECT COALESCE(SUM(page_count), 0) as total FROM documents'),
+    query<{ dataset_number: number; count: string }>(
+      `SELECT dataset_number, COUNT(*) as count
+       FROM documents
+       GROUP BY dataset_number
+       ORDER BY dataset_number`
+    ),
+    query<{ document_type: string; count: string }>(
+      `SELECT COALESCE(document_type, 'other') as document_type, COUNT(*) as count
+       FROM documents
+       GROUP BY document_type
+       ORDER BY count DESC`
+    ),
+    topNames > 0
+      ? query<{ name: string; total: string }>(
+          `SELECT name, COUNT(DISTINCT document_id) as total
+           FROM mentioned_names
+           GROUP BY name
+           ORDER BY total DESC
+           LIMIT $1`,
+          [topNames]
+        )
+      : Promise.resolve([]),
+  ]);
+
+  return {
+    total_documents: parseInt(docCount[0]?.count || '0', 10),
+    total_pages: parseInt(pageSum[0]?.total || '0', 10),
+    documents_by_dataset: byDataset.map((r) => ({
+      dataset_number: r.dataset_number,
+      count: parseInt(r.count, 10),
+    })),
+    documents_by_type: byType.map((r) => ({
+      document_type: r.document_type,
+      count: parseInt(r.count, 10),
+    })),
+    top_names: names.map((r) => ({ name: r.name, count: parseInt(r.total, 10) })),
+  };
+}
+
 /**
  * Health check
  */